@@ -0,0 +1,6 @@
+"""
+Context Engine harness library.
+
+Shared code for loop-runner.py and orchestrator.py. Both CLIs import from
+this package so feature tracking behaves identically in either runner.
+"""
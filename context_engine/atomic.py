@@ -0,0 +1,57 @@
+"""
+Crash-safe file writes.
+
+A plain open(path, "w") truncates the file before writing, so a crash or
+kill mid-write leaves a partial document. These helpers write to a temp
+file in the same directory, fsync it, and rename it over the target, so
+readers see either the old file or the new one - never a truncated one.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any
+
+def fsync_dir(directory: Path):
+    """Persist a rename by syncing its directory (no-op where unsupported)."""
+    try:
+        fd = os.open(str(directory), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def write_text_atomic(path: Path, text: str):
+    """Atomically replace path with text, keeping the existing file mode."""
+    path = Path(path)
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except OSError:
+        umask = os.umask(0)
+        os.umask(umask)
+        mode = 0o666 & ~umask
+
+    fd, tmp = tempfile.mkstemp(dir=str(path.parent), prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    fsync_dir(path.parent)
+
+def write_json_atomic(path: Path, data: Any, indent: int = 2):
+    """Atomically replace path with data serialized as JSON."""
+    write_text_atomic(path, json.dumps(data, indent=indent))
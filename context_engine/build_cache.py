@@ -0,0 +1,281 @@
+"""
+Shared Build Cache
+==================
+Keeps dependency builds warm across sessions, branches and worktrees,
+in one size-bounded cache directory (default ~/.cache/context-engine/
+build, override with CONTEXT_ENGINE_BUILD_CACHE and
+CONTEXT_ENGINE_BUILD_CACHE_GB).
+
+- cargo: sccache (RUSTC_WRAPPER) when installed, sized to half the
+         budget. Each worktree keeps its own target/ - one shared
+         target dir would make parallel sessions and sharded test runs
+         queue on cargo's build directory lock - and compiled
+         dependencies are shared through sccache instead
+- npm:   npm_config_cache, with installs run --prefer-offline
+- go:    GOCACHE
+
+activate() exports the variables (unless the user already set them), so
+sessions, test runs and hooks inherit them, and evicts least-recently
+used entries beyond the budget. prewarm() fetches and builds
+dependencies before a session starts and records how much of the build
+was already cached in .agent/metrics/build-cache.jsonl.
+
+Usage:
+    activate(project_path)
+    for stats in prewarm(tree_path):
+        print(describe(stats))
+    summary = hit_rates(project_path)
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from context_engine.worktrees import main_checkout
+
+METRICS_FILE = ".agent/metrics/build-cache.jsonl"
+DEFAULT_BUDGET_GB = 20
+PREWARM_TIMEOUT = 900       # seconds per ecosystem
+
+def cache_root() -> Path:
+    configured = os.environ.get("CONTEXT_ENGINE_BUILD_CACHE")
+    if configured:
+        return Path(configured).expanduser()
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "context-engine" / "build"
+
+def budget_bytes() -> int:
+    try:
+        gigabytes = float(os.environ.get("CONTEXT_ENGINE_BUILD_CACHE_GB", DEFAULT_BUDGET_GB))
+    except ValueError:
+        gigabytes = DEFAULT_BUDGET_GB
+    return int(gigabytes * 1024 ** 3)
+
+def detect_ecosystems(project_path: Path) -> List[str]:
+    """Build systems present in the project (a project may use several)."""
+    project_path = Path(project_path)
+    found = []
+    if (project_path / "Cargo.toml").exists():
+        found.append("cargo")
+    if (project_path / "package.json").exists():
+        found.append("npm")
+    if (project_path / "go.mod").exists():
+        found.append("go")
+    return found
+
+# ============================================================================
+# Activation and Eviction
+# ============================================================================
+
+def activate(project_path: Path) -> Dict[str, str]:
+    """
+    Point this process's (and so every child's) build caches at the shared
+    cache and trim it to the budget. Returns the variables that were set.
+    """
+    root = cache_root()
+    ecosystems = detect_ecosystems(project_path)
+    wanted = {}
+    if "npm" in ecosystems:
+        wanted["npm_config_cache"] = str(root / "npm")
+    if "go" in ecosystems:
+        wanted["GOCACHE"] = str(root / "go-build")
+    if "cargo" in ecosystems and shutil.which("sccache"):
+        wanted["RUSTC_WRAPPER"] = "sccache"
+        wanted["SCCACHE_DIR"] = str(root / "sccache")
+        wanted["SCCACHE_CACHE_SIZE"] = f"{max(1, budget_bytes() // 2 // 1024 ** 2)}M"
+
+    applied = {}
+    for name, value in wanted.items():
+        if name not in os.environ:
+            os.environ[name] = value
+            applied[name] = value
+    if applied:
+        root.mkdir(parents=True, exist_ok=True)
+        evict(root, budget_bytes() // 2 if "SCCACHE_DIR" in applied else budget_bytes())
+    return applied
+
+def _files(directory: Path) -> List[Tuple[float, int, str]]:
+    """(last use, size, path) of every file under directory."""
+    entries = []
+    stack = [str(directory)]
+    while stack:
+        try:
+            scan = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with scan:
+            for entry in scan:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        entries.append((max(st.st_atime, st.st_mtime), st.st_size, entry.path))
+                except OSError:
+                    continue
+    return entries
+
+def evict(root: Path, max_bytes: int) -> int:
+    """
+    Delete least recently used npm and Go cache entries until they fit in
+    max_bytes (sccache trims itself). Both tools treat a missing entry as a
+    miss, so eviction never breaks a build. Returns bytes freed.
+    """
+    # npm: content blobs only; its index entries pointing at them become misses
+    entries = _files(root / "npm" / "_cacache" / "content-v2") + _files(root / "go-build")
+    total = sum(size for _, size, _ in entries)
+    freed = 0
+    for _, size, path in sorted(entries):
+        if total - freed <= max_bytes:
+            break
+        try:
+            os.unlink(path)
+            freed += size
+        except OSError:
+            pass
+    return freed
+
+def own_target_dir(tree_path: Path) -> bool:
+    """
+    Give a worktree its own target/ again if it is a link to the main
+    checkout's (as worktrees were once set up), so cargo runs in
+    different worktrees do not wait on each other's build lock.
+    """
+    tree_path = Path(tree_path)
+    link = tree_path / "target"
+    if not link.is_symlink():
+        return False
+    try:
+        if Path(os.readlink(link)) != main_checkout(tree_path) / "target":
+            return False
+        link.unlink()
+    except OSError:
+        return False
+    return True
+
+# ============================================================================
+# Pre-warming
+# ============================================================================
+
+def _run(cmd: List[str], cwd: Path) -> Tuple[bool, str, str]:
+    try:
+        result = subprocess.run(cmd, cwd=str(cwd), capture_output=True, text=True,
+                                errors="replace", timeout=PREWARM_TIMEOUT)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        return False, "", str(e)
+    return result.returncode == 0, result.stdout, result.stderr
+
+def _prewarm_cargo(tree_path: Path) -> Dict[str, Any]:
+    own_target_dir(tree_path)
+    _run(["cargo", "fetch"], tree_path)
+    ok, stdout, _ = _run(["cargo", "test", "--no-run", "--message-format=json"], tree_path)
+    hits = misses = 0
+    for line in stdout.splitlines():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("reason") == "compiler-artifact":
+            if message.get("fresh"):
+                hits += 1
+            else:
+                misses += 1
+    return {"ok": ok, "hits": hits, "misses": misses, "unit": "crates"}
+
+def _prewarm_npm(tree_path: Path) -> Dict[str, Any]:
+    installed = tree_path / "node_modules" / ".package-lock.json"
+    lock = tree_path / "package-lock.json"
+    if installed.exists() and (not lock.exists() or installed.stat().st_mtime >= lock.stat().st_mtime):
+        return {"ok": True, "hits": 0, "misses": 0, "unit": "packages", "skipped": True}
+    install = "ci" if lock.exists() else "install"
+    ok, _, stderr = _run(["npm", install, "--prefer-offline", "--no-audit", "--no-fund",
+                          "--loglevel=http"], tree_path)
+    # npm http fetch GET 200 https://registry.npmjs.org/... 12ms (cache hit)
+    hits = stderr.count("(cache hit)") + stderr.count("(cache revalidated)")
+    misses = stderr.count("(cache miss)") + stderr.count("(cache stale)")
+    return {"ok": ok, "hits": hits, "misses": misses, "unit": "packages"}
+
+def _prewarm_go(tree_path: Path) -> Dict[str, Any]:
+    _run(["go", "mod", "download"], tree_path)
+    # Stale = not in the build cache; counted before building. Test mains
+    # (pkg.test) are linked, not cached, so they are always stale.
+    _, stdout, _ = _run(["go", "list", "-deps", "-test", "-f",
+                         "{{if not .Standard}}{{.ImportPath}} {{.Stale}}{{end}}", "./..."], tree_path)
+    states = [line.rsplit(" ", 1)[-1] for line in stdout.splitlines()
+              if line and not line.rsplit(" ", 1)[0].endswith(".test")]
+    ok, _, _ = _run(["go", "test", "-run", "^$", "./..."], tree_path)
+    return {"ok": ok, "hits": states.count("false"), "misses": states.count("true"),
+            "unit": "packages"}
+
+PREWARMERS = {"cargo": _prewarm_cargo, "npm": _prewarm_npm, "go": _prewarm_go}
+
+def prewarm(tree_path: Path, session: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch and build dependencies (and test binaries) so the session starts
+    warm. Failures are not errors: the agent may be mid-way through
+    making the project build. Returns one stats dict per ecosystem.
+    """
+    tree_path = Path(tree_path)
+    results = []
+    for ecosystem in detect_ecosystems(tree_path):
+        start = time.time()
+        stats = PREWARMERS[ecosystem](tree_path)
+        stats.update(ecosystem=ecosystem, seconds=round(time.time() - start, 1), session=session)
+        results.append(stats)
+        if not stats.get("skipped"):
+            _record(tree_path, stats)
+    return results
+
+def _record(tree_path: Path, stats: Dict[str, Any]):
+    metrics_file = main_checkout(tree_path) / METRICS_FILE
+    try:
+        metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(metrics_file, "a") as f:
+            f.write(json.dumps(dict(stats, timestamp=time.time())) + "\n")
+    except OSError:
+        pass
+
+def describe(stats: Dict[str, Any]) -> str:
+    """One-line summary of a prewarm() result."""
+    if stats.get("skipped"):
+        return f"{stats['ecosystem']}: dependencies already installed"
+    total = stats["hits"] + stats["misses"]
+    rate = f"{stats['hits']}/{total} {stats['unit']} cached ({stats['hits'] / total:.0%})" if total else "nothing to build"
+    state = "" if stats["ok"] else ", build failed"
+    return f"{stats['ecosystem']}: {rate} in {stats['seconds']:.0f}s{state}"
+
+# ============================================================================
+# Reporting
+# ============================================================================
+
+def hit_rates(project_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Per ecosystem: warm-ups, hits, misses, hit rate and mean warm-up time."""
+    summary: Dict[str, Dict[str, Any]] = {}
+    try:
+        with open(Path(project_path) / METRICS_FILE) as f:
+            lines = f.readlines()
+    except OSError:
+        return summary
+    for line in lines:
+        try:
+            stats = json.loads(line)
+            entry = summary.setdefault(stats["ecosystem"], {"runs": 0, "hits": 0, "misses": 0, "seconds": 0.0})
+            entry["runs"] += 1
+            entry["hits"] += int(stats.get("hits", 0))
+            entry["misses"] += int(stats.get("misses", 0))
+            entry["seconds"] += float(stats.get("seconds", 0))
+        except (ValueError, KeyError, TypeError):
+            continue
+    for entry in summary.values():
+        total = entry["hits"] + entry["misses"]
+        entry["hit_rate"] = entry["hits"] / total if total else None
+        entry["mean_seconds"] = entry["seconds"] / entry["runs"]
+    return summary
+
+def cache_size() -> int:
+    """Bytes currently used by the shared cache."""
+    return sum(size for _, size, _ in _files(cache_root()))
@@ -0,0 +1,183 @@
+"""
+Context Budget
+==============
+Token counting and packing shared by the context compiler and the native
+SessionStart hook, so both fill their budget with the most useful memory
+instead of estimating roughly and then dropping whole sections.
+
+count_tokens() splits text the way byte-pair tokenizers pre-tokenize it
+(words with their leading space, digit groups of up to three, runs of
+punctuation, whitespace) and counts long words, symbol runs and
+non-ASCII text at typical BPE rates. It runs offline with no model
+files, and unlike words * 1.3 it sees the punctuation, digits and
+symbols that make up much of code, JSON and logs. TokenCounter
+remembers counts by content hash in .agent/cache/tokens.json, so memory
+files are counted once.
+
+pack() chooses items under a budget: each item has one or more versions
+(full, trimmed) with a value, usually its section's priority decayed by
+recency. Required items always go in; the rest are chosen by a
+multiple-choice knapsack over the remaining budget, so a trimmed old
+failure can make room for a recent one in full. Section headers are
+reserved up front and dropped with their section if nothing of it fits.
+
+Usage:
+    counter = TokenCounter(project_path / TOKENS_CACHE)
+    items = [item("task", task_text, required=True),
+             item("failures", text, value=70 * 0.85 ** rank, trimmed=head)]
+    packed = pack(items, 8000, counter.count)
+    packed["items"], packed["size"], packed["dropped"], packed["trimmed"]
+    counter.save()
+"""
+
+import hashlib
+import json
+import math
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from context_engine.atomic import write_json_atomic
+
+TOKENS_CACHE = ".agent/cache/tokens.json"
+MAX_CACHED_COUNTS = 20000
+
+TRIMMED_VALUE = 0.6         # a trimmed version is worth this share of the full one
+DECAY = 0.85                # value of each older memory relative to the next newer one
+KNAPSACK_STEPS = 600        # budget resolution of the packer
+
+# ============================================================================
+# Counting
+# ============================================================================
+
+# Pre-tokenizer split: contractions, words with an optional leading space,
+# digit groups, punctuation runs, and whitespace
+_PIECES = re.compile(r"'(?:[sdmt]|ll|ve|re)| ?[^\W\d_]+| ?\d{1,3}| ?[^\s\w]+|\s+(?!\S)|\s+")
+
+def count_tokens(text: str) -> int:
+    """Offline estimate of a BPE tokenizer's token count for text."""
+    tokens = 0
+    for piece in _PIECES.findall(text):
+        body = piece.lstrip(" ")
+        if not body or body.isspace():
+            tokens += 1
+        elif not body.isascii():
+            tokens += math.ceil(len(body.encode("utf-8")) / 3)
+        elif body[0].isalpha():
+            # Common words are one token; longer ones split every ~6 letters
+            tokens += math.ceil(len(body) / 6)
+        elif body[0].isdigit():
+            tokens += 1
+        else:
+            tokens += math.ceil(len(body) / 2)
+    return tokens
+
+def content_key(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8", "surrogateescape"), digest_size=12).hexdigest()
+
+class TokenCounter:
+    """count_tokens() with counts remembered by content hash, optionally on disk."""
+
+    def __init__(self, cache_file: Optional[Path] = None):
+        self.cache_file = Path(cache_file) if cache_file else None
+        self.counts: Dict[str, int] = {}
+        self.changed = False
+        if self.cache_file is not None:
+            try:
+                with open(self.cache_file) as f:
+                    counts = json.load(f)
+                if isinstance(counts, dict):
+                    self.counts = counts
+            except (OSError, ValueError):
+                pass
+
+    def count(self, text: str) -> int:
+        key = content_key(text)
+        tokens = self.counts.get(key)
+        if tokens is None:
+            tokens = self.counts[key] = count_tokens(text)
+            self.changed = True
+        return tokens
+
+    def save(self):
+        """Write new counts back, keeping the most recently added ones."""
+        if self.cache_file is None or not self.changed:
+            return
+        counts = self.counts
+        if len(counts) > MAX_CACHED_COUNTS:
+            counts = dict(list(counts.items())[-MAX_CACHED_COUNTS:])
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(self.cache_file, counts, indent=None)
+        except OSError:
+            return
+        self.changed = False
+
+# ============================================================================
+# Packing
+# ============================================================================
+
+def item(section: str, text: str, value: float = 1.0, trimmed: Optional[str] = None,
+         required: bool = False, header: bool = False) -> Dict[str, Any]:
+    """
+    A packable piece of context. trimmed is a shorter version worth
+    TRIMMED_VALUE of the full one; header marks a section heading, which
+    is kept only if something else of its section is.
+    """
+    versions = [(text, value)]
+    if trimmed is not None and trimmed != text:
+        versions.append((trimmed, value * TRIMMED_VALUE))
+    return {"section": section, "versions": versions, "required": required or header, "header": header}
+
+def pack(items: List[Dict[str, Any]], budget: int, measure: Callable[[str], int] = count_tokens,
+         overhead: int = 0) -> Dict[str, Any]:
+    """
+    Choose which items, and which version of each, go in under budget
+    (in measure's units; overhead is added per item for separators).
+    Returns items (the chosen ones in their original order, each with
+    its chosen "text" and "size"), size, dropped and trimmed counts, and
+    over (required items alone exceed the budget).
+    """
+    sizes = [[measure(text) + overhead for text, _ in entry["versions"]] for entry in items]
+    chosen: Dict[int, int] = {index: 0 for index, entry in enumerate(items) if entry["required"]}
+    spare = budget - sum(sizes[index][0] for index in chosen)
+
+    optional = [index for index, entry in enumerate(items) if not entry["required"]]
+    if optional and spare > 0:
+        step = max(1, math.ceil(spare / KNAPSACK_STEPS))
+        capacity = spare // step
+        best = [0.0] * (capacity + 1)
+        picks = []
+        for index in optional:
+            options = [(math.ceil(size / step), value)
+                       for size, (_, value) in zip(sizes[index], items[index]["versions"])]
+            row, pick = best[:], [-1] * (capacity + 1)
+            for version, (weight, value) in enumerate(options):
+                for room in range(weight, capacity + 1):
+                    candidate = best[room - weight] + value
+                    if candidate > row[room]:
+                        row[room], pick[room] = candidate, version
+            picks.append(pick)
+            best = row
+        room = capacity
+        for index, pick in zip(reversed(optional), reversed(picks)):
+            version = pick[room]
+            if version >= 0:
+                chosen[index] = version
+                room -= math.ceil(sizes[index][version] / step)
+
+    # Headers of sections with nothing else in them go
+    filled = {items[index]["section"] for index in chosen if not items[index]["header"]}
+    for index in [index for index in chosen if items[index]["header"]]:
+        if items[index]["section"] not in filled:
+            del chosen[index]
+
+    packed = []
+    for index in sorted(chosen):
+        version = chosen[index]
+        packed.append(dict(items[index], text=items[index]["versions"][version][0],
+                           size=sizes[index][version], trimmed=version > 0))
+    size = sum(entry["size"] for entry in packed)
+    return {"items": packed, "size": size, "over": size > budget,
+            "dropped": sum(1 for index in optional if index not in chosen),
+            "trimmed": sum(1 for entry in packed if entry["trimmed"])}
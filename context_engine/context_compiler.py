@@ -0,0 +1,551 @@
+"""
+Native Context Compiler
+=======================
+In-process replacement for .agent/hooks/compile-context.sh: assembles
+the working context (.agent/working-context/current.md) for a session.
+
+The document has the shell version's sections:
+
+- Current Task: the feature the session works on (by default the first
+  pending one by priority), as JSON
+- Active Constraints: constraints/*.md
+- Known Failures: the most recently modified failures/*.md
+- Working Strategies: the most recent strategies/*.md
+- Available Artifacts: the first 10 tool-output names
+- Recent Session Summary: the last lines of agent-progress.txt
+
+By default their contents are packed into MAX_TOKENS with the shared
+budgeter (context_budget): each constraint, failure and strategy is an
+item, valued by its section and age, kept in full, trimmed or left out
+so the most useful memory fits, and the footer gives the counted
+tokens. With packed=False (--shell-layout) it is the shell version's
+document exactly: the 5 newest failures, 3 strategies, 30 progress
+lines, ~1.3 tokens/word, and the same trimmed rebuild over MAX_TOKENS.
+
+Instead of one process per file (ls | head | while read; cat) it makes
+one os.scandir() pass per memory directory, picks the newest files with
+a heap, and reads each chosen file once. Ties are ordered the way ls -t
+orders them (newest first, then by name), constraints by name, so the
+output is deterministic.
+
+Each section is cached in .agent/cache/context.json with the stats of
+what it was built from: feature_list.json for the task, the memory and
+artifact directories' mtimes and the memory files on show, the size and
+mtime of agent-progress.txt. A compile re-reads only the sections whose
+inputs changed; when none did, or the rebuilt ones came out the same,
+the previous document is reused (and not rewritten if the output file
+is still the one written), so repeated compiles within a session cost a
+handful of stat() calls.
+
+compile-context.sh execs this module when the harness is installed
+(CONTEXT_ENGINE_PATH), so `.agent/commands.sh compile` and agents use it
+too; CONTEXT_ENGINE_SHELL_COMPILER=1 forces the shell version.
+
+Usage:
+    result = compile_context(project_path)            # current.md
+    result = compile_context(project_path, ".agent/working-context/next.md", feature=selected)
+    result["tokens"], result["trimmed"], result["cached"], result["rebuilt"]
+
+    python3 -m context_engine.context_compiler [project] [--output FILE] [--no-cache] [--shell-layout]
+    python3 -m context_engine.context_compiler [project] --benchmark 20
+"""
+
+import argparse
+import heapq
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from context_engine import context_budget, memory_index
+from context_engine.atomic import write_json_atomic
+from context_engine.context_budget import TokenCounter
+
+WORKING_CONTEXT = ".agent/working-context/current.md"
+COMPILE_SCRIPT = ".agent/hooks/compile-context.sh"
+FEATURE_FILE = "feature_list.json"
+PROGRESS_FILE = "agent-progress.txt"
+CONSTRAINTS_DIR = ".agent/memory/constraints"
+FAILURES_DIR = ".agent/memory/failures"
+STRATEGIES_DIR = ".agent/memory/strategies"
+ARTIFACT_DIR = ".agent/artifacts/tool-outputs"
+CACHE_FILE = ".agent/cache/context.json"
+CACHE_VERSION = 2
+
+MAX_TOKENS = 8000           # hard cap for the context budget
+TOKENS_PER_WORD = 1.3
+
+# Files (or lines) per section of the full context
+FAILURES = 5
+STRATEGIES = 3
+ARTIFACTS = 10
+PROGRESS_LINES = 30
+# ... and of the trimmed one: (files, lines per file)
+TRIMMED_HEAD_LINES = 50
+TRIMMED_FAILURES = (3, 20)
+TRIMMED_STRATEGIES = (2, 15)
+TRIMMED_PROGRESS_LINES = 15
+
+# Packed layout: the newest files considered per memory section, the
+# value of a section's items (failures and strategies decayed by age),
+# lines kept when trimming
+CANDIDATES = {"failures": 20, "strategies": 10}
+SECTION_VALUES = {"constraints": 80, "failures": 70, "strategies": 60, "progress": 50, "artifacts": 30}
+TRIMMED_LINES = {"constraints": 20, "failures": TRIMMED_FAILURES[1], "strategies": TRIMMED_STRATEGIES[1]}
+HEADINGS = (("constraints", b"\n## Active Constraints\n"),
+            ("failures", b"\n## Known Failures (Don't Repeat)\n"),
+            ("strategies", b"\n## Working Strategies\n"),
+            ("artifacts", b"\n## Available Artifacts (fetch if needed)\n"),
+            ("progress", b"\n## Recent Session Summary\n"))
+FOOTER_TOKENS = 30
+
+RACY_NS = 2 * 10**9         # cached inputs modified this close to their build are re-read
+
+# ============================================================================
+# Inputs
+# ============================================================================
+
+def _read(path: Path) -> bytes:
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return b""
+
+def _head(data: bytes, lines: int) -> bytes:
+    """First lines of data (head -n)."""
+    end = -1
+    for _ in range(lines):
+        end = data.find(b"\n", end + 1)
+        if end < 0:
+            return data
+    return data[:end + 1]
+
+def _tail(data: bytes, lines: int) -> bytes:
+    """Last lines of data (tail -n)."""
+    if lines <= 0:
+        return b""
+    start = len(data) - 1 if data.endswith(b"\n") else len(data)
+    for _ in range(lines):
+        start = data.rfind(b"\n", 0, start)
+        if start < 0:
+            return data
+    return data[start + 1:]
+
+def _markdown_files(directory: Path) -> List[os.DirEntry]:
+    """The *.md files of a directory (what the shell glob matches), one scandir pass."""
+    try:
+        with os.scandir(directory) as scan:
+            return [entry for entry in scan
+                    if entry.name.endswith(".md") and not entry.name.startswith(".") and entry.is_file()]
+    except OSError:
+        return []
+
+def _newest(directory: Path, count: int) -> List[str]:
+    """Paths of the count most recently modified *.md files, as ls -t orders them."""
+    stamped = []
+    for entry in _markdown_files(directory):
+        try:
+            stamped.append((-entry.stat().st_mtime_ns, entry.name, entry.path))
+        except OSError:
+            continue
+    return [path for _, _, path in heapq.nsmallest(count, stamped)]
+
+def current_feature(project_path: Path) -> Optional[Dict[str, Any]]:
+    """First pending feature by priority, {} if there is none, None if unreadable."""
+    try:
+        with open(Path(project_path) / FEATURE_FILE) as f:
+            data = json.load(f)
+        for feat in sorted(data.get("features", []), key=lambda x: x.get("priority", 99)):
+            if not feat.get("passes", False):
+                return feat
+    except (OSError, ValueError, TypeError, AttributeError):
+        return None
+    return {}
+
+def _feature_json(feat: Optional[Dict[str, Any]]) -> bytes:
+    """A feature as indented JSON, empty for none or an unreadable list."""
+    return (json.dumps(feat, indent=2) + "\n").encode() if feat else b""
+
+def _feature_key(feat: Optional[Dict[str, Any]]) -> str:
+    return context_budget.content_key(json.dumps(feat, sort_keys=True, default=str))
+
+def _artifact_names(project_path: Path) -> List[str]:
+    try:
+        with os.scandir(project_path / ARTIFACT_DIR) as scan:
+            names = [entry.name for entry in scan if not entry.name.startswith(".")]
+    except OSError:
+        return []
+    return heapq.nsmallest(ARTIFACTS, names)
+
+def estimate_tokens(text: bytes) -> int:
+    """The shell estimate: words (wc -w) * 1.3."""
+    return int(len(text.split()) * TOKENS_PER_WORD)
+
+# ============================================================================
+# Sections
+# ============================================================================
+#
+# Each section builder returns the section's items (memory files, the
+# task, the artifact listing, the progress tail) and the paths it
+# depends on. A section is rebuilt only when one of those paths changed,
+# or for FEATURE_SECTIONS when the session's feature did.
+
+def _stat(project_path: Path, path: str) -> Optional[List[int]]:
+    try:
+        st = os.stat(project_path / path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size]
+
+def _section(project_path: Path, deps: List[str], items: List[bytes]) -> Dict[str, Any]:
+    return {"deps": {path: _stat(project_path, path) for path in deps}, "items": items}
+
+def _task(project_path: Path, feature: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if not (project_path / FEATURE_FILE).exists():
+        return _section(project_path, [FEATURE_FILE], [b""])
+    return _section(project_path, [FEATURE_FILE], [b"```json\n" + _feature_json(feature) + b"```\n"])
+
+def _constraints(project_path: Path, feature: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    names = sorted(entry.name for entry in _markdown_files(project_path / CONSTRAINTS_DIR))
+    paths = [f"{CONSTRAINTS_DIR}/{name}" for name in names]
+    return _section(project_path, [CONSTRAINTS_DIR] + paths, [_read(project_path / path) for path in paths])
+
+def _memories(project_path: Path, category: str, directory: str,
+              feature: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    The newest files of a memory directory, newest first, followed by the
+    ones most relevant to the session's feature that are not among them,
+    both from the memory index where available. "ranked" orders the items
+    for packing: relevant first, by BM25 score, then the rest by recency.
+    """
+    count = CANDIDATES[category]
+    paths = memory_index.newest(project_path, category, count)
+    if paths is None:
+        paths = [f"{directory}/{os.path.basename(path)}" for path in _newest(project_path / directory, count)]
+    ranked = []
+    hits = memory_index.search(project_path, memory_index.feature_query(feature), [category], count,
+                               update=False)
+    for hit in hits or []:
+        if hit["path"] not in paths:
+            paths.append(hit["path"])
+        ranked.append(paths.index(hit["path"]))
+    ranked.extend(index for index in range(len(paths)) if index not in ranked)
+    section = _section(project_path, [directory, FEATURE_FILE] + paths,
+                       [_read(project_path / path) for path in paths])
+    section["ranked"] = ranked
+    return section
+
+def _failures(project_path: Path, feature: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return _memories(project_path, "failures", FAILURES_DIR, feature)
+
+def _strategies(project_path: Path, feature: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return _memories(project_path, "strategies", STRATEGIES_DIR, feature)
+
+def _artifacts(project_path: Path, feature: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return _section(project_path, [ARTIFACT_DIR], [b"".join(
+        f"- {ARTIFACT_DIR}/{name}\n".encode() for name in _artifact_names(project_path))])
+
+def _progress(project_path: Path, feature: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    return _section(project_path, [PROGRESS_FILE], [_tail(_read(project_path / PROGRESS_FILE), PROGRESS_LINES)])
+
+SECTIONS = (("task", _task), ("constraints", _constraints), ("failures", _failures),
+            ("strategies", _strategies), ("artifacts", _artifacts), ("progress", _progress))
+FEATURE_SECTIONS = ("task", "failures", "strategies")
+
+# ============================================================================
+# Compilation
+# ============================================================================
+
+def _assemble_shell(sections: Dict[str, Dict[str, Any]], max_tokens: int) -> Dict[str, Any]:
+    """compile-context.sh's document: fixed counts, trimmed wholesale over budget."""
+    items = {name: section["items"] for name, section in sections.items()}
+    text = b"".join([
+        b"# Working Context\n\n## Current Task\n", items["task"][0],
+        b"\n## Active Constraints\n", *items["constraints"],
+        b"\n## Known Failures (Don't Repeat)\n", *items["failures"][:FAILURES],
+        b"\n## Working Strategies\n", *items["strategies"][:STRATEGIES],
+        b"\n## Available Artifacts (fetch if needed)\n", items["artifacts"][0],
+        b"\n## Recent Session Summary\n", items["progress"][0]])
+    tokens = estimate_tokens(text)
+    result = {"content": text, "tokens": tokens, "trimmed": False}
+    if tokens <= max_tokens:
+        return result
+
+    # Over budget: header and current task, then fewer, shorter memories
+    (failures, failure_lines), (strategies, strategy_lines) = TRIMMED_FAILURES, TRIMMED_STRATEGIES
+    text = b"".join([
+        _head(text, TRIMMED_HEAD_LINES),
+        b"\n## Known Failures (Trimmed - Last 3)\n",
+        *(_head(data, failure_lines) for data in items["failures"][:failures]),
+        b"\n## Working Strategies (Trimmed)\n",
+        *(_head(data, strategy_lines) for data in items["strategies"][:strategies]),
+        b"\n## Recent Session Summary (Trimmed)\n", _tail(items["progress"][0], TRIMMED_PROGRESS_LINES)])
+    return {"content": text, "tokens": estimate_tokens(text), "trimmed": True, "tokens_before": tokens}
+
+def _assemble_packed(sections: Dict[str, Dict[str, Any]], max_tokens: int,
+                     counter: TokenCounter) -> Dict[str, Any]:
+    """Memory items packed by value into max_tokens, counted with the budget counter."""
+    items = {name: section["items"] for name, section in sections.items()}
+    packable = [context_budget.item("task", b"# Working Context\n\n## Current Task\n" + items["task"][0],
+                                    required=True)]
+    for name, heading in HEADINGS:
+        packable.append(context_budget.item(name, heading, header=True))
+        value, lines = SECTION_VALUES[name], TRIMMED_LINES.get(name)
+        decay = context_budget.DECAY if name in CANDIDATES else 1.0
+        order = sections[name].get("ranked", range(len(items[name])))
+        for rank, data in enumerate(items[name][index] for index in order):
+            trimmed = None
+            if name == "progress":
+                trimmed = _tail(data, TRIMMED_PROGRESS_LINES)
+            elif lines:
+                trimmed = _head(data, lines)
+            packable.append(context_budget.item(name, data, value * decay ** rank, trimmed))
+    packed = context_budget.pack(packable, max_tokens - FOOTER_TOKENS,
+                                 lambda data: counter.count(data.decode("utf-8", "replace")))
+    return {"content": b"".join(entry["text"] for entry in packed["items"]), "tokens": packed["size"],
+            "trimmed": bool(packed["dropped"] or packed["trimmed"]),
+            "dropped": packed["dropped"], "shortened": packed["trimmed"]}
+
+def _assemble(project_path: Path, sections: Dict[str, Dict[str, Any]], max_tokens: int,
+              packed: bool) -> Dict[str, Any]:
+    if not packed:
+        return _assemble_shell(sections, max_tokens)
+    counter = TokenCounter(project_path / context_budget.TOKENS_CACHE)
+    result = _assemble_packed(sections, max_tokens, counter)
+    counter.save()
+    return result
+
+def render(project_path: Path, max_tokens: int = MAX_TOKENS, packed: bool = True,
+           feature: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Build the working context for feature (default: current_feature())
+    without writing it. Returns content (bytes), tokens and trimmed;
+    packed adds dropped and shortened (memory items left out or trimmed),
+    the shell layout tokens_before if trimmed.
+    """
+    project_path = Path(project_path)
+    if feature is None:
+        feature = current_feature(project_path)
+    return _assemble(project_path, {name: build(project_path, feature) for name, build in SECTIONS},
+                     max_tokens, packed)
+
+# ============================================================================
+# Cache
+# ============================================================================
+#
+# .agent/cache/context.json keeps every section with the stats of the
+# paths it was built from, the last compiled document and the stats of
+# the files it was written to. Directory mtimes catch memory files being
+# added, removed or renamed; the files a section shows are stat'ed
+# themselves. An in-place edit of a memory file that is not shown (and so
+# not a dependency) goes unnoticed until its directory changes - memory is
+# written as new files, and --no-cache rebuilds everything.
+
+def _to_text(data: bytes) -> str:
+    return data.decode("utf-8", "surrogateescape")
+
+def _to_bytes(text: str) -> bytes:
+    return text.encode("utf-8", "surrogateescape")
+
+def _load_cache(project_path: Path) -> Dict[str, Any]:
+    try:
+        with open(project_path / CACHE_FILE) as f:
+            cache = json.load(f)
+        if cache.get("version") != CACHE_VERSION:
+            return {}
+        for section in cache["sections"].values():
+            section["items"] = [_to_bytes(text) for text in section["items"]]
+        cache["content"] = _to_bytes(cache["content"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+    return cache
+
+def _save_cache(project_path: Path, cache: Dict[str, Any]):
+    data = dict(cache, version=CACHE_VERSION, content=_to_text(cache["content"]), sections={
+        name: dict(section, items=[_to_text(data) for data in section["items"]])
+        for name, section in cache["sections"].items()})
+    try:
+        (project_path / CACHE_FILE).parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(project_path / CACHE_FILE, data, indent=None)
+    except OSError:
+        pass
+
+def _fresh(project_path: Path, section: Dict[str, Any]) -> bool:
+    """
+    Whether a cached section's dependencies are unchanged. Paths modified
+    within RACY_NS of the build may have changed again without their
+    mtime moving, so they are never trusted.
+    """
+    for path, stat in section["deps"].items():
+        if _stat(project_path, path) != stat:
+            return False
+        if stat is not None and stat[0] >= section["built_ns"] - RACY_NS:
+            return False
+    return True
+
+def _sections(project_path: Path, cached: Dict[str, Dict[str, Any]], feature: Optional[Dict[str, Any]]):
+    """Every section, reusing the cached ones that are fresh. Returns (sections, rebuilt)."""
+    sections, rebuilt = {}, []
+    key = _feature_key(feature)
+    for name, build in SECTIONS:
+        section = cached.get(name)
+        if (section is None or not _fresh(project_path, section)
+                or (name in FEATURE_SECTIONS and section.get("feature") != key)):
+            built_ns = time.time_ns()
+            section = build(project_path, feature)
+            section["built_ns"] = built_ns
+            if name in FEATURE_SECTIONS:
+                section["feature"] = key
+            rebuilt.append(name)
+        sections[name] = section
+    return sections, rebuilt
+
+def compile_context(project_path: Path, output: str = WORKING_CONTEXT, quiet: bool = True,
+                    use_cache: bool = True, packed: bool = True,
+                    feature: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Compile the working context for feature into output (relative to
+    the project), rebuilding only the sections whose inputs changed since
+    the cached build. The loop passes the feature it selected; without
+    one it is current_feature(), as for the shell hooks. Returns
+    render()'s result without content, plus path, seconds, rebuilt
+    (section names) and cached (the previous document was reused).
+    """
+    start = time.perf_counter()
+    project_path = Path(project_path)
+    if feature is None:
+        feature = current_feature(project_path)
+    if not quiet:
+        print("🔧 Compiling working context...")
+    cache = _load_cache(project_path) if use_cache else {}
+    if cache.get("max_tokens") != MAX_TOKENS or cache.get("packed") != packed:
+        cache = {}
+    sections, rebuilt = _sections(project_path, cache.get("sections", {}), feature)
+
+    # A rebuilt section that came out the same leaves the document as it was
+    cached = bool(cache) and all(
+        sections[name]["items"] == cache["sections"].get(name, {}).get("items") for name in rebuilt)
+    if cached:
+        result = {key: cache[key] for key in ("tokens", "trimmed", "tokens_before", "dropped", "shortened")
+                  if key in cache}
+        content = cache["content"]
+        outputs = cache.get("outputs", {})
+    else:
+        result = _assemble(project_path, sections, MAX_TOKENS, packed)
+        if packed and result["trimmed"] and not quiet:
+            print(f"📦 Packed into {MAX_TOKENS} tokens: {result['dropped']} memory items left out, "
+                  f"{result['shortened']} trimmed")
+        elif result["trimmed"] and not quiet:
+            print(f"⚠️  Context over budget ({result['tokens_before']} > {MAX_TOKENS} tokens), trimming...")
+            print(f"   Trimmed to ~{result['tokens']} tokens")
+        stamp = datetime.now().astimezone().isoformat(timespec="seconds")
+        tokens = f"{result['tokens']} of {MAX_TOKENS}" if packed else f"~{result['tokens']}"
+        footer = f"\n---\nEstimated tokens: {tokens}\nCompiled: {stamp}\n".encode()
+        content = result.pop("content") + footer
+        outputs = {}
+
+    target = project_path / output
+    up_to_date = outputs.get(output) is not None and _stat(project_path, output) == outputs[output]
+    if not up_to_date:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(content)
+        outputs[output] = _stat(project_path, output)
+    if use_cache and (rebuilt or not up_to_date):
+        _save_cache(project_path, dict(result, max_tokens=MAX_TOKENS, packed=packed, sections=sections,
+                                       content=content, outputs=outputs))
+
+    if not quiet:
+        if cached:
+            print(f"✅ Working context up to date: {output} (~{result['tokens']} tokens, cached)")
+        else:
+            partial = f", rebuilt {', '.join(rebuilt)}" if cache and rebuilt else ""
+            print(f"✅ Working context compiled: {output} (~{result['tokens']} tokens{partial})")
+    result.update(path=target, seconds=time.perf_counter() - start, rebuilt=rebuilt, cached=cached)
+    return result
+
+# ============================================================================
+# Benchmark
+# ============================================================================
+
+def _without_stamp(path: Path) -> bytes:
+    return b"\n".join(line for line in _read(path).split(b"\n") if not line.startswith(b"Compiled: "))
+
+def benchmark(project_path: Path, runs: int = 10) -> Dict[str, Any]:
+    """
+    Time the native compiler - in the shell layout, packed, and packed
+    from its cache - against compile-context.sh on the same project (all
+    write to temporary files) and check the shell layout matches the
+    script's output. Returns median seconds per compiler (shell, native,
+    packed, cached), speedup and identical.
+    """
+    project_path = Path(project_path)
+    script = project_path / COMPILE_SCRIPT
+    if not script.exists():
+        raise FileNotFoundError(f"{script} not found (run setup-context-engineered.sh first)")
+    scratch = Path(tempfile.mkdtemp(prefix="context-bench-", dir=project_path / ".agent"))
+    shell_out = scratch / "shell.md"
+    native_out = scratch / "native.md"
+    packed_out = scratch / "packed.md"
+    env = dict(os.environ, WORKING_CONTEXT=str(shell_out), CONTEXT_ENGINE_SHELL_COMPILER="1")
+    timings: Dict[str, List[float]] = {"shell": [], "native": [], "packed": [], "cached": []}
+    try:
+        for _ in range(runs):
+            start = time.perf_counter()
+            subprocess.run(["bash", str(script)], cwd=str(project_path), env=env,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            timings["shell"].append(time.perf_counter() - start)
+            timings["native"].append(compile_context(project_path, str(native_out), use_cache=False,
+                                                     packed=False)["seconds"])
+            timings["packed"].append(compile_context(project_path, str(packed_out), use_cache=False)["seconds"])
+            timings["cached"].append(compile_context(project_path, str(packed_out))["seconds"])
+        identical = _without_stamp(shell_out) == _without_stamp(native_out)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    result = {key: statistics.median(values) for key, values in timings.items()}
+    result.update(runs=runs, speedup=result["shell"] / result["native"] if result["native"] else None,
+                  identical=identical)
+    return result
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile the working context")
+    parser.add_argument("project", nargs="?", type=Path, default=Path.cwd(), help="Project path")
+    parser.add_argument("--output", "-o", default=os.environ.get("WORKING_CONTEXT", WORKING_CONTEXT),
+                        help="Output file, relative to the project (default: $WORKING_CONTEXT or current.md)")
+    parser.add_argument("--benchmark", type=int, nargs="?", const=10, metavar="RUNS",
+                        help="Compare against compile-context.sh instead of compiling")
+    parser.add_argument("--shell-layout", action="store_true",
+                        help="Write compile-context.sh's document instead of packing memory into the budget")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Rebuild every section, ignoring {CACHE_FILE}")
+    args = parser.parse_args(argv)
+
+    if args.benchmark:
+        try:
+            result = benchmark(args.project, args.benchmark)
+        except FileNotFoundError as e:
+            print(f"❌ {e}")
+            return 1
+        print(f"compile-context.sh: {result['shell'] * 1000:8.1f} ms (median of {result['runs']})")
+        print(f"native compiler:    {result['native'] * 1000:8.1f} ms")
+        print(f"native, packed:     {result['packed'] * 1000:8.1f} ms")
+        print(f"packed, cached:     {result['cached'] * 1000:8.1f} ms")
+        if result["speedup"]:
+            print(f"speedup:            {result['speedup']:8.1f}x")
+        print("output:             " + ("identical" if result["identical"] else "DIFFERENT"))
+        return 0 if result["identical"] else 1
+
+    compile_context(args.project, args.output, quiet=False, use_cache=not args.no_cache,
+                    packed=not args.shell_layout)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""
+Critical-Path Scheduling
+========================
+History-weighted, critical-path-first feature selection.
+
+The default policy picks ready features in topological order (priority
+within a dependency level). When sessions run side by side, that can
+leave the longest dependency chain for last and stretch the whole run.
+The critical-path policy estimates how long each unfinished feature
+takes and picks the ready feature with the most work still chained
+behind it (its own estimate plus the longest path through its
+dependents), so long chains start early.
+
+Estimates come from .agent/metrics/session-metrics.jsonl: the wall time
+of every session spent on a completed feature, summed per feature, with
+the median taken per complexity level. Levels without history fall back
+to DEFAULT_DURATIONS.
+
+plan_schedule() simulates a run (N workers, either policy) without
+starting any session; loop-runner's --plan prints it with an ETA.
+"""
+
+import heapq
+import json
+from collections import deque
+from pathlib import Path
+from statistics import median
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+METRICS_FILE = ".agent/metrics/session-metrics.jsonl"
+POLICIES = ("priority", "critical-path")
+
+# Seconds per feature before any history exists
+DEFAULT_DURATIONS = {"low": 600.0, "medium": 1200.0, "high": 2400.0}
+
+# Events that close a session and carry its wall time
+SESSION_END_EVENTS = ("session_complete", "no_progress", "qa_generated_fixes")
+
+def estimate_durations(project_path: Path, features: List[Dict[str, Any]],
+                       complexity_of: Callable[[Dict[str, Any]], str]) -> Dict[str, float]:
+    """
+    Median seconds to complete a feature, per complexity level.
+    A feature's time is the sum of all its sessions' wall times; only
+    features with a session_complete event count.
+    """
+    spent: Dict[str, float] = {}
+    completed = set()
+    try:
+        with open(Path(project_path) / METRICS_FILE) as f:
+            for line in f:
+                try:
+                    event = json.loads(line)
+                    wall_time = float(event.get("wall_time_seconds") or 0)
+                except (ValueError, TypeError, AttributeError):
+                    continue
+                if event.get("event") not in SESSION_END_EVENTS or wall_time <= 0:
+                    continue
+                feature_id = event.get("feature_id")
+                spent[feature_id] = spent.get(feature_id, 0.0) + wall_time
+                if event.get("event") == "session_complete":
+                    completed.add(feature_id)
+    except OSError:
+        pass
+
+    samples: Dict[str, List[float]] = {}
+    seen = set()
+    for feat in features:
+        feature_id = feat.get("id")
+        if feature_id in completed and feature_id not in seen:
+            seen.add(feature_id)
+            samples.setdefault(complexity_of(feat), []).append(spent[feature_id])
+
+    durations = dict(DEFAULT_DURATIONS)
+    for level, times in samples.items():
+        durations[level] = float(median(times))
+    return durations
+
+def path_lengths(features: List[Dict[str, Any]],
+                 duration_of: Callable[[Dict[str, Any]], float]) -> Dict[Any, float]:
+    """
+    Remaining critical-path length of every unfinished feature: its own
+    duration plus the longest path through unfinished dependents.
+    Features on a dependency cycle count only their own duration.
+    """
+    by_id: Dict[Any, Dict[str, Any]] = {}
+    for feat in features:
+        if not feat.get("passes", False):
+            by_id.setdefault(feat.get("id"), feat)
+
+    dependents: Dict[Any, List[Any]] = {feature_id: [] for feature_id in by_id}
+    pending = {feature_id: 0 for feature_id in by_id}
+    for feature_id, feat in by_id.items():
+        for dep in set(feat.get("dependencies", []) or ()):
+            if dep in by_id and dep != feature_id:
+                dependents[dep].append(feature_id)
+                pending[dep] += 1
+
+    # Sinks first: a feature is final once every dependent is
+    lengths: Dict[Any, float] = {}
+    queue = deque(feature_id for feature_id, count in pending.items() if count == 0)
+    while queue:
+        feature_id = queue.popleft()
+        tail = max((lengths[d] for d in dependents[feature_id]), default=0.0)
+        lengths[feature_id] = duration_of(by_id[feature_id]) + tail
+        for dep in set(by_id[feature_id].get("dependencies", []) or ()):
+            if dep in pending and dep != feature_id:
+                pending[dep] -= 1
+                if pending[dep] == 0:
+                    queue.append(dep)
+    for feature_id, feat in by_id.items():
+        if feature_id not in lengths:
+            lengths[feature_id] = duration_of(feat)
+    return lengths
+
+def order_ready(ready: List[Dict[str, Any]], lengths: Dict[Any, float]) -> List[Dict[str, Any]]:
+    """Ready features, longest remaining path first (stable for ties)."""
+    return sorted(ready, key=lambda feat: -lengths.get(feat.get("id"), 0.0))
+
+# ============================================================================
+# Dry-Run Planning
+# ============================================================================
+
+class PlannedSession(NamedTuple):
+    feature: Dict[str, Any]
+    worker: int
+    start: float       # seconds from now
+    end: float
+    path_length: float
+
+def plan_schedule(features: List[Dict[str, Any]], duration_of: Callable[[Dict[str, Any]], float],
+                  policy: str = "priority", workers: int = 1,
+                  skip_needs_review: bool = False) -> List[PlannedSession]:
+    """
+    Simulate running every reachable unfinished feature on `workers`
+    parallel sessions, assuming each takes its estimated duration.
+
+    Blocked features (and features waiting on them) are left out, as are
+    needs_review features when skip_needs_review is set. Returns the
+    sessions in start order; the last end time is the projected makespan.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown scheduling policy: {policy}")
+    # Imported here to keep this module free of feature_store at import time
+    from context_engine.feature_store import topological_sort_features
+
+    lengths = path_lengths(features, duration_of)
+    rank = {id(feat): pos for pos, feat in enumerate(topological_sort_features(features))}
+    done = {feat.get("id") for feat in features if feat.get("passes", False)}
+
+    def key(feat):
+        if policy == "critical-path":
+            return (-lengths.get(feat.get("id"), 0.0), rank[id(feat)])
+        return (rank[id(feat)],)
+
+    # Same bookkeeping as the ready-set scheduler: unmet dependency counts
+    # and a heap of ready features
+    unmet: Dict[Any, int] = {}
+    dependents: Dict[Any, List[Dict[str, Any]]] = {}
+    ready: List[Tuple[Any, int, Dict[str, Any]]] = []
+    for feat in features:
+        feature_id = feat.get("id")
+        if (feature_id in done or feature_id in unmet or id(feat) not in rank
+                or feat.get("blocked", False)
+                or (skip_needs_review and feat.get("needs_review", False))):
+            continue
+        deps = set(feat.get("dependencies", []) or ()) - done
+        unmet[feature_id] = len(deps)
+        for dep in deps:
+            dependents.setdefault(dep, []).append(feat)
+        if not deps:
+            heapq.heappush(ready, (key(feat), rank[id(feat)], feat))
+
+    plan: List[PlannedSession] = []
+    free = list(range(max(1, workers)))
+    running: List[Tuple[float, int, PlannedSession]] = []
+    now = 0.0
+    while True:
+        while ready and free:
+            feat = heapq.heappop(ready)[2]
+            duration = duration_of(feat)
+            session = PlannedSession(feat, heapq.heappop(free), now, now + duration,
+                                     lengths.get(feat.get("id"), duration))
+            heapq.heappush(running, (session.end, len(plan), session))
+            plan.append(session)
+        if not running:
+            return plan
+        # Advance to the next session finishing
+        now, _, finished = heapq.heappop(running)
+        heapq.heappush(free, finished.worker)
+        for feat in dependents.get(finished.feature.get("id"), ()):
+            feature_id = feat.get("id")
+            unmet[feature_id] -= 1
+            if unmet[feature_id] == 0:
+                heapq.heappush(ready, (key(feat), rank[id(feat)], feat))
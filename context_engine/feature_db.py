@@ -0,0 +1,420 @@
+"""
+SQLite Feature Backend
+======================
+Keeps feature state in an indexed SQLite database at .agent/features.db.
+
+feature_list.json stays the interchange format the agent reads and edits,
+but becomes a view: it is imported when it changes on disk and regenerated
+by export_json() (via flush()) when the harness needs the agent to see its
+changes. Harness mutations such as blocking or passing a feature update a
+single row instead of rewriting the whole document.
+
+Indexed queries (ready set, status counts, blocked report) stay fast at
+100k+ features:
+- status counts come from a counters table maintained by triggers
+- each row tracks unmet_deps, updated by trigger when a dependency passes
+- the ready set is a partial index over topo_rank, and one over
+  (priority, position) for the orchestrator's ordering
+
+Implements the same interface as feature_store.FeatureStore. Select it with
+CONTEXT_ENGINE_FEATURE_BACKEND=sqlite or --feature-backend sqlite.
+A list with duplicate feature ids is refused (DuplicateFeatureError) rather
+than imported, since one row per id would drop the copies on export.
+"""
+
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from context_engine.atomic import write_json_atomic
+from context_engine.feature_store import FEATURE_FILE, topological_sort_features
+
+DB_FILE = ".agent/features.db"
+
+# next_feature() orderings (see scheduler.py for the in-memory equivalent)
+ORDER_BY = {
+    "topological": "topo_rank",
+    "priority": "priority, position",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS features (
+    id           TEXT PRIMARY KEY,
+    position     INTEGER NOT NULL,
+    topo_rank    INTEGER NOT NULL,
+    priority     NOT NULL DEFAULT 99,
+    passes       INTEGER NOT NULL DEFAULT 0,
+    blocked      INTEGER NOT NULL DEFAULT 0,
+    needs_review INTEGER NOT NULL DEFAULT 0,
+    unmet_deps   INTEGER NOT NULL DEFAULT 0,
+    doc          TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS dependencies (
+    feature_id TEXT NOT NULL,
+    dep_id     TEXT NOT NULL,
+    PRIMARY KEY (feature_id, dep_id)
+);
+CREATE INDEX IF NOT EXISTS dependencies_by_dep ON dependencies(dep_id);
+
+CREATE INDEX IF NOT EXISTS features_ready ON features(topo_rank)
+    WHERE passes = 0 AND blocked = 0 AND unmet_deps = 0;
+CREATE INDEX IF NOT EXISTS features_ready_priority ON features(priority, position)
+    WHERE passes = 0 AND blocked = 0 AND unmet_deps = 0;
+CREATE INDEX IF NOT EXISTS features_blocked ON features(position)
+    WHERE blocked = 1;
+CREATE INDEX IF NOT EXISTS features_pending ON features(position)
+    WHERE passes = 0;
+CREATE INDEX IF NOT EXISTS features_review ON features(position)
+    WHERE needs_review = 1;
+
+CREATE TABLE IF NOT EXISTS counters (
+    name  TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+
+-- Harness changes not yet exported; replayed on top of an imported JSON
+-- so edits made by the agent and by the harness both survive.
+CREATE TABLE IF NOT EXISTS pending_changes (
+    seq        INTEGER PRIMARY KEY AUTOINCREMENT,
+    feature_id TEXT NOT NULL,
+    fields     TEXT NOT NULL,
+    clear      TEXT NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS features_passes_changed
+AFTER UPDATE OF passes ON features
+WHEN NEW.passes != OLD.passes
+BEGIN
+    UPDATE features
+       SET unmet_deps = unmet_deps + (CASE WHEN NEW.passes THEN -1 ELSE 1 END)
+     WHERE id IN (SELECT feature_id FROM dependencies WHERE dep_id = NEW.id);
+    UPDATE counters
+       SET value = value + (CASE WHEN NEW.passes THEN 1 ELSE -1 END)
+     WHERE name = 'completed';
+END;
+
+CREATE TRIGGER IF NOT EXISTS features_blocked_changed
+AFTER UPDATE OF blocked ON features
+WHEN NEW.blocked != OLD.blocked
+BEGIN
+    UPDATE counters
+       SET value = value + (CASE WHEN NEW.blocked THEN 1 ELSE -1 END)
+     WHERE name = 'blocked';
+END;
+"""
+
+class DuplicateFeatureError(ValueError):
+    """feature_list.json repeats a feature id, so it cannot be imported."""
+
+def _flag(feature: Dict[str, Any], key: str) -> int:
+    return 1 if feature.get(key, False) else 0
+
+class SqliteFeatureStore:
+    """
+    SQLite-backed feature store with the FeatureStore query interface.
+    """
+
+    def __init__(self, project_path: Path, db_path: Optional[Path] = None):
+        self.project_path = Path(project_path)
+        self.feature_file = self.project_path / FEATURE_FILE
+        self.db_path = db_path or self.project_path / DB_FILE
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self._migrate()
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+        self._dirty = self.conn.execute("SELECT COUNT(*) FROM pending_changes").fetchone()[0] > 0
+
+    def _migrate(self):
+        """Bring databases created by older versions up to SCHEMA."""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(features)")}
+        if columns and "priority" not in columns:
+            self.conn.execute("ALTER TABLE features ADD COLUMN priority NOT NULL DEFAULT 99")
+            # Force a re-import to fill the new column
+            self.conn.execute("DELETE FROM meta WHERE key = 'json_stamp'")
+
+    # ------------------------------------------------------------------------
+    # JSON view
+    # ------------------------------------------------------------------------
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.feature_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def _record_stamp(self):
+        self._set_meta("json_stamp", json.dumps(self._file_stamp()))
+
+    def exists(self) -> bool:
+        return self._file_stamp() is not None
+
+    def refresh(self) -> bool:
+        """
+        Import feature_list.json if it changed since the last import/export.
+        Regenerates the JSON from the database if it is missing.
+        Returns True if the database was reloaded.
+
+        Raises json.JSONDecodeError if the file is not valid JSON, and
+        DuplicateFeatureError if it repeats a feature id; the database is
+        left as it was and the next call tries again.
+        """
+        stamp = self._file_stamp()
+        if stamp is None:
+            if self._count("total"):
+                self.export_json()
+            return False
+        if json.dumps(stamp) == self._meta("json_stamp"):
+            return False
+        self.import_json()
+        return True
+
+    def invalidate(self):
+        """Force the next refresh() to re-import feature_list.json."""
+        self._set_meta("json_stamp", "")
+        self.conn.commit()
+
+    def import_json(self):
+        """Replace database contents with feature_list.json, then replay
+        any harness changes that were never exported."""
+        with open(self.feature_file) as f:
+            data = json.load(f)
+        features = data.get("features", []) if isinstance(data, dict) else []
+        seen, duplicates = set(), []
+        for feat in features:
+            feat_id = feat.get("id")
+            if feat_id in seen and feat_id not in duplicates:
+                duplicates.append(feat_id)
+            seen.add(feat_id)
+        if duplicates:
+            raise DuplicateFeatureError(
+                f"Duplicate feature ID(s) in {FEATURE_FILE}: {', '.join(map(str, duplicates[:10]))}"
+                f"{' ...' if len(duplicates) > 10 else ''} (run loop-runner.py --validate)")
+
+        pending = self.conn.execute(
+            "SELECT feature_id, fields, clear FROM pending_changes ORDER BY seq"
+        ).fetchall()
+
+        document = {k: v for k, v in data.items() if k != "features"} if isinstance(data, dict) else {}
+        self._load(features, document)
+        for feature_id, fields, clear in pending:
+            self._apply(feature_id, json.loads(fields), json.loads(clear))
+        self._record_stamp()
+        self.conn.commit()
+        if pending:
+            # Agent edits and harness edits are merged; write them back out.
+            self.export_json()
+
+    def _load(self, features: List[Dict[str, Any]], document: Dict[str, Any]):
+        conn = self.conn
+        conn.execute("DELETE FROM features")
+        conn.execute("DELETE FROM dependencies")
+        conn.execute("DELETE FROM pending_changes")
+
+        ranks = {}
+        for rank, feat in enumerate(topological_sort_features(features)):
+            ranks.setdefault(feat.get("id"), rank)
+
+        passed = {f.get("id") for f in features if f.get("passes", False)}
+        rows = []
+        deps_rows = []
+        for position, feat in enumerate(features):
+            feat_id = feat.get("id")
+            deps = set(feat.get("dependencies", []))
+            deps_rows.extend((feat_id, dep) for dep in deps)
+            rows.append((
+                feat_id, position, ranks.get(feat_id, position), feat.get("priority", 99),
+                _flag(feat, "passes"), _flag(feat, "blocked"), _flag(feat, "needs_review"),
+                sum(1 for dep in deps if dep not in passed),
+                json.dumps(feat)
+            ))
+
+        conn.executemany(
+            "INSERT INTO features (id, position, topo_rank, priority, passes, blocked, "
+            "needs_review, unmet_deps, doc) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        conn.executemany("INSERT INTO dependencies (feature_id, dep_id) VALUES (?, ?)", deps_rows)
+        conn.executemany("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", [
+            ("total", len(rows)),
+            ("completed", sum(r[4] for r in rows)),
+            ("blocked", sum(r[5] for r in rows)),
+        ])
+        self._set_meta("document", json.dumps(document))
+        self._dirty = False
+
+    def export_json(self):
+        """Regenerate feature_list.json from the database."""
+        document = json.loads(self._meta("document") or "{}")
+        document["features"] = [json.loads(doc) for (doc,) in
+                                self.conn.execute("SELECT doc FROM features ORDER BY position")]
+        write_json_atomic(self.feature_file, document)
+        self.conn.execute("DELETE FROM pending_changes")
+        self._record_stamp()
+        self.conn.commit()
+        self._dirty = False
+
+    def flush(self):
+        """Export feature_list.json if the harness changed anything since
+        the last export. Call before handing the tree to an agent."""
+        if self._dirty:
+            self.export_json()
+
+    # ------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------
+
+    def _count(self, name: str) -> int:
+        row = self.conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def _docs(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return [json.loads(doc) for (doc,) in self.conn.execute(sql, params)]
+
+    @property
+    def features(self) -> List[Dict[str, Any]]:
+        return self._docs("SELECT doc FROM features ORDER BY position")
+
+    def get(self, feature_id: str) -> Optional[Dict[str, Any]]:
+        docs = self._docs("SELECT doc FROM features WHERE id = ?", (feature_id,))
+        return docs[0] if docs else None
+
+    def status(self) -> Dict[str, int]:
+        """Completion counts: total, completed, remaining, blocked."""
+        total = self._count("total")
+        completed = self._count("completed")
+        return {
+            "total": total,
+            "completed": completed,
+            "remaining": total - completed,
+            "blocked": self._count("blocked")
+        }
+
+    def pending_features(self) -> Iterator[Dict[str, Any]]:
+        """Features not yet passing, in file order."""
+        return iter(self._docs(
+            "SELECT doc FROM features WHERE passes = 0 ORDER BY position"))
+
+    def next_feature(self, skip_needs_review: bool = False,
+                     order: str = "topological") -> Optional[Dict[str, Any]]:
+        """Next ready feature in topological or priority order."""
+        if order not in ORDER_BY:
+            raise ValueError(f"Unknown ordering: {order}")
+        sql = ("SELECT doc FROM features "
+               "WHERE passes = 0 AND blocked = 0 AND unmet_deps = 0")
+        if skip_needs_review:
+            sql += " AND needs_review = 0"
+        docs = self._docs(sql + f" ORDER BY {ORDER_BY[order]} LIMIT 1")
+        return docs[0] if docs else None
+
+    def ready_features(self, limit: Optional[int] = None, skip_needs_review: bool = False,
+                       exclude: Iterable[str] = (),
+                       order: str = "topological") -> List[Dict[str, Any]]:
+        """Features that could run now, in next_feature() order."""
+        if order not in ORDER_BY:
+            raise ValueError(f"Unknown ordering: {order}")
+        exclude = list(exclude)
+        sql = ("SELECT doc FROM features "
+               "WHERE passes = 0 AND blocked = 0 AND unmet_deps = 0")
+        if skip_needs_review:
+            sql += " AND needs_review = 0"
+        if exclude:
+            sql += " AND id NOT IN (%s)" % ",".join("?" * len(exclude))
+        sql += f" ORDER BY {ORDER_BY[order]}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return self._docs(sql, tuple(exclude))
+
+    def blocked_features(self) -> List[Dict[str, Any]]:
+        """Blocked features in file order."""
+        return self._docs(
+            "SELECT doc FROM features WHERE blocked = 1 ORDER BY position")
+
+    def features_needing_review(self) -> List[Dict[str, Any]]:
+        """Unfinished, unblocked needs_review features whose deps are met."""
+        return self._docs(
+            "SELECT doc FROM features "
+            "WHERE passes = 0 AND blocked = 0 AND unmet_deps = 0 AND needs_review = 1 "
+            "ORDER BY position")
+
+    # ------------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------------
+
+    def update_feature(self, feature_id: str, fields: Optional[Dict[str, Any]] = None,
+                       clear: Iterable[str] = ()) -> bool:
+        """
+        Set and/or remove fields on a feature (one row update).
+        Call save() to commit. Returns False if the feature is unknown.
+        """
+        fields = fields or {}
+        clear = list(clear)
+        if not self._apply(feature_id, fields, clear):
+            return False
+        self.conn.execute(
+            "INSERT INTO pending_changes (feature_id, fields, clear) VALUES (?, ?, ?)",
+            (feature_id, json.dumps(fields), json.dumps(clear)))
+        self._dirty = True
+        return True
+
+    def _apply(self, feature_id: str, fields: Dict[str, Any], clear: List[str]) -> bool:
+        row = self.conn.execute("SELECT doc FROM features WHERE id = ?", (feature_id,)).fetchone()
+        if row is None:
+            return False
+        feat = json.loads(row[0])
+        feat.update(fields)
+        for key in clear:
+            feat.pop(key, None)
+
+        self.conn.execute(
+            "UPDATE features SET priority = ?, passes = ?, blocked = ?, needs_review = ?, doc = ? "
+            "WHERE id = ?",
+            (feat.get("priority", 99), _flag(feat, "passes"), _flag(feat, "blocked"),
+             _flag(feat, "needs_review"), json.dumps(feat), feature_id))
+
+        if "dependencies" in fields or "dependencies" in clear:
+            self._set_dependencies(feature_id, feat.get("dependencies", []))
+        if "dependencies" in fields or "priority" in fields or "priority" in clear:
+            self._recompute_ranks()
+        return True
+
+    def _set_dependencies(self, feature_id: str, deps: List[str]):
+        deps = set(deps)
+        self.conn.execute("DELETE FROM dependencies WHERE feature_id = ?", (feature_id,))
+        self.conn.executemany("INSERT INTO dependencies (feature_id, dep_id) VALUES (?, ?)",
+                              [(feature_id, dep) for dep in deps])
+        passed = {fid for (fid,) in self.conn.execute(
+            "SELECT id FROM features WHERE passes = 1 AND id IN (%s)" % ",".join("?" * len(deps)),
+            tuple(deps))} if deps else set()
+        self.conn.execute("UPDATE features SET unmet_deps = ? WHERE id = ?",
+                          (len(deps - passed), feature_id))
+
+    def _recompute_ranks(self):
+        """Recompute topological ranks after a dependency or priority edit."""
+        features = self.features
+        ranks = {}
+        for rank, feat in enumerate(topological_sort_features(features)):
+            ranks.setdefault(feat.get("id"), rank)
+        self.conn.executemany("UPDATE features SET topo_rank = ? WHERE id = ?",
+                              [(rank, feat_id) for feat_id, rank in ranks.items()])
+
+    def save(self):
+        """Commit pending changes to the database (feature_list.json is
+        regenerated by flush())."""
+        self.conn.commit()
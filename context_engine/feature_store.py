@@ -0,0 +1,403 @@
+"""
+Feature Store
+=============
+In-process cache of feature_list.json shared by every harness query.
+
+The file is parsed once and only re-read when its (mtime, size, inode)
+stamp changes. Status counts, next-feature selection, blocked and
+needs-review lookups are then served from in-memory indexes instead of
+re-parsing the whole document for every call.
+
+Usage:
+    store = get_store(project_path)
+    store.status()
+    store.next_feature(skip_needs_review=True)
+
+Mutations are batched: update_feature() changes the in-memory document,
+save() appends the batch to an fsync'd journal, and flush() rewrites
+feature_list.json once via temp-file + rename. A journal left behind by a
+crashed run is replayed the next time the file is loaded.
+
+Set CONTEXT_ENGINE_FEATURE_BACKEND=sqlite (or call set_backend("sqlite"))
+to keep feature state in .agent/features.db instead; see feature_db.py.
+"""
+
+import json
+import os
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from context_engine.atomic import write_json_atomic
+from context_engine.scheduler import ReadyScheduler
+
+FEATURE_FILE = "feature_list.json"
+JOURNAL_FILE = ".agent/feature_list.journal"
+BACKENDS = ("json", "sqlite")
+BACKEND = os.environ.get("CONTEXT_ENGINE_FEATURE_BACKEND", "json")
+
+# ============================================================================
+# Topological Sort for Dependencies
+# ============================================================================
+
+def topological_sort_features(features: list) -> list:
+    """
+    Sort features respecting dependencies (Kahn's algorithm).
+    Features with satisfied dependencies come first.
+    Falls back to priority sort if no dependencies.
+    """
+    # Build graph
+    in_degree = {}
+    graph = {}
+    feat_map = {}
+
+    for feat in features:
+        feat_id = feat.get('id', '')
+        feat_map[feat_id] = feat
+        in_degree[feat_id] = 0
+        graph[feat_id] = []
+
+    # Count incoming edges (dependencies)
+    for feat in features:
+        feat_id = feat.get('id', '')
+        deps = feat.get('dependencies', [])
+        for dep in deps:
+            if dep in graph:
+                graph[dep].append(feat_id)
+                in_degree[feat_id] += 1
+
+    # Start with features that have no unmet dependencies
+    queue = deque()
+    for feat_id, degree in in_degree.items():
+        if degree == 0:
+            queue.append(feat_id)
+
+    # Sort by priority within the queue
+    sorted_result = []
+    while queue:
+        # Sort current batch by priority
+        batch = sorted(queue, key=lambda x: feat_map[x].get('priority', 99))
+        queue.clear()
+
+        for feat_id in batch:
+            sorted_result.append(feat_map[feat_id])
+
+            # Reduce in-degree for dependent features
+            for neighbor in graph.get(feat_id, []):
+                in_degree[neighbor] -= 1
+                if in_degree[neighbor] == 0:
+                    queue.append(neighbor)
+
+    # If some features weren't sorted (cycle), add them at the end
+    if len(sorted_result) < len(features):
+        sorted_ids = {f.get('id') for f in sorted_result}
+        for feat in features:
+            if feat.get('id') not in sorted_ids:
+                sorted_result.append(feat)
+
+    return sorted_result
+
+# ============================================================================
+# Write Journal
+# ============================================================================
+
+def read_journal(project_path: Path) -> List[Dict[str, Any]]:
+    """
+    Changes saved but not yet flushed to feature_list.json, oldest first.
+    Each is {"id": ..., "set": {...}, "clear": [...]}.
+    """
+    changes = []
+    try:
+        with open(Path(project_path) / JOURNAL_FILE) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return changes
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue  # torn final append from a crash
+        changes.extend(entry.get("changes", []))
+    return changes
+
+# ============================================================================
+# Feature Store
+# ============================================================================
+
+class FeatureStore:
+    """
+    Cached, stamp-validated view of a project's feature_list.json.
+
+    Call refresh() (get_store() does this for you) before querying; it
+    costs a single stat() when the file has not changed.
+    """
+
+    def __init__(self, project_path: Path):
+        self.project_path = Path(project_path)
+        self.feature_file = self.project_path / FEATURE_FILE
+        self.journal_file = self.project_path / JOURNAL_FILE
+        self.data: Dict[str, Any] = {}
+        self.features: List[Dict[str, Any]] = []
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.completed_ids: set = set()
+        self._completed_count = 0
+        self._blocked: List[Dict[str, Any]] = []
+        self._review: List[Dict[str, Any]] = []
+        self._scheduler = ReadyScheduler()
+        self._stamp: Optional[Tuple[int, int, int]] = None
+        self._loaded = False
+        self._index_dirty = False
+        self._pending: List[Dict[str, Any]] = []  # changes since last save()
+        self._dirty = False  # journaled changes not yet flushed
+
+    # ------------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------------
+
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """Return (mtime_ns, size, inode) for the feature file, or None."""
+        try:
+            st = os.stat(self.feature_file)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def exists(self) -> bool:
+        return self._file_stamp() is not None
+
+    def refresh(self) -> bool:
+        """
+        Reload feature_list.json if it changed on disk.
+        Returns True if the file was (re)parsed.
+
+        Raises json.JSONDecodeError if the file is not valid JSON; the
+        cache is cleared so the next call tries again.
+        """
+        stamp = self._file_stamp()
+        if self._loaded and stamp == self._stamp:
+            return False
+
+        if stamp is None:
+            self._load({})
+            self._stamp = None
+            return True
+
+        try:
+            with open(self.feature_file) as f:
+                data = json.load(f)
+        except json.JSONDecodeError:
+            self._load({})
+            self._loaded = False
+            raise
+
+        self._load(data)
+        # Stamp taken before reading: a write racing with the read leaves
+        # a newer stamp on disk, so the next refresh picks it up.
+        self._stamp = stamp
+
+        replayed = self._replay_journal()
+        if replayed and not self._dirty:
+            # Journal left behind by a run that died before flushing
+            self._dirty = True
+            self.flush()
+        return True
+
+    def invalidate(self):
+        """Force the next refresh() to re-read the file."""
+        self._loaded = False
+
+    def _load(self, data: Dict[str, Any]):
+        self.data = data
+        self.features = data.get("features", []) if isinstance(data, dict) else []
+        self.by_id = {}
+        for feat in self.features:
+            self.by_id.setdefault(feat.get("id"), feat)
+        self._scheduler.sync(self.features)
+        self._reindex()
+        self._loaded = True
+
+    def _replay_journal(self) -> int:
+        """
+        Re-apply journaled and unsaved changes on top of a freshly loaded
+        document. Returns the number of journaled changes applied.
+        """
+        replayed = 0
+        for change in read_journal(self.project_path):
+            self._apply(change.get("id"), change.get("set"), change.get("clear", ()))
+            replayed += 1
+        for change in self._pending:
+            self._apply(change["id"], change["set"], change["clear"])
+        return replayed
+
+    def _reindex(self):
+        """Rebuild the flag indexes (cheap - no parsing, no sorting)."""
+        self.completed_ids = set()
+        self._completed_count = 0
+        self._blocked = []
+        self._review = []
+        for feat in self.features:
+            if feat.get("passes", False):
+                self.completed_ids.add(feat.get("id"))
+                self._completed_count += 1
+            if feat.get("blocked", False):
+                self._blocked.append(feat)
+            if feat.get("needs_review", False):
+                self._review.append(feat)
+        self._index_dirty = False
+
+    def _ensure_index(self):
+        if self._index_dirty:
+            self._reindex()
+
+    # ------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------
+
+    def get(self, feature_id: str) -> Optional[Dict[str, Any]]:
+        return self.by_id.get(feature_id)
+
+    def status(self) -> Dict[str, int]:
+        """Completion counts: total, completed, remaining, blocked."""
+        self._ensure_index()
+        total = len(self.features)
+        completed = self._completed_count
+        return {
+            "total": total,
+            "completed": completed,
+            "remaining": total - completed,
+            "blocked": len(self._blocked)
+        }
+
+    def deps_met(self, feature: Dict[str, Any]) -> bool:
+        self._ensure_index()
+        return all(dep in self.completed_ids for dep in feature.get("dependencies", []))
+
+    def next_feature(self, skip_needs_review: bool = False,
+                     order: str = "topological") -> Optional[Dict[str, Any]]:
+        """
+        Next feature to implement, respecting dependencies.
+        Optionally skips features marked needs_review (for unattended runs).
+
+        order is "topological" (loop-runner) or "priority" (orchestrator);
+        see scheduler.py. Served from the ready heap in O(log n).
+        """
+        return self._scheduler.next(order, skip_needs_review)
+
+    def ready_features(self, limit: Optional[int] = None, skip_needs_review: bool = False,
+                       exclude: Iterable[str] = (),
+                       order: str = "topological") -> List[Dict[str, Any]]:
+        """
+        Features that could run now, in next_feature() order. None of them
+        depends on another (each one's dependencies have all passed).
+        """
+        return self._scheduler.ready(order, skip_needs_review, limit, exclude)
+
+    def pending_features(self) -> Iterator[Dict[str, Any]]:
+        """Features not yet passing, in file order."""
+        return (f for f in self.features if not f.get("passes", False))
+
+    def blocked_features(self) -> List[Dict[str, Any]]:
+        """Blocked features in file order."""
+        self._ensure_index()
+        return list(self._blocked)
+
+    def features_needing_review(self) -> List[Dict[str, Any]]:
+        """Unfinished, unblocked needs_review features whose deps are met."""
+        self._ensure_index()
+        return [
+            feat for feat in self._review
+            if not feat.get("passes") and not feat.get("blocked") and self.deps_met(feat)
+        ]
+
+    # ------------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------------
+
+    def update_feature(self, feature_id: str, fields: Optional[Dict[str, Any]] = None,
+                       clear: Iterable[str] = ()) -> bool:
+        """
+        Set and/or remove fields on a feature in memory.
+        Call save() to record the change and flush() to write the file.
+        Returns False if the feature is unknown.
+        """
+        clear = list(clear)
+        if not self._apply(feature_id, fields, clear):
+            return False
+        self._pending.append({"id": feature_id, "set": fields or {}, "clear": clear})
+        return True
+
+    def _apply(self, feature_id: str, fields: Optional[Dict[str, Any]],
+               clear: Iterable[str]) -> bool:
+        feat = self.by_id.get(feature_id)
+        if feat is None:
+            return False
+        if fields:
+            feat.update(fields)
+        for key in clear:
+            feat.pop(key, None)
+        self._scheduler.feature_changed(feature_id)
+        self._index_dirty = True
+        return True
+
+    def save(self):
+        """
+        Durably record changes made since the last save() as one journal
+        entry (a single fsync'd append - feature_list.json is untouched).
+        """
+        if not self._pending:
+            return
+        self.journal_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.journal_file, "a") as f:
+            f.write(json.dumps({"changes": self._pending}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self._pending = []
+        self._dirty = True
+
+    def flush(self):
+        """
+        Rewrite feature_list.json with every change in one atomic write,
+        then clear the journal. No-op when nothing changed.
+        """
+        if not self._pending and not self._dirty:
+            return
+        write_json_atomic(self.feature_file, self.data)
+        self._stamp = self._file_stamp()
+        self._pending = []
+        try:
+            os.truncate(self.journal_file, 0)
+        except OSError:
+            pass
+        self._dirty = False
+
+# ============================================================================
+# Shared Instances
+# ============================================================================
+
+_STORES: Dict[Tuple[Path, str], Any] = {}
+
+def set_backend(name: str):
+    """Select the storage backend used by get_store(): 'json' or 'sqlite'."""
+    global BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown feature backend: {name}")
+    BACKEND = name
+
+def get_store(project_path: Path, backend: Optional[str] = None):
+    """
+    Return the process-wide feature store for a project, refreshed from disk.
+    Raises json.JSONDecodeError if feature_list.json is invalid (and, for
+    the sqlite backend, DuplicateFeatureError if it repeats a feature id).
+    """
+    backend = backend or BACKEND
+    key = (Path(project_path).expanduser().resolve(), backend)
+    store = _STORES.get(key)
+    if store is None:
+        if backend == "sqlite":
+            from context_engine.feature_db import SqliteFeatureStore
+            store = SqliteFeatureStore(key[0])
+        else:
+            store = FeatureStore(key[0])
+        _STORES[key] = store
+    store.refresh()
+    return store
@@ -0,0 +1,247 @@
+"""
+Streaming Feature Reader
+========================
+Walks the "features" array of feature_list.json one feature at a time.
+
+json.load() materializes the whole document; with verbose QA-generated
+features that can be hundreds of MB. This reader keeps only a bounded
+window of the file (one chunk plus the feature being decoded) and each
+feature is decoded, inspected and dropped before the next one is read.
+
+Scans built on it keep just the columns they need (id, dependencies,
+passes/blocked/needs_review flags), so --validate, --show-blocked and
+--status run in memory proportional to the number of features, not the
+size of the file.
+
+Syntax errors raise StreamDecodeError, a json.JSONDecodeError carrying
+the line and column of the problem, formatted like json.load's errors.
+"""
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from context_engine.feature_store import read_journal
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_CHARS = re.compile(r"[0-9.eE+\-]*")
+_DECODER = json.JSONDecoder()
+
+class StreamDecodeError(json.JSONDecodeError):
+    """JSONDecodeError for a document that was never held in memory."""
+
+    def __init__(self, msg: str, pos: int, lineno: int, colno: int):
+        ValueError.__init__(self, "%s: line %d column %d (char %d)" % (msg, lineno, colno, pos))
+        self.msg = msg
+        self.doc = ""
+        self.pos = pos
+        self.lineno = lineno
+        self.colno = colno
+
+    def __reduce__(self):
+        return self.__class__, (self.msg, self.pos, self.lineno, self.colno)
+
+class _Reader:
+    """Sliding text window over a file with line/column bookkeeping."""
+
+    def __init__(self, f, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        # Location of buf[0] in the file
+        self.offset = 0
+        self.line = 1
+        self.col = 1
+
+    def _compact(self):
+        """Drop consumed text from the window."""
+        if not self.pos:
+            return
+        newlines = self.buf.count("\n", 0, self.pos)
+        if newlines:
+            self.line += newlines
+            self.col = self.pos - self.buf.rfind("\n", 0, self.pos)
+        else:
+            self.col += self.pos
+        self.offset += self.pos
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+
+    def _read(self, size: int) -> bool:
+        self._compact()
+        data = self.f.read(size)
+        if not data:
+            self.eof = True
+            return False
+        self.buf += data
+        return True
+
+    def location(self, pos: int) -> Tuple[int, int]:
+        """(line, column) of a window position, both 1-based."""
+        newlines = self.buf.count("\n", 0, pos)
+        if newlines:
+            return self.line + newlines, pos - self.buf.rfind("\n", 0, pos)
+        return self.line, self.col + pos
+
+    def error(self, msg: str, pos: int) -> StreamDecodeError:
+        line, col = self.location(pos)
+        return StreamDecodeError(msg, self.offset + pos, line, col)
+
+    def peek(self) -> str:
+        """Skip whitespace and return the next character ('' at end of file)."""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._read(self.chunk_size):
+                return ""
+
+    def expect(self, char: str, msg: str):
+        if self.peek() != char:
+            raise self.error(msg, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next JSON value, reading more of the file as needed."""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                obj, end = _DECODER.raw_decode(self.buf, self.pos)
+                # A number cut by the window edge ("-25" of "-25.0") may
+                # continue in the file
+                if self.eof or _NUMBER_CHARS.match(self.buf, end).end() < len(self.buf):
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError as e:
+                truncated = e.msg.startswith("Unterminated string") or e.pos >= len(self.buf) - 16
+                if self.eof or not truncated:
+                    raise self.error(e.msg, e.pos) from None
+            # Double the read each retry so a huge value costs O(size) overall
+            self._read(size)
+            size *= 2
+
+def iter_features(feature_file: Path,
+                  chunk_size: int = CHUNK_SIZE) -> Iterator[Tuple[Any, int, int]]:
+    """
+    Yield (feature, line, column) for each entry of the top-level
+    "features" array. Other top-level keys are decoded and discarded.
+    Yields nothing if the document is not an object with a features array.
+
+    Raises StreamDecodeError on malformed JSON.
+    """
+    with open(feature_file) as f:
+        reader = _Reader(f, chunk_size)
+        if reader.peek() != "{":
+            reader.value()
+        else:
+            reader.pos += 1
+            if reader.peek() == "}":
+                reader.pos += 1
+            else:
+                while True:
+                    if reader.peek() != '"':
+                        raise reader.error("Expecting property name enclosed in double quotes",
+                                           reader.pos)
+                    key = reader.value()
+                    reader.expect(":", "Expecting ':' delimiter")
+                    if key == "features" and reader.peek() == "[":
+                        yield from _iter_array(reader)
+                    else:
+                        reader.value()
+                    char = reader.peek()
+                    reader.pos += 1
+                    if char == "}":
+                        break
+                    if char != ",":
+                        raise reader.error("Expecting ',' delimiter", reader.pos - 1)
+        if reader.peek():
+            raise reader.error("Extra data", reader.pos)
+
+def _iter_array(reader: _Reader) -> Iterator[Tuple[Any, int, int]]:
+    reader.pos += 1
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        reader.peek()
+        line, col = reader.location(reader.pos)
+        yield reader.value(), line, col
+        char = reader.peek()
+        reader.pos += 1
+        if char == "]":
+            return
+        if char != ",":
+            raise reader.error("Expecting ',' delimiter", reader.pos - 1)
+
+# ============================================================================
+# Column Scans
+# ============================================================================
+
+FLAGS = ("passes", "blocked", "needs_review")
+
+def scan_features(project_path: Path,
+                  keep: Optional[Callable[[Dict[str, Any]], bool]] = None) -> Dict[str, Any]:
+    """
+    Stream feature_list.json into columns, with unflushed journal changes
+    applied. Full documents are kept only for features matching keep().
+
+    Returns {"ids": [...], "passes": [...], "blocked": [...],
+             "needs_review": [...], "kept": {index: feature}}.
+    """
+    project_path = Path(project_path)
+    journal = read_journal(project_path)
+    touched = {change.get("id") for change in journal}
+
+    columns: Dict[str, Any] = {"ids": [], "kept": {}}
+    for flag in FLAGS:
+        columns[flag] = []
+    for i, (feat, _, _) in enumerate(iter_features(project_path / "feature_list.json")):
+        if not isinstance(feat, dict):
+            feat = {}
+        feat_id = feat.get("id")
+        columns["ids"].append(feat_id)
+        for flag in FLAGS:
+            columns[flag].append(bool(feat.get(flag, False)))
+        if feat_id in touched or (keep is not None and keep(feat)):
+            columns["kept"][i] = feat
+
+    # Same replay as FeatureStore: changes apply to the first feature with the id
+    first: Dict[Any, int] = {}
+    for i, feat_id in enumerate(columns["ids"]):
+        if feat_id in touched:
+            first.setdefault(feat_id, i)
+    for change in journal:
+        i = first.get(change.get("id"))
+        if i is None:
+            continue
+        feat = columns["kept"][i]
+        feat.update(change.get("set") or {})
+        for key in change.get("clear", ()):
+            feat.pop(key, None)
+        for flag in FLAGS:
+            columns[flag][i] = bool(feat.get(flag, False))
+    return columns
+
+def scan_status(project_path: Path) -> Dict[str, int]:
+    """Completion counts (like FeatureStore.status()) without building the
+    feature dicts: memory grows with the number of features, not file size."""
+    columns = scan_features(project_path)
+    total = len(columns["ids"])
+    completed = sum(columns["passes"])
+    return {
+        "total": total,
+        "completed": completed,
+        "remaining": total - completed,
+        "blocked": sum(columns["blocked"])
+    }
+
+def scan_blocked(project_path: Path) -> List[Dict[str, Any]]:
+    """Blocked features in file order; only those are held in memory."""
+    columns = scan_features(project_path, keep=lambda feat: feat.get("blocked", False))
+    return [columns["kept"][i] for i, blocked in enumerate(columns["blocked"]) if blocked]
@@ -0,0 +1,108 @@
+"""
+Git History Index
+=================
+Maps feature ids to the commit that says "session: completed <id>".
+
+sync_features_with_git() used to run one `git log --grep` per unfinished
+feature on every loop iteration. Instead, one `git log` pass parses every
+completion commit into an id -> sha index, persisted with the HEAD it was
+built at in .agent/cache/git-history.json. Later calls only walk commits
+added since that HEAD; a rewritten history (reset, rebase) triggers a
+full rescan.
+
+Usage:
+    completed = completed_features(project_path)
+    if feature_id in completed: ...
+"""
+
+import json
+import re
+import subprocess
+from pathlib import Path
+from typing import Dict, Optional
+
+from context_engine.atomic import write_json_atomic
+
+CACHE_FILE = ".agent/cache/git-history.json"
+COMPLETION_MARKER = "session: completed"
+
+# "session: completed F003", "session: completed F003 (auto-completed by harness)"
+_COMPLETED = re.compile(re.escape(COMPLETION_MARKER) + r"\s+(\S+)")
+_ID_PUNCTUATION = "[](),;:'\"`"
+
+def _git(project_path: Path, *args: str, timeout: int = 60) -> Optional[str]:
+    """Run a git command; returns stdout, or None if it failed."""
+    try:
+        result = subprocess.run(
+            ["git", *args],
+            capture_output=True, text=True, cwd=project_path, timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return result.stdout
+
+def _scan(project_path: Path, revisions: str, index: Dict[str, str]) -> bool:
+    """
+    Add completion commits in revisions (newest first) to index; a newer
+    commit wins for an id seen twice. Returns False if git failed.
+    """
+    output = _git(project_path, "log", "--grep", COMPLETION_MARKER, "--fixed-strings",
+                  "--format=%H%x00%B%x1e", revisions)
+    if output is None:
+        return False
+
+    found: Dict[str, str] = {}
+    for record in output.split("\x1e"):
+        sha, _, message = record.strip("\n").partition("\x00")
+        if not message:
+            continue
+        for match in _COMPLETED.finditer(message):
+            feature_id = match.group(1).strip(_ID_PUNCTUATION)
+            if feature_id:
+                found.setdefault(feature_id, sha)
+    index.update(found)
+    return True
+
+def completed_features(project_path: Path) -> Dict[str, str]:
+    """
+    Return {feature_id: sha} for every "session: completed" commit
+    reachable from HEAD. Empty if the project is not a git repository.
+    """
+    project_path = Path(project_path)
+    head = _git(project_path, "rev-parse", "--verify", "-q", "HEAD", timeout=10)
+    if not head:
+        return {}
+    head = head.strip()
+
+    cache_file = project_path / CACHE_FILE
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+        cached_head = cache["head"]
+        index = dict(cache["index"])
+    except (OSError, ValueError, KeyError, TypeError):
+        cached_head, index = None, {}
+
+    if cached_head == head:
+        return index
+
+    incremental = (
+        cached_head is not None
+        and _git(project_path, "merge-base", "--is-ancestor", cached_head, head, timeout=10) is not None
+    )
+    if incremental:
+        ok = _scan(project_path, f"{cached_head}..{head}", index)
+    else:
+        index = {}
+        ok = _scan(project_path, head, index)
+    if not ok:
+        return index
+
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(cache_file, {"head": head, "index": index})
+    except OSError:
+        pass
+    return index
@@ -0,0 +1,521 @@
+"""
+Memory Consolidation
+====================
+Merges near-duplicate failures and strategies - the same "auth token
+not refreshed" recorded by five sessions - into one canonical memory,
+so the memory directories and the context they feed grow with what was
+learned rather than with the number of sessions.
+
+Each memory's description (front matter, headings and the template's
+"- [...]" placeholders removed) is shingled into word pairs and
+MinHashed: one hash per shingle, split into SIGNATURE_SIZE bins
+(one-permutation hashing), empty bins filled from their neighbours so
+short texts still compare. Signatures are banded for LSH (BANDS bands of
+ROWS slots); memories sharing a band bucket are candidates, and those
+whose signatures agree on at least SIMILARITY of their slots are
+near-duplicates.
+
+A cluster becomes one canonical file, <feature>-consolidated-<id>.md,
+with the body of its latest occurrence and in its front matter the
+occurrence count, the features involved and when it was first and last
+seen. Descriptions of merged occurrences that differ from the latest one
+are kept under "Other Descriptions", and the latest occurrences are
+listed at the end. The originals move
+to .agent/memory/archive/<category>/. Merging into an existing canonical
+updates it in place.
+
+Signatures and LSH buckets are kept in .agent/cache/memory-signatures.db:
+- add() (capture-feedback.sh, memory-manager.sh store) checks one new
+  memory against the buckets and merges it on a match
+- consolidate() is the batch pass over a whole directory, reusing the
+  signatures of files that did not change
+
+Both keep the memory index (memory_index) in step.
+
+Usage:
+    paths = add(project_path, ".agent/memory/failures/F003-20250101-120000.md")
+    report = consolidate(project_path)          # {category: {"files", "clusters", "archived"}}
+
+    python3 -m context_engine.memory_consolidation [--project DIR] add FILE
+    python3 -m context_engine.memory_consolidation [--project DIR] batch [--category failures] [--dry-run]
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import zlib
+from array import array
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from context_engine import memory_index
+from context_engine.atomic import write_text_atomic
+
+MEMORY_DIR = memory_index.MEMORY_DIR
+ARCHIVE_DIR = ".agent/memory/archive"
+CATEGORIES = ("failures", "strategies")
+DB_FILE = ".agent/cache/memory-signatures.db"
+
+SHINGLE_WORDS = 2
+SIGNATURE_SIZE = 64
+BANDS, ROWS = 8, 8          # LSH: candidates from ~77% similar upwards
+SIMILARITY = 0.8            # share of equal signature slots to merge
+LISTED_OCCURRENCES = 5      # occurrences listed in a canonical memory
+MAX_DESCRIPTIONS = 10       # other descriptions kept in a canonical memory
+MAX_FEATURES = 50
+SIGNATURES_VERSION = 2      # bump when shingling, hashing or banding changes
+
+DESCRIPTIONS_HEADING = "### Other Descriptions"
+OCCURRENCES_HEADING = "### Occurrences"
+_MIX = 0x9E3779B97F4A7C15
+_MASK = (1 << 64) - 1
+_VALUE_BITS = 58
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    path      TEXT PRIMARY KEY,
+    category  TEXT NOT NULL,
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL,
+    signature BLOB NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS buckets (
+    category TEXT NOT NULL,
+    band     INTEGER NOT NULL,
+    bucket   INTEGER NOT NULL,
+    path     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS buckets_by_key ON buckets(category, band, bucket);
+CREATE INDEX IF NOT EXISTS buckets_by_path ON buckets(path);
+"""
+
+def _connect(project_path: Path) -> sqlite3.Connection:
+    path = Path(project_path) / DB_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    # Signatures and buckets from other parameters do not compare
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SIGNATURES_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS signatures; DROP TABLE IF EXISTS buckets;")
+        conn.execute(f"PRAGMA user_version = {SIGNATURES_VERSION}")
+    conn.executescript(SCHEMA)
+    return conn
+
+# ============================================================================
+# Memory Files
+# ============================================================================
+
+def _split(text: str) -> Tuple[Dict[str, str], str]:
+    """(front matter, body) of a memory file."""
+    if text.startswith("---\n"):
+        end = text.find("\n---", 3)
+        if end > 0:
+            meta = {}
+            for line in text[4:end].splitlines():
+                key, sep, value = line.partition(":")
+                if sep:
+                    meta[key.strip()] = value.strip()
+            return meta, text[end + 4:].lstrip("\n")
+    return {}, text
+
+def _main_body(body: str) -> str:
+    """body without a canonical memory's other descriptions and occurrence list."""
+    cuts = [index for index in (body.find(DESCRIPTIONS_HEADING), body.find(OCCURRENCES_HEADING)) if index >= 0]
+    return body[:min(cuts)].rstrip() + "\n" if cuts else body
+
+def _section(body: str, heading: str) -> List[str]:
+    """The "- " items under heading, up to the next heading."""
+    index = body.find(heading)
+    items = []
+    if index >= 0:
+        for line in body[index:].splitlines()[1:]:
+            if line.startswith("#"):
+                break
+            if line.startswith("- "):
+                items.append(line[2:].strip())
+    return items
+
+def description(text: str) -> str:
+    """The text memories are compared by: no front matter, headings, placeholders or occurrence list."""
+    lines = []
+    for line in _main_body(_split(text)[1]).splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith("#") or re.fullmatch(r"- \[.*\]", stripped):
+            continue
+        lines.append(stripped)
+    return " ".join(lines)
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        with open(path, errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+# ============================================================================
+# MinHash and LSH
+# ============================================================================
+
+def signature(text: str) -> Optional[array]:
+    """One-permutation MinHash of text's word shingles, densified; None if it has none."""
+    words = re.sub(r"[^a-z0-9]+", " ", text.lower()).split()
+    if not words:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    bins: List[Optional[int]] = [None] * SIGNATURE_SIZE
+    for shingle in shingles:
+        h = (zlib.crc32(shingle.encode()) * _MIX) & _MASK
+        slot, value = h % SIGNATURE_SIZE, h >> (64 - _VALUE_BITS)
+        if bins[slot] is None or value < bins[slot]:
+            bins[slot] = value
+    # Empty bins take the next filled bin's value, tagged with the distance
+    result = array("Q", [0] * SIGNATURE_SIZE)
+    for slot in range(SIGNATURE_SIZE):
+        distance = 0
+        while bins[(slot + distance) % SIGNATURE_SIZE] is None:
+            distance += 1
+        result[slot] = (distance << _VALUE_BITS) | bins[(slot + distance) % SIGNATURE_SIZE]
+    return result
+
+def similarity(a: array, b: array) -> float:
+    """Estimated Jaccard similarity: the share of equal slots."""
+    return sum(1 for x, y in zip(a, b) if x == y) / SIGNATURE_SIZE
+
+def _band_keys(sig: array) -> List[int]:
+    return [zlib.crc32(sig[band * ROWS:(band + 1) * ROWS].tobytes()) for band in range(BANDS)]
+
+def _from_blob(blob: bytes) -> array:
+    sig = array("Q")
+    sig.frombytes(blob)
+    return sig
+
+def _store_all(conn: sqlite3.Connection, category: str, entries: List[Tuple[str, os.stat_result, array]]):
+    """Insert signatures and their buckets of paths not stored yet."""
+    conn.executemany("INSERT INTO signatures (path, category, mtime_ns, size, signature) VALUES (?, ?, ?, ?, ?)",
+                     [(path, category, st.st_mtime_ns, st.st_size, sig.tobytes()) for path, st, sig in entries])
+    conn.executemany("INSERT INTO buckets (category, band, bucket, path) VALUES (?, ?, ?, ?)",
+                     [(category, band, key, path) for path, _, sig in entries
+                      for band, key in enumerate(_band_keys(sig))])
+
+def _store(conn: sqlite3.Connection, path: str, category: str, st: os.stat_result, sig: array):
+    _forget(conn, path)
+    _store_all(conn, category, [(path, st, sig)])
+
+def _forget(conn: sqlite3.Connection, path: str):
+    conn.execute("DELETE FROM signatures WHERE path = ?", (path,))
+    conn.execute("DELETE FROM buckets WHERE path = ?", (path,))
+
+# ============================================================================
+# Merging
+# ============================================================================
+
+def _occurrence(project_path: Path, path: str, text: str) -> Dict[str, str]:
+    """When (front matter created:, else mtime) and for which feature a memory was recorded."""
+    meta = _split(text)[0]
+    created = meta.get("created")
+    if not created:
+        try:
+            mtime = os.stat(project_path / path).st_mtime
+            created = datetime.fromtimestamp(mtime).astimezone().isoformat(timespec="seconds")
+        except OSError:
+            created = ""
+    return {"created": created, "feature": meta.get("feature", ""), "path": path}
+
+def _canonical_state(text: str) -> Dict[str, Any]:
+    """
+    Occurrence count, features, first/last seen, other descriptions and
+    listed occurrences of a canonical memory.
+    """
+    meta, body = _split(text)
+    listed = []
+    for line in _section(body, OCCURRENCES_HEADING):
+        match = re.fullmatch(r"(\S+) (\S+) \((.*)\)", line)
+        if match:
+            created, feature, path = (value if value != "-" else "" for value in match.groups())
+            listed.append({"created": created, "feature": feature, "path": path})
+    try:
+        occurrences = int(meta.get("occurrences") or 1)
+    except ValueError:
+        occurrences = max(1, len(listed))
+    return {"occurrences": occurrences, "features": meta.get("features", "").split(),
+            "seen": [meta[key] for key in ("first_seen", "last_seen") if meta.get(key)],
+            "descriptions": [description(text)] + _section(body, DESCRIPTIONS_HEADING), "listed": listed}
+
+def _archive(project_path: Path, path: str) -> str:
+    """Move a memory under ARCHIVE_DIR; returns its archived path."""
+    archived = f"{ARCHIVE_DIR}/{os.path.relpath(path, MEMORY_DIR)}"
+    (project_path / archived).parent.mkdir(parents=True, exist_ok=True)
+    os.replace(project_path / path, project_path / archived)
+    return archived
+
+def _merge(project_path: Path, category: str, paths: List[str]) -> Optional[str]:
+    """
+    Merge memories (project-relative paths) into one canonical file: the
+    first canonical among them, else a new one. The others are archived.
+    Returns the canonical's path, or None if fewer than two were readable.
+    """
+    texts = {path: _read(project_path / path) for path in paths}
+    texts = {path: text for path, text in texts.items() if text is not None}
+    if len(texts) < 2:
+        return None
+    canonicals = [path for path, text in texts.items() if _split(text)[0].get("consolidated") == "true"]
+    target = canonicals[0] if canonicals else None
+
+    occurrences, features, seen, earlier, count = [], [], [], [], 0
+    for path, text in texts.items():
+        if path in canonicals:
+            state = _canonical_state(text)
+            count += state["occurrences"]
+            features.extend(state["features"])
+            occurrences.extend(state["listed"])
+            seen.extend(state["seen"])
+            earlier.extend(state["descriptions"])
+        else:
+            count += 1
+            occurrences.append(_occurrence(project_path, path, text))
+    originals = [entry for entry in occurrences if entry["path"] in texts]
+    latest = max(originals, key=lambda entry: entry["created"])["path"] if originals else target
+    meta_of_latest, body = _split(texts[latest])
+
+    # Near-duplicates can still differ in the word that matters: keep
+    # every distinct description, not just the latest one
+    descriptions, known = [], {" ".join(description(texts[latest]).lower().split())}
+    others = sorted((entry for entry in originals if entry["path"] != latest),
+                    key=lambda entry: entry["created"], reverse=True)
+    for text in [description(texts[entry["path"]]) for entry in others] + earlier:
+        key = " ".join(text.lower().split())
+        if key and key not in known:
+            known.add(key)
+            descriptions.append(" ".join(text.split()))
+
+    archived = {path: _archive(project_path, path) for path in texts if path != target}
+    occurrences.sort(key=lambda entry: entry["created"], reverse=True)
+    for entry in occurrences:
+        entry["path"] = archived.get(entry["path"], entry["path"])
+    seen.extend(entry["created"] for entry in occurrences if entry["created"])
+    merged_features = []
+    for feature in [entry["feature"] for entry in occurrences] + features:
+        if feature and feature not in merged_features:
+            merged_features.append(feature)
+    merged_features = merged_features[:MAX_FEATURES]
+
+    if target is None:
+        digest = hashlib.blake2b("\n".join(sorted(texts)).encode(), digest_size=4).hexdigest()
+        target = f"{MEMORY_DIR}/{category}/{merged_features[0] if merged_features else category}-consolidated-{digest}.md"
+    meta = {"feature": merged_features[0] if merged_features else "", "features": " ".join(merged_features),
+            "outcome": meta_of_latest.get("outcome", ""), "occurrences": str(count),
+            "first_seen": min(seen) if seen else "", "last_seen": max(seen) if seen else "",
+            "consolidated": "true"}
+    lines = ["---"] + [f"{key}: {value}" for key, value in meta.items() if value] + ["---"]
+    lines.append(_main_body(body).rstrip())
+    lines.append("")
+    if descriptions:
+        lines.append(DESCRIPTIONS_HEADING)
+        lines.extend(f"- {text}" for text in descriptions[:MAX_DESCRIPTIONS])
+        lines.append("")
+    lines.append(f"{OCCURRENCES_HEADING} ({count}, latest first)")
+    lines.extend(f"- {entry['created'] or '-'} {entry['feature'] or '-'} ({entry['path']})"
+                 for entry in occurrences[:LISTED_OCCURRENCES])
+    write_text_atomic(project_path / target, "\n".join(lines) + "\n")
+    return target
+
+# ============================================================================
+# Incremental and Batch
+# ============================================================================
+
+def _relative(project_path: Path, path: Path) -> Optional[Tuple[str, str]]:
+    """(category, project-relative path) of a consolidatable memory file."""
+    path = Path(path)
+    if not path.is_absolute():
+        path = project_path / path
+    try:
+        relative = path.resolve().relative_to((project_path / MEMORY_DIR).resolve())
+    except (OSError, ValueError):
+        return None
+    if len(relative.parts) != 2 or relative.parts[0] not in CATEGORIES:
+        return None
+    return relative.parts[0], f"{MEMORY_DIR}/{relative.parts[0]}/{relative.parts[1]}"
+
+def add(project_path: Path, path: Path) -> List[str]:
+    """
+    Consolidate one memory just written with its near-duplicates, if any.
+    Returns the memory paths that changed (the file itself, or the
+    canonical it was merged into and the archived originals), all
+    re-indexed.
+    """
+    project_path = Path(project_path)
+    located = _relative(project_path, path)
+    if located is None:
+        return [str(path)]
+    category, path = located
+    text = _read(project_path / path)
+    sig = signature(description(text)) if text else None
+    changed = [path]
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        conn = None
+    if conn is not None and sig is not None:
+        try:
+            with conn:
+                candidates = set()
+                for band, key in enumerate(_band_keys(sig)):
+                    candidates.update(other for other, in conn.execute(
+                        "SELECT path FROM buckets WHERE category = ? AND band = ? AND bucket = ?",
+                        (category, band, key)))
+                candidates.discard(path)
+                best, best_similarity = None, SIMILARITY
+                for other in sorted(candidates):
+                    row = conn.execute("SELECT signature FROM signatures WHERE path = ?", (other,)).fetchone()
+                    if row is None or not (project_path / other).exists():
+                        _forget(conn, other)
+                        continue
+                    score = similarity(sig, _from_blob(row[0]))
+                    if score >= best_similarity:
+                        best, best_similarity = other, score
+                target = _merge(project_path, category, [best, path]) if best else None
+                if target is None:
+                    _store(conn, path, category, os.stat(project_path / path), sig)
+                else:
+                    for merged in (best, path):
+                        _forget(conn, merged)
+                    target_sig = signature(description(_read(project_path / target) or ""))
+                    if target_sig is not None:
+                        _store(conn, target, category, os.stat(project_path / target), target_sig)
+                    changed = [target] + [merged for merged in (best, path) if merged != target]
+        except (OSError, sqlite3.Error):
+            pass
+        finally:
+            conn.close()
+    memory_index.add(project_path, changed)
+    return changed
+
+class _Clusters:
+    """Union-find over memory paths."""
+
+    def __init__(self):
+        self.parent: Dict[str, str] = {}
+
+    def find(self, path: str) -> str:
+        root = self.parent.setdefault(path, path)
+        while root != self.parent[root]:
+            root = self.parent[root]
+        while path != root:
+            self.parent[path], path = root, self.parent[path]
+        return root
+
+    def union(self, a: str, b: str):
+        self.parent[self.find(a)] = self.find(b)
+
+def _signatures(conn: sqlite3.Connection, project_path: Path, category: str) -> Dict[str, array]:
+    """Signatures of every file of category, computing only those of new or changed files."""
+    known = {path: (mtime_ns, size, blob) for path, mtime_ns, size, blob in conn.execute(
+        "SELECT path, mtime_ns, size, signature FROM signatures WHERE category = ?", (category,))}
+    signatures, computed = {}, []
+    for name, entry in memory_index._memory_files(project_path / MEMORY_DIR / category).items():
+        path = f"{MEMORY_DIR}/{category}/{name}"
+        try:
+            st = entry.stat()
+        except OSError:
+            continue
+        cached = known.pop(path, None)
+        if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+            signatures[path] = _from_blob(cached[2])
+            continue
+        if cached is not None:
+            _forget(conn, path)
+        sig = signature(description(_read(project_path / path) or ""))
+        if sig is not None:
+            computed.append((path, st, sig))
+            signatures[path] = sig
+    for path in known:
+        _forget(conn, path)
+    _store_all(conn, category, computed)
+    return signatures
+
+def consolidate(project_path: Path, categories: Iterable[str] = CATEGORIES,
+                dry_run: bool = False) -> Dict[str, Dict[str, int]]:
+    """
+    Batch pass: cluster each category's near-duplicates and merge every
+    cluster into one canonical memory. Returns per category the files
+    before, clusters merged and originals archived.
+    """
+    project_path = Path(project_path)
+    report = {}
+    conn = _connect(project_path)
+    try:
+        for category in categories:
+            with conn:
+                signatures = _signatures(conn, project_path, category)
+            # Candidates share a band bucket; each is checked against the
+            # bucket's first member rather than every other member
+            clusters = _Clusters()
+            keys = {path: _band_keys(sig) for path, sig in signatures.items()}
+            for band in range(BANDS):
+                buckets: Dict[int, str] = {}
+                for path, sig in signatures.items():
+                    first = buckets.setdefault(keys[path][band], path)
+                    if first != path and clusters.find(first) != clusters.find(path) \
+                            and similarity(sig, signatures[first]) >= SIMILARITY:
+                        clusters.union(path, first)
+            members: Dict[str, List[str]] = {}
+            for path in signatures:
+                members.setdefault(clusters.find(path), []).append(path)
+            groups = [sorted(group) for group in members.values() if len(group) > 1]
+            stats = {"files": len(signatures), "clusters": len(groups), "archived": 0}
+            if dry_run:
+                stats["archived"] = sum(len(group) - 1 for group in groups)
+                report[category] = stats
+                continue
+            with conn:
+                for group in groups:
+                    target = _merge(project_path, category, group)
+                    if target is None:
+                        continue
+                    stats["archived"] += sum(1 for path in group if path != target)
+                    for path in group:
+                        _forget(conn, path)
+                    target_sig = signature(description(_read(project_path / target) or ""))
+                    if target_sig is not None:
+                        _store(conn, target, category, os.stat(project_path / target), target_sig)
+            report[category] = stats
+    finally:
+        conn.close()
+    if not dry_run:
+        memory_index.refresh(project_path)
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Consolidate near-duplicate memories")
+    parser.add_argument("--project", type=Path, default=Path.cwd(), help="Project path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="Consolidate a memory just written")
+    add_parser.add_argument("file", type=Path)
+    batch_parser = commands.add_parser("batch", help="Consolidate existing memory directories")
+    batch_parser.add_argument("--category", choices=CATEGORIES, action="append")
+    batch_parser.add_argument("--dry-run", action="store_true", help="Report clusters without merging")
+    args = parser.parse_args(argv)
+
+    if args.command == "add":
+        changed = add(args.project, args.file)
+        if len(changed) > 1:
+            print(f"🔗 Merged into {changed[0]}")
+        return 0
+
+    try:
+        report = consolidate(args.project, args.category or CATEGORIES, args.dry_run)
+    except (OSError, sqlite3.Error) as e:
+        print(f"❌ Consolidation failed: {e}")
+        return 1
+    for category, stats in report.items():
+        verb = "would archive" if args.dry_run else "archived"
+        print(f"{category}: {stats['files']} files, {stats['clusters']} clusters of near-duplicates, "
+              f"{stats['archived']} {verb}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
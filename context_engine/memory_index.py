@@ -0,0 +1,373 @@
+"""
+Memory Index
+============
+BM25 retrieval over .agent/memory (failures, strategies, constraints,
+entities), so context compilation and memory-manager.sh can pick the
+memories relevant to the current feature instead of the newest ones.
+
+The index is an SQLite FTS5 table in .agent/cache/memory-index.db: one
+row per memory file with its feature (from the front matter) and body,
+ranked with FTS5's bm25(), the feature column weighted up. Queries
+leave out terms found in more than a tenth of the files, so top-k
+lookups stay in the milliseconds with tens of thousands of files.
+
+It is kept current incrementally:
+- capture-feedback.sh and memory-manager.sh store add the file they
+  write (python3 -m context_engine.memory_index add FILE)
+- refresh() compares each category directory's mtime with the one
+  indexed; if it moved, the directory's names are diffed against the
+  index, new files are added and removed ones dropped
+- refresh(full=True) (the sync command) also re-reads files whose size
+  or mtime changed, for memory edited in place
+
+The index is derived data: deleting it rebuilds it on the next lookup.
+SQLite builds without FTS5 make every lookup return None, and callers
+fall back to recency.
+
+The index also answers "the newest N files" from the mtimes it stores,
+without a stat() per file.
+
+Usage:
+    hits = search(project_path, feature_query(feature), ["failures"], limit=20)
+    [hit["path"] for hit in hits]
+    recent = newest(project_path, "failures", 5)
+    add(project_path, [".agent/memory/failures/F003-20250101-120000.md"])
+
+    python3 -m context_engine.memory_index [--project DIR] add FILE...
+    python3 -m context_engine.memory_index [--project DIR] search "query" [--category failures]
+    python3 -m context_engine.memory_index [--project DIR] retrieve failures
+    python3 -m context_engine.memory_index [--project DIR] sync
+"""
+
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+MEMORY_DIR = ".agent/memory"
+CATEGORIES = ("failures", "strategies", "constraints", "entities")
+DB_FILE = ".agent/cache/memory-index.db"
+
+FEATURE_WEIGHT = 3.0        # bm25 weight of the front-matter feature over the body
+MAX_QUERY_TERMS = 32
+COMMON_SHARE = 0.1          # terms in more of the files than this are left out of queries
+COMMON_MIN = 50
+RETRIEVE_LIMIT = 5
+RACY_NS = 2 * 10**9
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id       INTEGER PRIMARY KEY,
+    path     TEXT NOT NULL UNIQUE,
+    category TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_by_mtime ON documents(category, mtime_ns);
+
+CREATE TABLE IF NOT EXISTS directories (
+    category TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS memory_text USING fts5(
+    feature, body, tokenize = 'porter unicode61'
+);
+"""
+
+# Words too common in memory files and feature descriptions to rank by
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it of on or that the this to was were will with
+should must can not no into when then than after before feature implement add support
+""".split())
+
+def _connect(project_path: Path) -> sqlite3.Connection:
+    path = Path(project_path) / DB_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+def _feature_of(text: str) -> str:
+    """The feature: (and, for consolidated memories, features:) lines of a memory file's front matter."""
+    features = []
+    if text.startswith("---"):
+        end = text.find("\n---", 3)
+        for line in text[3:end if end > 0 else None].splitlines():
+            key, _, value = line.partition(":")
+            if key.strip() in ("feature", "features"):
+                features.append(value.strip())
+    return " ".join(features)
+
+# ============================================================================
+# Indexing
+# ============================================================================
+
+def _category_of(project_path: Path, path: Path) -> Optional[str]:
+    try:
+        relative = path.resolve().relative_to((project_path / MEMORY_DIR).resolve())
+    except (OSError, ValueError):
+        return None
+    if len(relative.parts) != 2 or relative.parts[0] not in CATEGORIES:
+        return None
+    return relative.parts[0]
+
+def _index_file(conn: sqlite3.Connection, project_path: Path, category: str, name: str):
+    """(Re)index one memory file, or drop it if it is gone."""
+    path = f"{MEMORY_DIR}/{category}/{name}"
+    row = conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+    if row is not None:
+        conn.execute("DELETE FROM memory_text WHERE rowid = ?", row)
+        conn.execute("DELETE FROM documents WHERE id = ?", row)
+    try:
+        st = os.stat(project_path / path)
+        with open(project_path / path, errors="replace") as f:
+            text = f.read()
+    except OSError:
+        return
+    cursor = conn.execute("INSERT INTO documents (path, category, mtime_ns, size) VALUES (?, ?, ?, ?)",
+                          (path, category, st.st_mtime_ns, st.st_size))
+    conn.execute("INSERT INTO memory_text (rowid, feature, body) VALUES (?, ?, ?)",
+                 (cursor.lastrowid, _feature_of(text), text))
+
+def _memory_files(directory: Path) -> Dict[str, os.DirEntry]:
+    try:
+        with os.scandir(directory) as scan:
+            return {entry.name: entry for entry in scan
+                    if entry.name.endswith(".md") and not entry.name.startswith(".")}
+    except OSError:
+        return {}
+
+def _refresh(conn: sqlite3.Connection, project_path: Path, full: bool):
+    for category in CATEGORIES:
+        directory = project_path / MEMORY_DIR / category
+        try:
+            dir_mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            dir_mtime = 0
+        row = conn.execute("SELECT mtime_ns FROM directories WHERE category = ?", (category,)).fetchone()
+        if not full and row is not None and row[0] == dir_mtime:
+            continue
+        on_disk = _memory_files(directory)
+        prefix = f"{MEMORY_DIR}/{category}/"
+        indexed = {path[len(prefix):]: (mtime_ns, size) for path, mtime_ns, size in conn.execute(
+            "SELECT path, mtime_ns, size FROM documents WHERE category = ?", (category,))}
+        stale = [name for name in indexed if name not in on_disk]
+        stale.extend(name for name in on_disk if name not in indexed)
+        if full:
+            for name, entry in on_disk.items():
+                if name in indexed:
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    if indexed[name] != (st.st_mtime_ns, st.st_size):
+                        stale.append(name)
+        for name in stale:
+            _index_file(conn, project_path, category, name)
+        # A directory changed within RACY_NS may change again without its
+        # mtime moving: leave it to be diffed again next time
+        if time.time_ns() - dir_mtime < RACY_NS:
+            dir_mtime = -1
+        conn.execute("INSERT OR REPLACE INTO directories (category, mtime_ns) VALUES (?, ?)",
+                     (category, dir_mtime))
+
+def refresh(project_path: Path, full: bool = False) -> bool:
+    """Bring the index up to date with .agent/memory. False if it is unavailable."""
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        return False
+    try:
+        with conn:
+            _refresh(conn, Path(project_path), full)
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return True
+
+def add(project_path: Path, paths: Iterable[Path]) -> bool:
+    """Index (or re-index) memory files just written. False if the index is unavailable."""
+    project_path = Path(project_path)
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        return False
+    try:
+        with conn:
+            for path in paths:
+                path = Path(path)
+                if not path.is_absolute():
+                    path = project_path / path
+                category = _category_of(project_path, path)
+                if category is not None:
+                    _index_file(conn, project_path, category, path.name)
+    except sqlite3.Error:
+        return False
+    finally:
+        conn.close()
+    return True
+
+# ============================================================================
+# Retrieval
+# ============================================================================
+
+def feature_query(feature: Optional[Dict[str, Any]]) -> str:
+    """Query text for a feature: its id, name, description and category."""
+    if not feature:
+        return ""
+    return " ".join(str(feature.get(key) or "") for key in ("id", "name", "description", "category"))
+
+def _terms(query: str) -> List[str]:
+    """The distinct terms of query worth ranking by, quoted for FTS5."""
+    terms = []
+    for term in re.findall(r"\w+", query.lower()):
+        if len(term) > 1 and term not in STOPWORDS and f'"{term}"' not in terms:
+            terms.append(f'"{term}"')
+    return terms[:MAX_QUERY_TERMS]
+
+def _selective(conn: sqlite3.Connection, terms: List[str]) -> List[str]:
+    """
+    terms without those in more than COMMON_SHARE of the memory files
+    (unless that would leave none) or in none. Common terms add little to
+    a BM25 score but make FTS5 score most of the index; their document
+    counts are probed with a bounded scan.
+    """
+    documents = conn.execute("SELECT count(*) FROM documents").fetchone()[0]
+    common = max(COMMON_MIN, int(documents * COMMON_SHARE))
+    selective, frequent = [], []
+    for term in terms:
+        count = conn.execute("SELECT count(*) FROM (SELECT 1 FROM memory_text WHERE memory_text MATCH ? LIMIT ?)",
+                             (term, common + 1)).fetchone()[0]
+        if count > common:
+            frequent.append(term)
+        elif count:
+            selective.append(term)
+    return selective or frequent
+
+def search(project_path: Path, query: str, categories: Optional[Iterable[str]] = None,
+           limit: int = 10, update: bool = True) -> Optional[List[Dict[str, Any]]]:
+    """
+    The limit best matches for query, best first: path (relative to the
+    project), category and score (higher is better). None if the index
+    is unavailable (no FTS5, unwritable cache).
+    """
+    project_path = Path(project_path)
+    terms = _terms(query)
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        return None
+    try:
+        if update:
+            with conn:
+                _refresh(conn, project_path, full=False)
+        terms = _selective(conn, terms)
+        if not terms:
+            return []
+        categories = list(categories or CATEGORIES)
+        rows = conn.execute(
+            "SELECT d.path, d.category, bm25(memory_text, ?, 1.0) AS score"
+            " FROM memory_text JOIN documents AS d ON d.id = memory_text.rowid"
+            f" WHERE memory_text MATCH ? AND d.category IN ({', '.join('?' * len(categories))})"
+            " ORDER BY score LIMIT ?",
+            (FEATURE_WEIGHT, " OR ".join(terms), *categories, limit)
+        ).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    return [{"path": path, "category": category, "score": -score} for path, category, score in rows]
+
+def newest(project_path: Path, category: str, limit: int, update: bool = True) -> Optional[List[str]]:
+    """
+    Paths of the limit most recently modified files of category, ordered
+    as ls -t orders them, from the index instead of a stat() per file.
+    None if the index is unavailable.
+    """
+    project_path = Path(project_path)
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        return None
+    try:
+        if update:
+            with conn:
+                _refresh(conn, project_path, full=False)
+        rows = conn.execute("SELECT path FROM documents WHERE category = ? ORDER BY mtime_ns DESC, path LIMIT ?",
+                            (category, limit)).fetchall()
+    except sqlite3.Error:
+        return None
+    finally:
+        conn.close()
+    return [path for path, in rows]
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def _retrieve(project_path: Path, category: str) -> Optional[List[str]]:
+    """Memories of category for the current feature: BM25 hits, topped up by recency."""
+    from context_engine.context_compiler import current_feature
+
+    hits = search(project_path, feature_query(current_feature(project_path)), [category], RETRIEVE_LIMIT)
+    if hits is None:
+        return None
+    paths = [hit["path"] for hit in hits]
+    # search() brought the index up to date; the newest come from it too
+    for path in newest(project_path, category, RETRIEVE_LIMIT + len(paths), update=False) or []:
+        if len(paths) >= RETRIEVE_LIMIT:
+            break
+        if path not in paths:
+            paths.append(path)
+    return paths
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="BM25 index over .agent/memory")
+    parser.add_argument("--project", type=Path, default=Path.cwd(), help="Project path")
+    commands = parser.add_subparsers(dest="command", required=True)
+    add_parser = commands.add_parser("add", help="Index memory files just written")
+    add_parser.add_argument("files", nargs="+", type=Path)
+    search_parser = commands.add_parser("search", help="Rank memory files against a query")
+    search_parser.add_argument("query")
+    search_parser.add_argument("--category", choices=CATEGORIES, action="append")
+    search_parser.add_argument("--limit", type=int, default=10)
+    retrieve_parser = commands.add_parser("retrieve", help="Memories relevant to the current feature")
+    retrieve_parser.add_argument("category", choices=CATEGORIES)
+    commands.add_parser("sync", help="Re-index everything that changed, including in-place edits")
+    args = parser.parse_args(argv)
+
+    # Exit status 2: index unavailable, the shell hooks fall back to ls/grep
+    if args.command == "add":
+        return 0 if add(args.project, args.files) else 2
+    if args.command == "sync":
+        return 0 if refresh(args.project, full=True) else 2
+    if args.command == "search":
+        hits = search(args.project, args.query, args.category, args.limit)
+        if hits is None:
+            return 2
+        for hit in hits:
+            print(f"Found in: {hit['path']} (score {hit['score']:.2f})")
+        return 0
+
+    paths = _retrieve(args.project, args.category)
+    if paths is None:
+        return 2
+    if not paths:
+        print(f"No items in {args.category}")
+    for path in paths:
+        print(f"--- {path} ---")
+        try:
+            with open(args.project / path, errors="replace") as f:
+                print(f.read())
+        except OSError:
+            pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
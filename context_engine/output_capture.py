@@ -0,0 +1,144 @@
+"""
+Bounded Output Capture
+======================
+Streams a command's output to a gzip artifact under
+.agent/artifacts/tool-outputs and keeps only a bounded summary in
+memory: the tail (a ring buffer of recent lines) and the first failure
+blocks (pytest FAILURES sections, `--- FAIL:` in go, libtest's
+`---- name stdout ----`, panics, compiler errors, tracebacks, jest's ●).
+
+Memory stays flat however much the command prints; the verdict and
+prompts use summary(), which names the artifact when output was dropped.
+
+Usage:
+    capture = OutputCapture(new_artifact(project_path, "tests"))
+    for line in proc.stdout:
+        capture.write(line)
+    capture.close()
+    capture.summary()
+"""
+
+import gzip
+import re
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+ARTIFACT_DIR = ".agent/artifacts/tool-outputs"
+MAX_ARTIFACTS = 40          # per prefix, oldest deleted first
+TAIL_BYTES = 16 * 1024
+FAILURE_BYTES = 16 * 1024
+BLOCK_LINES = 40            # lines kept per failure block
+MAX_LINE = 8 * 1024         # longer lines are cut in memory (not in the artifact)
+
+FAILURE_START = re.compile(
+    r"^(?:_{3,} .+ _{3,}\s*$"                 # pytest: ____ test_name ____
+    r"|={3,} (?:FAILURES|ERRORS) ={3,}"       # pytest section header
+    r"|\s*--- FAIL: "                         # go test
+    r"|---- .+ stdout ----"                   # libtest
+    r"|thread '.*' panicked"                  # rust panic
+    r"|error(?:\[E\d+\])?: "                  # rustc / cargo
+    r"|Traceback \(most recent call last\)"   # python
+    r"|\s*● "                                 # jest
+    r"|FAIL\s)"                               # go package / jest suite
+)
+
+def new_artifact(project_path: Path, prefix: str) -> Path:
+    """Fresh artifact path (<prefix>-<time>-<id>.log.gz); prunes old ones."""
+    directory = Path(project_path) / ARTIFACT_DIR
+    directory.mkdir(parents=True, exist_ok=True)
+    existing = sorted(directory.glob(f"{prefix}-*.log.gz"), key=lambda p: p.stat().st_mtime)
+    for stale in existing[:-(MAX_ARTIFACTS - 1)] if len(existing) >= MAX_ARTIFACTS else []:
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return directory / f"{prefix}-{stamp}-{uuid.uuid4().hex[:6]}.log.gz"
+
+class OutputCapture:
+    """Tail + failure blocks in memory, everything else in a gzip file."""
+
+    def __init__(self, artifact: Optional[Path] = None, tail_bytes: int = TAIL_BYTES,
+                 failure_bytes: int = FAILURE_BYTES):
+        self.artifact = artifact
+        self.tail_bytes = tail_bytes
+        self.failure_bytes = failure_bytes
+        self.total = 0
+        self._file = None
+        if artifact is not None:
+            try:
+                self._file = gzip.open(str(artifact), "wt", encoding="utf-8", errors="replace",
+                                       compresslevel=6)
+            except OSError:
+                self.artifact = None
+        self._tail: deque = deque()
+        self._tail_size = 0
+        self._blocks: List[Tuple[int, List[str]]] = []   # (start offset, lines)
+        self._block_size = 0
+        self._block_left = 0
+        self._blocks_dropped = 0
+
+    def write(self, line: str):
+        if self._file is not None:
+            self._file.write(line)
+        if len(line) > MAX_LINE:
+            line = line[:MAX_LINE] + "...\n"
+        offset = self.total
+        self.total += len(line)
+
+        self._tail.append(line)
+        self._tail_size += len(line)
+        while self._tail_size > self.tail_bytes and len(self._tail) > 1:
+            self._tail_size -= len(self._tail.popleft())
+
+        if FAILURE_START.match(line):
+            if self._block_size + len(line) > self.failure_bytes:
+                self._blocks_dropped += 1
+                self._block_left = 0
+                return
+            self._blocks.append((offset, [line]))
+            self._block_size += len(line)
+            self._block_left = BLOCK_LINES - 1
+        elif self._block_left > 0:
+            if self._block_size + len(line) > self.failure_bytes:
+                self._block_left = 0
+                return
+            self._blocks[-1][1].append(line)
+            self._block_size += len(line)
+            self._block_left -= 1
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.total > self._tail_size
+
+    def summary(self) -> str:
+        """
+        The whole output if it fit in the tail buffer, else the failure
+        blocks that scrolled out of the tail, an omission marker naming the
+        artifact, and the tail.
+        """
+        tail = "".join(self._tail)
+        if not self.truncated:
+            return tail
+        tail_start = self.total - self._tail_size
+        blocks = ["".join(lines) for offset, lines in self._blocks if offset < tail_start]
+        parts = []
+        if blocks:
+            parts.append("".join(blocks))
+            if self._blocks_dropped:
+                parts.append(f"... {self._blocks_dropped} more failure block(s)\n")
+        where = f", full output: {self.artifact}" if self.artifact else ""
+        parts.append(f"... [{tail_start} characters omitted{where}] ...\n")
+        parts.append(tail)
+        return "".join(parts)
@@ -0,0 +1,237 @@
+"""
+Ready-Set Scheduler
+===================
+Incremental next-feature selection for FeatureStore.
+
+For every feature the scheduler keeps the number of dependencies that
+have not passed yet, plus a heap of ready features (not passing, not
+blocked, every dependency passed) per ordering:
+
+- "topological": the order of topological_sort_features() (loop-runner)
+- "priority":    lowest priority first, file order breaking ties (orchestrator)
+
+A feature passing, being blocked/unblocked or being appended (e.g. by QA)
+only touches that feature and its direct dependents, so next() is a heap
+peek instead of a full graph rebuild. Heap entries are deleted lazily:
+entries that are no longer ready are discarded when they reach the top.
+
+Topological ranks depend on the whole graph, so they are recomputed (once,
+on the next topological query) only when features are added or a
+dependency/priority changes - never when a feature merely passes.
+"""
+
+import heapq
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+ORDERINGS = ("topological", "priority")
+
+def _state(feat: Dict[str, Any]) -> Tuple[bool, bool, bool]:
+    return (bool(feat.get("passes", False)), bool(feat.get("blocked", False)),
+            bool(feat.get("needs_review", False)))
+
+def _structure(feat: Dict[str, Any]) -> Tuple[Any, Tuple[str, ...], Any]:
+    return (feat.get("id"), tuple(feat.get("dependencies", []) or ()), feat.get("priority", 99))
+
+class ReadyScheduler:
+    """
+    In-degree counts and ready heaps over a feature list.
+
+    Call sync() whenever the list is (re)loaded and feature_changed() after
+    editing a single feature in place.
+    """
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self.features: List[Dict[str, Any]] = []
+        self._states: List[Tuple[bool, bool, bool]] = []
+        self._structures: List[Tuple[Any, Tuple[str, ...], Any]] = []
+        self._unmet: List[int] = []
+        self._first: Dict[Any, int] = {}          # id -> first index (matches by_id)
+        self._passing: Dict[Any, int] = {}        # id -> number of passing features
+        self._dependents: Dict[Any, List[int]] = {}
+        self._keys: Dict[str, List[Any]] = {}
+        self._heaps: Dict[Tuple[str, bool], List[Tuple[Any, int]]] = {}
+
+    # ------------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------------
+
+    def load(self, features: List[Dict[str, Any]]):
+        """Rebuild every count and heap from scratch."""
+        self._reset()
+        self.sync(features)
+
+    def sync(self, features: List[Dict[str, Any]]):
+        """
+        Bring the scheduler in line with a freshly loaded feature list.
+
+        Features whose id, dependencies and priority are unchanged only have
+        their flags diffed; features appended at the end are added
+        incrementally. Anything else (removal, reordering, dependency or
+        priority edits) falls back to load().
+        """
+        known = len(self._structures)
+        if len(features) < known:
+            return self.load(features)
+        for idx in range(known):
+            if _structure(features[idx]) != self._structures[idx]:
+                return self.load(features)
+
+        self.features = features
+        for idx in range(known):
+            self._set_state(idx, _state(features[idx]))
+        if len(features) > known:
+            self._invalidate_order("topological")
+            for idx in range(known, len(features)):
+                self._append(idx)
+
+    def _append(self, idx: int):
+        feat = self.features[idx]
+        structure = _structure(feat)
+        feat_id, deps, _ = structure
+        self._structures.append(structure)
+        self._states.append((False, False, False))
+        self._first.setdefault(feat_id, idx)
+        self._unmet.append(sum(1 for dep in deps if not self._passing.get(dep)))
+        for dep in deps:
+            self._dependents.setdefault(dep, []).append(idx)
+        keys = self._keys.get("priority")
+        if keys is not None:
+            keys.append((structure[2], idx))
+        state = _state(feat)
+        if state == self._states[idx]:
+            self._push(idx)
+        else:
+            self._set_state(idx, state)
+
+    def feature_changed(self, feature_id: Any):
+        """Re-read a feature (first one with this id) after an in-place edit."""
+        idx = self._first.get(feature_id)
+        if idx is None:
+            return
+        if _structure(self.features[idx]) != self._structures[idx]:
+            self.load(self.features)
+            return
+        self._set_state(idx, _state(self.features[idx]))
+
+    # ------------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------------
+
+    def _set_state(self, idx: int, state: Tuple[bool, bool, bool]):
+        old = self._states[idx]
+        if state == old:
+            return
+        self._states[idx] = state
+
+        if state[0] != old[0]:
+            feat_id = self._structures[idx][0]
+            count = self._passing.get(feat_id, 0) + (1 if state[0] else -1)
+            self._passing[feat_id] = count
+            # Only the first passing / last un-passing copy of an id flips
+            # its dependents.
+            if state[0] and count == 1:
+                for dependent in self._dependents.get(feat_id, ()):
+                    self._unmet[dependent] -= 1
+                    self._push(dependent)
+            elif not state[0] and count == 0:
+                for dependent in self._dependents.get(feat_id, ()):
+                    self._unmet[dependent] += 1
+        self._push(idx)
+
+    def _ready(self, idx: int) -> bool:
+        passes, blocked, _ = self._states[idx]
+        return not passes and not blocked and self._unmet[idx] == 0
+
+    def _push(self, idx: int):
+        """Add a feature that just became ready to every live heap."""
+        if not self._ready(idx):
+            return
+        review = self._states[idx][2]
+        for (ordering, skip_review), heap in self._heaps.items():
+            if skip_review and review:
+                continue
+            key = self._keys[ordering][idx]
+            if key is not None:
+                heapq.heappush(heap, (key, idx))
+
+    # ------------------------------------------------------------------------
+    # Orderings
+    # ------------------------------------------------------------------------
+
+    def _invalidate_order(self, ordering: str):
+        self._keys.pop(ordering, None)
+        for heap_key in [k for k in self._heaps if k[0] == ordering]:
+            del self._heaps[heap_key]
+
+    def _order_keys(self, ordering: str) -> List[Any]:
+        keys = self._keys.get(ordering)
+        if keys is not None:
+            return keys
+
+        if ordering == "priority":
+            keys = [(structure[2], idx) for idx, structure in enumerate(self._structures)]
+        elif ordering == "topological":
+            # Imported here: feature_store imports this module.
+            from context_engine.feature_store import topological_sort_features
+            rank = {id(feat): pos for pos, feat in enumerate(topological_sort_features(self.features))}
+            # Earlier copies of a duplicated id never appear in the sort.
+            keys = [rank.get(id(feat)) for feat in self.features]
+        else:
+            raise ValueError(f"Unknown ordering: {ordering}")
+        self._keys[ordering] = keys
+        return keys
+
+    def _heap(self, ordering: str, skip_review: bool) -> List[Tuple[Any, int]]:
+        heap = self._heaps.get((ordering, skip_review))
+        if heap is None:
+            keys = self._order_keys(ordering)
+            heap = [
+                (keys[idx], idx) for idx in range(len(self.features))
+                if keys[idx] is not None and self._ready(idx)
+                and not (skip_review and self._states[idx][2])
+            ]
+            heapq.heapify(heap)
+            self._heaps[(ordering, skip_review)] = heap
+        return heap
+
+    # ------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------
+
+    def ready(self, ordering: str = "topological", skip_review: bool = False,
+              limit: Optional[int] = None, exclude: Iterable[Any] = ()) -> List[Dict[str, Any]]:
+        """
+        Up to limit ready features in the given ordering, skipping ids in
+        exclude (e.g. features already running). O(k log n) for k taken.
+        """
+        heap = self._heap(ordering, skip_review)
+        exclude = set(exclude)
+        taken: List[Tuple[Any, int]] = []
+        seen = set()
+        result = []
+        while heap and (limit is None or len(result) < limit):
+            entry = heapq.heappop(heap)
+            idx = entry[1]
+            if idx in seen or not self._ready(idx) or (skip_review and self._states[idx][2]):
+                continue
+            seen.add(idx)
+            taken.append(entry)
+            if self._structures[idx][0] not in exclude:
+                result.append(self.features[idx])
+        for entry in taken:
+            heapq.heappush(heap, entry)
+        return result
+
+    def next(self, ordering: str = "topological",
+             skip_review: bool = False) -> Optional[Dict[str, Any]]:
+        """First ready feature in the given ordering, or None."""
+        heap = self._heap(ordering, skip_review)
+        while heap:
+            idx = heap[0][1]
+            if self._ready(idx) and not (skip_review and self._states[idx][2]):
+                return self.features[idx]
+            heapq.heappop(heap)
+        return None
@@ -0,0 +1,141 @@
+"""
+Pipelined Session Preparation
+=============================
+Builds the next session's inputs in the background so the loop can hand
+over from one session to the next without dead time.
+
+The next feature is known as soon as the agent exits (it has marked its
+feature or not), while the harness still has verification ahead of it.
+SessionPrep.start() prepares that candidate in a worker thread - compile
+the working context into a staged file, render the prompt - and take()
+hands it over at the start of the next session once it is checked to be
+current. Warming the build cache is left to the caller, after
+verification, since it rewrites dependencies in the tree under test:
+
+- the feature must be the one the loop actually picked (same fields)
+- the inputs of the compiled context (feature_list.json, memory,
+  artifacts listing, agent-progress.txt) must be unchanged, else the
+  prepared dict comes back with stale=True and the caller recompiles
+  the context and prompt
+
+Usage:
+    prep = SessionPrep(lambda feature, n: prepare(project_path, feature, n))
+    prep.start(project_path, upcoming_feature, session + 1)
+    ... verification ...
+    prepared = prep.take(project_path, next_feature, session + 1)
+    install_context(project_path, prepared["context"])
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from context_engine import context_compiler
+
+WORKING_CONTEXT = context_compiler.WORKING_CONTEXT
+STAGED_CONTEXT = ".agent/working-context/next.md"
+
+# What the context compiler reads
+CONTEXT_INPUTS = ("feature_list.json", "agent-progress.txt")
+CONTEXT_MEMORY = (".agent/memory/constraints", ".agent/memory/failures", ".agent/memory/strategies")
+ARTIFACT_LISTING = ".agent/artifacts/tool-outputs"
+LISTED_ARTIFACTS = 10
+
+def _stat(path: Path) -> str:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return "-"
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+def context_fingerprint(project_path: Path) -> str:
+    """Hash of the file states the compiled context depends on."""
+    project_path = Path(project_path)
+    parts = [f"{name}={_stat(project_path / name)}" for name in CONTEXT_INPUTS]
+    for directory in CONTEXT_MEMORY:
+        try:
+            names = sorted(os.listdir(project_path / directory))
+        except OSError:
+            names = []
+        parts.extend(f"{directory}/{name}={_stat(project_path / directory / name)}" for name in names)
+    try:
+        listed = sorted(os.listdir(project_path / ARTIFACT_LISTING))[:LISTED_ARTIFACTS]
+    except OSError:
+        listed = []
+    parts.append("artifacts=" + "/".join(listed))
+    return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+def compile_context(project_path: Path, output: str = STAGED_CONTEXT,
+                    feature: Optional[Dict[str, Any]] = None) -> Optional[Path]:
+    """
+    Compile the working context for feature (the one the session will
+    work on) into output instead of the live file. Returns the compiled
+    file, or None on failure.
+    """
+    try:
+        return context_compiler.compile_context(project_path, output, feature=feature)["path"]
+    except OSError:
+        return None
+
+def install_context(project_path: Path, staged: Optional[Path]) -> bool:
+    """Move a staged context into place as the working context."""
+    if staged is None:
+        return False
+    try:
+        os.replace(staged, Path(project_path) / WORKING_CONTEXT)
+    except OSError:
+        return False
+    return True
+
+def _feature_key(feature: Dict[str, Any]) -> str:
+    return json.dumps(feature, sort_keys=True, default=str)
+
+class SessionPrep:
+    """One speculative preparation at a time, run in a worker thread."""
+
+    def __init__(self, prepare: Callable[[Dict[str, Any], int], Dict[str, Any]]):
+        self.prepare = prepare
+        self._thread: Optional[threading.Thread] = None
+        self._result: Optional[Dict[str, Any]] = None
+
+    def start(self, project_path: Path, feature: Dict[str, Any], session_num: int):
+        """Begin preparing session_num for feature (replaces any earlier one)."""
+        self.wait()
+        self._result = None
+
+        def run():
+            started = time.time()
+            fingerprint = context_fingerprint(project_path)
+            try:
+                result = self.prepare(feature, session_num)
+            except Exception as e:
+                result = {"error": str(e)}
+            result.update(feature_key=_feature_key(feature), session=session_num,
+                          fingerprint=fingerprint, elapsed=time.time() - started)
+            self._result = result
+
+        self._thread = threading.Thread(target=run, name="session-prep", daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def take(self, project_path: Path, feature: Dict[str, Any], session_num: int) -> Optional[Dict[str, Any]]:
+        """
+        The prepared inputs if they were made for this feature and session,
+        with "stale" set when the context's inputs changed since. None if
+        nothing usable was prepared.
+        """
+        self.wait()
+        result, self._result = self._result, None
+        if (not result or "error" in result or result["session"] != session_num
+                or result["feature_key"] != _feature_key(feature)):
+            return None
+        result["stale"] = result["fingerprint"] != context_fingerprint(project_path)
+        return result
@@ -0,0 +1,447 @@
+"""
+Streaming Session Runner
+========================
+Runs `claude -p` under asyncio and parses its stream-json output as it
+arrives, instead of blocking in subprocess.run() until the session exits.
+
+Every stdout line is one JSON event (system init, assistant messages
+with tool calls, tool results, the final result with usage and cost).
+Events are folded into a stats dict while the session runs and handed to
+an optional progress callback, so callers can show live progress and
+account for tokens per session. Non-JSON lines are kept as plain output.
+
+Sessions can be stopped cooperatively: set the `cancel` event (or cancel
+the awaiting task) and the child's process group is terminated, then
+killed if it does not exit. One event loop can drive many sessions - no
+thread per child.
+
+With stall_timeout set, a watchdog ends sessions that show no sign of
+life for that long: no stdout, no new lines in
+.agent/sessions/activity.jsonl (PostToolUse hook) and no file modified
+in the working tree. The tree is only scanned when the other signals
+have been quiet for the whole window. While a tool call is open (a
+tool_use without its tool_result yet - a long cargo test or npm ci) the
+window is tool_stall_timeout instead (TOOL_STALL_TIMEOUT by default), so
+long builds survive but a hung test or foreground dev server is still
+stopped.
+
+With reap set, whatever the session left running in its process group
+(dev servers it started for browser testing) is stopped once it exits.
+
+Usage:
+    result = run_claude_session(stream_json_command(model, prompt), cwd,
+                                on_event=lambda event, stats: ...)
+    result["success"], result["usage"], result["tool_calls"]
+"""
+
+import asyncio
+import json
+import os
+import signal
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set
+
+READ_SIZE = 1 << 16
+STDERR_LIMIT = 1 << 16      # keep the last 64 KB of stderr
+KILL_GRACE_SECONDS = 5
+WATCHDOG_POLL_SECONDS = 15
+TOOL_STALL_TIMEOUT = 1800   # quiet seconds allowed while a tool call is open
+
+ACTIVITY_LOG = ".agent/sessions/activity.jsonl"
+# Not scanned for modifications: VCS data, dependencies, build output
+WATCH_SKIP_DIRS = {".git", "node_modules", ".venv", "venv", "__pycache__", "target",
+                   "dist", "build", ".next", ".cache"}
+
+USAGE_KEYS = ("input_tokens", "output_tokens", "cache_creation_input_tokens",
+              "cache_read_input_tokens")
+
+EventCallback = Callable[[Dict[str, Any], Dict[str, Any]], None]
+
+def stream_json_command(model: str, prompt: str) -> List[str]:
+    """claude invocation that streams one JSON event per line."""
+    return [
+        "claude",
+        "--model", model,
+        "--permission-mode", "bypassPermissions",
+        "--output-format", "stream-json",
+        "--verbose",
+        "-p", prompt
+    ]
+
+# ============================================================================
+# Event Parsing
+# ============================================================================
+
+def new_stats() -> Dict[str, Any]:
+    return {
+        "session_id": None,
+        "events": 0,
+        "tool_calls": 0,
+        "tool_errors": 0,
+        "tools": {},
+        "usage": {key: 0 for key in USAGE_KEYS},
+        "cost_usd": None,
+        "num_turns": None,
+        "duration_ms": None,
+        "api_ms": None,
+        "model": None,
+        "result": None,
+        "is_error": False,
+        "last_event_at": None
+    }
+
+def parse_event(line: str) -> Optional[Dict[str, Any]]:
+    """Decode one stream-json line; None for blank or non-JSON lines."""
+    line = line.strip()
+    if not line.startswith("{"):
+        return None
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    return event if isinstance(event, dict) else None
+
+def _content(event: Dict[str, Any]) -> List[Dict[str, Any]]:
+    message = event.get("message")
+    content = message.get("content") if isinstance(message, dict) else None
+    return [block for block in content if isinstance(block, dict)] if isinstance(content, list) else []
+
+def apply_event(stats: Dict[str, Any], event: Dict[str, Any], message_usage: Dict[str, Dict]):
+    """
+    Fold one event into stats. message_usage tracks per-message usage
+    (assistant messages repeat it for every content block) until the
+    final result event reports the session totals.
+    """
+    stats["events"] += 1
+    stats["last_event_at"] = time.time()
+    kind = event.get("type")
+
+    if kind == "system" and event.get("subtype") == "init":
+        stats["session_id"] = event.get("session_id")
+        stats["model"] = event.get("model") or stats["model"]
+
+    elif kind == "assistant":
+        for block in _content(event):
+            if block.get("type") == "tool_use":
+                name = block.get("name", "unknown")
+                stats["tool_calls"] += 1
+                stats["tools"][name] = stats["tools"].get(name, 0) + 1
+        message = event.get("message") or {}
+        stats["model"] = stats["model"] or message.get("model")
+        usage = message.get("usage")
+        if isinstance(usage, dict):
+            message_usage[message.get("id") or len(message_usage)] = usage
+            for key in USAGE_KEYS:
+                stats["usage"][key] = sum(int(u.get(key) or 0) for u in message_usage.values())
+
+    elif kind == "user":
+        for block in _content(event):
+            if block.get("type") == "tool_result" and block.get("is_error"):
+                stats["tool_errors"] += 1
+
+    elif kind == "result":
+        stats["result"] = event.get("result")
+        stats["is_error"] = bool(event.get("is_error", False))
+        stats["cost_usd"] = event.get("total_cost_usd", event.get("cost_usd"))
+        stats["num_turns"] = event.get("num_turns")
+        stats["duration_ms"] = event.get("duration_ms")
+        stats["api_ms"] = event.get("duration_api_ms")
+        stats["session_id"] = event.get("session_id") or stats["session_id"]
+        usage = event.get("usage")
+        if isinstance(usage, dict):
+            for key in USAGE_KEYS:
+                stats["usage"][key] = int(usage.get(key) or 0)
+
+def describe_event(event: Dict[str, Any]) -> Optional[str]:
+    """One-line summary of an event for live progress, or None."""
+    kind = event.get("type")
+    if kind == "assistant":
+        lines = []
+        for block in _content(event):
+            if block.get("type") != "tool_use":
+                continue
+            tool_input = block.get("input") or {}
+            hint = (tool_input.get("command") or tool_input.get("file_path")
+                    or tool_input.get("pattern") or tool_input.get("description") or "")
+            hint = " ".join(str(hint).split())
+            if len(hint) > 70:
+                hint = hint[:67] + "..."
+            lines.append(f"🔧 {block.get('name', 'tool')}" + (f": {hint}" if hint else ""))
+        return "\n".join(lines) or None
+    if kind == "result":
+        turns = event.get("num_turns")
+        cost = event.get("total_cost_usd", event.get("cost_usd"))
+        parts = [("❌ failed" if event.get("is_error") else "✅ finished")]
+        if turns is not None:
+            parts.append(f"{turns} turns")
+        if cost is not None:
+            parts.append(f"${cost:.2f}")
+        return ", ".join(parts)
+    return None
+
+# ============================================================================
+# Running
+# ============================================================================
+
+class ActivityWatcher:
+    """Tracks a session's last sign of life for the stall watchdog."""
+
+    def __init__(self, root: Path, stall_timeout: float, tool_stall_timeout: Optional[float] = None):
+        self.root = Path(root)
+        self.stall_timeout = stall_timeout
+        self.tool_stall_timeout = max(stall_timeout, tool_stall_timeout or TOOL_STALL_TIMEOUT)
+        self.last_activity = time.time()
+        self.open_tools: Set[str] = set()
+        # Other sessions' worktrees are not this session's activity
+        self._skip_paths = {str(self.root / ".agent" / "worktrees")}
+
+    def touch(self):
+        """Record output from the session."""
+        self.last_activity = time.time()
+
+    def observe(self, event: Dict[str, Any]):
+        """Track tool calls that have started and not yet returned."""
+        kind = event.get("type")
+        if kind not in ("assistant", "user"):
+            return
+        for block in _content(event):
+            if kind == "assistant" and block.get("type") == "tool_use" and block.get("id"):
+                self.open_tools.add(block["id"])
+            elif kind == "user" and block.get("type") == "tool_result":
+                self.open_tools.discard(block.get("tool_use_id"))
+
+    def _modified_since(self, since: float) -> bool:
+        """True if the activity log or any file in the tree changed after since."""
+        try:
+            if (self.root / ACTIVITY_LOG).stat().st_mtime > since:
+                return True
+        except OSError:
+            pass
+        stack = [self.root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    try:
+                        if entry.stat(follow_symlinks=False).st_mtime > since:
+                            return True
+                        if (entry.is_dir(follow_symlinks=False) and entry.name not in WATCH_SKIP_DIRS
+                                and entry.path not in self._skip_paths):
+                            stack.append(entry.path)
+                    except OSError:
+                        continue
+        return False
+
+    def stalled(self) -> bool:
+        """
+        True once nothing has happened for stall_timeout seconds, or
+        tool_stall_timeout while a tool call is open. Only scans the
+        filesystem when stdout has been quiet that long.
+        """
+        now = time.time()
+        window = self.tool_stall_timeout if self.open_tools else self.stall_timeout
+        if now - self.last_activity < window:
+            return False
+        if self._modified_since(self.last_activity):
+            self.last_activity = now
+            return False
+        return True
+
+def _signal_group(proc: asyncio.subprocess.Process, sig: int):
+    """Signal the child's whole process group (test servers, shells...)."""
+    try:
+        os.killpg(proc.pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+    except OSError:
+        try:
+            proc.send_signal(sig)
+        except ProcessLookupError:
+            pass
+
+async def stop_process(proc: asyncio.subprocess.Process, grace: float = KILL_GRACE_SECONDS):
+    """SIGTERM the process group, SIGKILL it if still running after grace."""
+    if proc.returncode is None:
+        _signal_group(proc, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(proc.wait(), grace)
+        except asyncio.TimeoutError:
+            pass
+    # Grandchildren may outlive the leader; make sure the group is gone
+    _signal_group(proc, signal.SIGKILL)
+    await proc.wait()
+
+async def _read_stderr(stream: asyncio.StreamReader, tail: bytearray):
+    while True:
+        chunk = await stream.read(READ_SIZE)
+        if not chunk:
+            return
+        tail.extend(chunk)
+        if len(tail) > STDERR_LIMIT:
+            del tail[:len(tail) - STDERR_LIMIT]
+
+async def run_claude_session_async(
+    cmd: List[str],
+    cwd: Path,
+    timeout: float = 3600,
+    on_event: Optional[EventCallback] = None,
+    cancel: Optional[asyncio.Event] = None,
+    log_file: Optional[Path] = None,
+    stall_timeout: Optional[float] = None,
+    env: Optional[Dict[str, str]] = None,
+    reap: bool = False,
+    tool_stall_timeout: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Run a session, parsing stream-json events as they arrive.
+
+    on_event(event, stats) is called for every JSON event. Setting
+    `cancel` (or cancelling this task) stops the session's process group,
+    as does stall_timeout seconds without any activity (tool_stall_timeout
+    while a tool call is open). env is added to the inherited environment.
+
+    Returns run_claude_code()'s dict (success, output, error, elapsed,
+    returncode) plus cancelled, timed_out, stalled and the parsed stats.
+    """
+    start_time = time.time()
+    stats = new_stats()
+    message_usage: Dict[str, Dict] = {}
+    output: List[str] = []
+    stderr_tail = bytearray()
+    outcome = {"cancelled": False, "timed_out": False, "stalled": False}
+    watcher = ActivityWatcher(cwd, stall_timeout, tool_stall_timeout) if stall_timeout else None
+
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        cwd=str(cwd),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        env=dict(os.environ, **env) if env else None,
+        start_new_session=True  # own process group, killed as a unit
+    )
+    log = open(log_file, "a") if log_file else None
+
+    def handle_line(raw: bytes):
+        line = raw.decode("utf-8", errors="replace")
+        if watcher:
+            watcher.touch()
+        if log:
+            log.write(line + "\n")
+            log.flush()
+        event = parse_event(line)
+        if event is None:
+            if line.strip():
+                output.append(line)
+            return
+        apply_event(stats, event, message_usage)
+        if watcher:
+            watcher.observe(event)
+        if on_event:
+            on_event(event, stats)
+
+    async def read_stdout():
+        # Manual line splitting: tool results can exceed StreamReader's limit
+        buf = bytearray()
+        while True:
+            chunk = await proc.stdout.read(READ_SIZE)
+            if not chunk:
+                break
+            buf.extend(chunk)
+            start = 0
+            while True:
+                end = buf.find(b"\n", start)
+                if end < 0:
+                    break
+                handle_line(bytes(buf[start:end]))
+                start = end + 1
+            del buf[:start]
+        if buf:
+            handle_line(bytes(buf))
+        await proc.wait()
+
+    readers = asyncio.gather(read_stdout(), _read_stderr(proc.stderr, stderr_tail))
+    waiters = [readers]
+    cancel_waiter = None
+    if cancel is not None:
+        cancel_waiter = asyncio.ensure_future(cancel.wait())
+        waiters.append(cancel_waiter)
+
+    async def watchdog():
+        loop = asyncio.get_running_loop()
+        poll = min(WATCHDOG_POLL_SECONDS, stall_timeout / 2)
+        while True:
+            await asyncio.sleep(poll)
+            # Tree scans can be slow; keep them off the event loop
+            if await loop.run_in_executor(None, watcher.stalled):
+                return
+
+    watchdog_task = None
+    if watcher:
+        watchdog_task = asyncio.ensure_future(watchdog())
+        waiters.append(watchdog_task)
+
+    try:
+        done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if readers not in done:
+            if cancel_waiter in done:
+                outcome["cancelled"] = True
+            elif watchdog_task in done:
+                outcome["stalled"] = True
+            else:
+                outcome["timed_out"] = True
+            await stop_process(proc)
+        await readers
+    except asyncio.CancelledError:
+        outcome["cancelled"] = True
+        await stop_process(proc)
+        readers.cancel()
+        raise
+    finally:
+        for waiter in (cancel_waiter, watchdog_task):
+            if waiter is not None:
+                waiter.cancel()
+        if log:
+            log.close()
+    if reap:
+        await stop_process(proc)
+
+    error = stderr_tail.decode("utf-8", errors="replace")
+    if outcome["timed_out"]:
+        error = f"Session timed out after {timeout}s\n{error}".rstrip()
+    elif outcome["stalled"]:
+        quiet = watcher.tool_stall_timeout if watcher.open_tools else stall_timeout
+        tool = " during a tool call" if watcher.open_tools else ""
+        error = f"Session stalled: no activity{tool} for {quiet:.0f}s\n{error}".rstrip()
+    elif outcome["cancelled"]:
+        error = f"Session cancelled\n{error}".rstrip()
+
+    returncode = -1 if any(outcome.values()) else proc.returncode
+    result_text = stats["result"]
+    return {
+        "success": returncode == 0 and not stats["is_error"],
+        "output": result_text if result_text is not None else "\n".join(output),
+        "error": error,
+        "elapsed": time.time() - start_time,
+        "returncode": returncode,
+        "cancelled": outcome["cancelled"],
+        "timed_out": outcome["timed_out"],
+        "stalled": outcome["stalled"],
+        "stats": stats
+    }
+
+def run_claude_session(cmd: List[str], cwd: Path, timeout: float = 3600,
+                       on_event: Optional[EventCallback] = None,
+                       log_file: Optional[Path] = None,
+                       stall_timeout: Optional[float] = None,
+                       env: Optional[Dict[str, str]] = None,
+                       reap: bool = False,
+                       tool_stall_timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Blocking wrapper around run_claude_session_async() (own event loop)."""
+    return asyncio.run(run_claude_session_async(cmd, cwd, timeout=timeout, on_event=on_event,
+                                                log_file=log_file, stall_timeout=stall_timeout,
+                                                env=env, reap=reap, tool_stall_timeout=tool_stall_timeout))
@@ -0,0 +1,224 @@
+"""
+Session Usage Accounting
+========================
+Tokens, cost, turns and API time of every agent session, appended as
+"session_usage" events to .agent/metrics/session-metrics.jsonl next to
+the events track-metrics.sh writes, so one file holds both a session's
+wall time and what it consumed.
+
+Streaming sessions (session_runner) get usage, cost, turns and API time
+from their final result event. Interactive sessions print no structured
+output; their usage is read back from the transcript Claude Code keeps
+under ~/.claude/projects/. Transcripts carry no cost, and their API time
+is estimated from message timestamps.
+
+summarize() aggregates the records per feature and per complexity tier
+for --metrics: where the tokens go, how much of the input is served
+from the prompt cache, and what a session costs at each tier.
+
+Usage:
+    tier = usage_tier(feature, get_feature_complexity)   # "qa" or the complexity
+    record(project_path, result["stats"], "F003", session=3, complexity=tier)
+    stats = transcript_stats(project_path, since=start_time)
+    report = summarize(project_path)
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from context_engine.session_runner import USAGE_KEYS, apply_event, new_stats, parse_event
+from context_engine.worktrees import main_checkout
+
+METRICS_FILE = ".agent/metrics/session-metrics.jsonl"
+EVENT = "session_usage"
+
+def total_tokens(usage: Dict[str, Any]) -> int:
+    return sum(int(usage.get(key) or 0) for key in USAGE_KEYS)
+
+def cache_hit_ratio(usage: Dict[str, Any]) -> Optional[float]:
+    """Share of input tokens read from the prompt cache."""
+    read = int(usage.get("cache_read_input_tokens") or 0)
+    total = read + int(usage.get("input_tokens") or 0) + int(usage.get("cache_creation_input_tokens") or 0)
+    return read / total if total else None
+
+def format_tokens(count: int) -> str:
+    """1.2M / 35k / 800"""
+    if count >= 1_000_000:
+        return f"{count / 1_000_000:.1f}M"
+    if count >= 1_000:
+        return f"{count / 1_000:.0f}k"
+    return str(count)
+
+def describe(stats: Dict[str, Any]) -> str:
+    """One-line usage summary of a session's stats."""
+    usage = stats["usage"]
+    parts = [f"{format_tokens(total_tokens(usage))} tokens"]
+    ratio = cache_hit_ratio(usage)
+    if ratio is not None:
+        parts[0] += f" ({ratio:.0%} cached)"
+    if stats.get("num_turns") is not None:
+        parts.append(f"{stats['num_turns']} turns")
+    if stats.get("cost_usd") is not None:
+        parts.append(f"${stats['cost_usd']:.2f}")
+    if stats.get("api_ms") and stats.get("duration_ms"):
+        api = stats["api_ms"] / 1000
+        parts.append(f"API {api:.0f}s, tools {max(0.0, stats['duration_ms'] / 1000 - api):.0f}s")
+    return ", ".join(parts)
+
+# ============================================================================
+# Interactive Sessions
+# ============================================================================
+
+def transcript_dir(project_path: Path) -> Path:
+    """Where Claude Code keeps the transcripts of sessions run in project_path."""
+    config = os.environ.get("CLAUDE_CONFIG_DIR") or os.path.join(os.path.expanduser("~"), ".claude")
+    slug = re.sub(r"[^A-Za-z0-9]", "-", str(Path(project_path).expanduser().resolve()))
+    return Path(config) / "projects" / slug
+
+def _timestamp(entry: Dict[str, Any]) -> Optional[float]:
+    try:
+        return datetime.fromisoformat(entry["timestamp"].replace("Z", "+00:00")).timestamp()
+    except (KeyError, AttributeError, TypeError, ValueError):
+        return None
+
+def transcript_stats(project_path: Path, since: float) -> Optional[Dict[str, Any]]:
+    """
+    Stats (as session_runner builds them) of the session that wrote the
+    most recent transcript for project_path after since, or None.
+    """
+    try:
+        transcripts = [entry for entry in os.scandir(transcript_dir(project_path))
+                       if entry.name.endswith(".jsonl") and entry.stat().st_mtime >= since]
+    except OSError:
+        return None
+    if not transcripts:
+        return None
+    latest = max(transcripts, key=lambda entry: entry.stat().st_mtime)
+
+    stats = new_stats()
+    stats["source"] = "transcript"
+    message_usage: Dict[str, Dict] = {}
+    # API time: from the entry a message answers to its last content block
+    previous = None
+    spans: Dict[str, list] = {}
+    first = last = None
+    try:
+        with open(latest.path, errors="replace") as f:
+            for line in f:
+                entry = parse_event(line)
+                if entry is None:
+                    continue
+                at = _timestamp(entry)
+                if at is None or at < since:
+                    continue
+                first = first if first is not None else at
+                last = at
+                if entry.get("type") == "assistant":
+                    apply_event(stats, entry, message_usage)
+                    message_id = (entry.get("message") or {}).get("id") or entry.get("uuid")
+                    span = spans.setdefault(message_id, [previous if previous is not None else at, at])
+                    span[1] = at
+                elif entry.get("type") == "user":
+                    apply_event(stats, entry, message_usage)
+                    previous = at
+    except OSError:
+        return None
+    if not stats["events"]:
+        return None
+    stats["session_id"] = os.path.splitext(latest.name)[0]
+    stats["num_turns"] = len(spans)
+    stats["duration_ms"] = int((last - first) * 1000)
+    stats["api_ms"] = int(sum(end - start for start, end in spans.values()) * 1000)
+    return stats
+
+# ============================================================================
+# Recording and Reporting
+# ============================================================================
+
+def is_qa_feature(feature: Dict[str, Any]) -> bool:
+    return feature.get("category", "").lower() == "qa" or feature.get("id", "").startswith("qa-")
+
+def usage_tier(feature: Dict[str, Any], complexity_of: Callable[[Dict[str, Any]], str]) -> str:
+    """Tier session usage is reported under: the complexity, or qa."""
+    return "qa" if is_qa_feature(feature) else complexity_of(feature)
+
+def record(project_path: Path, stats: Optional[Dict[str, Any]], feature_id: str,
+           session: Optional[int] = None, complexity: Optional[str] = None):
+    """Append a session's usage to the main checkout's session metrics."""
+    if not stats or not stats.get("events"):
+        return
+    usage = stats["usage"]
+    entry = {
+        "timestamp": datetime.now().isoformat(),
+        "event": EVENT,
+        "feature_id": feature_id,
+        "session": session,
+        "complexity": complexity,
+        "model": stats.get("model"),
+        "source": stats.get("source", "stream-json"),
+        **{key: int(usage.get(key) or 0) for key in USAGE_KEYS},
+        "num_turns": stats.get("num_turns"),
+        "tool_calls": stats.get("tool_calls"),
+        "cost_usd": stats.get("cost_usd"),
+        "duration_ms": stats.get("duration_ms"),
+        "api_ms": stats.get("api_ms")
+    }
+    entry = {k: v for k, v in entry.items() if v is not None}
+    metrics_file = main_checkout(project_path) / METRICS_FILE
+    try:
+        metrics_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(metrics_file, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+    except OSError:
+        pass
+
+def _new_total() -> Dict[str, Any]:
+    return {"sessions": 0, "tokens": 0, "cost_usd": 0.0, "costed": 0,
+            "usage": {key: 0 for key in USAGE_KEYS}}
+
+def _add(total: Dict[str, Any], entry: Dict[str, Any]):
+    total["sessions"] += 1
+    for key in USAGE_KEYS:
+        total["usage"][key] += int(entry.get(key) or 0)
+    total["tokens"] = total_tokens(total["usage"])
+    if entry.get("cost_usd") is not None:
+        total["cost_usd"] += float(entry["cost_usd"])
+        total["costed"] += 1
+
+def summarize(project_path: Path) -> Dict[str, Any]:
+    """
+    Totals over every recorded session, per feature and per complexity
+    tier. Each total has sessions, tokens, usage, cost_usd and costed (the
+    sessions that reported a cost); the overall one adds cache_hit_ratio
+    and api_share (API time over session time, where both are known).
+    """
+    summary = _new_total()
+    summary.update(by_feature={}, by_complexity={}, api_ms=0, duration_ms=0)
+    try:
+        with open(Path(project_path) / METRICS_FILE) as f:
+            lines = f.readlines()
+    except OSError:
+        lines = []
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(entry, dict) or entry.get("event") != EVENT:
+            continue
+        try:
+            _add(summary, entry)
+            _add(summary["by_feature"].setdefault(entry.get("feature_id", "unknown"), _new_total()), entry)
+            _add(summary["by_complexity"].setdefault(entry.get("complexity") or "unknown", _new_total()), entry)
+            if entry.get("api_ms") and entry.get("duration_ms"):
+                summary["api_ms"] += int(entry["api_ms"])
+                summary["duration_ms"] += int(entry["duration_ms"])
+        except (ValueError, TypeError):
+            continue
+    summary["cache_hit_ratio"] = cache_hit_ratio(summary["usage"])
+    summary["api_share"] = summary["api_ms"] / summary["duration_ms"] if summary["duration_ms"] else None
+    return summary
@@ -0,0 +1,225 @@
+"""
+Test Result Cache
+=================
+Reuses a test run's verdict when neither the code nor the toolchain changed.
+
+Results live in .agent/cache/tests/<key>.json, keyed by:
+
+- the working tree: `git write-tree` over a scratch copy of the index with
+  every file added (`git add -A`, so untracked files count and ignored
+  ones don't); harness state (.agent/, .claude/, feature_list.json) is
+  left out because it changes on every session without affecting tests
+- the test command
+- a toolchain fingerprint: version output of the tools the command uses
+
+The agent runs tests through .agent/hooks/run-tests.sh in STEP 6, which
+runs this module, so post-session verification, the quality gate and
+the Stop hook find the verdict instead of re-running the suite.
+
+Usage:
+    key = cache_key(project_path, "cargo test")
+    entry = lookup(project_path, key)          # None on a miss
+    record(project_path, key, "cargo test", passed, output, duration)
+
+    python3 -m context_engine.test_cache [--project DIR] [--check] [test command...]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from context_engine.atomic import write_json_atomic
+
+CACHE_DIR = ".agent/cache/tests"
+MAX_ENTRIES = 200
+OUTPUT_LIMIT = 256 * 1024   # keep the tail of the output
+SHOWN_LINES = 200           # lines of a cached run's output shown again
+
+# Harness bookkeeping, not test inputs
+EXCLUDED_PATHS = (".agent", ".claude", "feature_list.json")
+
+TOOLCHAIN_PROBES = {
+    "cargo": ("rustc -V", "cargo -V"),
+    "npm": ("node --version", "npm --version"),
+    "go": ("go version",),
+    "pytest": ("python3 --version", "pytest --version"),
+    "make": ("make --version",),
+}
+
+_fingerprints: Dict[str, str] = {}
+
+def _git(project_path: Path, args: List[str], env: Optional[Dict[str, str]] = None) -> Optional[str]:
+    try:
+        result = subprocess.run(["git", *args], cwd=str(project_path), capture_output=True,
+                                text=True, env=env, timeout=120)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def tree_hash(project_path: Path) -> Optional[str]:
+    """
+    Tree object id of the working tree as it is now, without touching the
+    real index. None outside a git repository.
+    """
+    project_path = Path(project_path)
+    index = _git(project_path, ["rev-parse", "--git-path", "index"])
+    if index is None:
+        return None
+    index_path = project_path / index
+
+    fd, scratch = tempfile.mkstemp(prefix="context-engine-index.")
+    os.close(fd)
+    try:
+        # Starting from the real index keeps its stat cache: only files that
+        # changed since the last `git add` get hashed.
+        if index_path.exists():
+            shutil.copyfile(index_path, scratch)
+        else:
+            os.unlink(scratch)
+        env = dict(os.environ, GIT_INDEX_FILE=scratch)
+        if _git(project_path, ["add", "-A"], env) is None:
+            return None
+        _git(project_path, ["rm", "-r", "-q", "--cached", "--ignore-unmatch", "--", *EXCLUDED_PATHS], env)
+        return _git(project_path, ["write-tree"], env)
+    finally:
+        try:
+            os.unlink(scratch)
+        except OSError:
+            pass
+
+def toolchain_fingerprint(command: str) -> str:
+    """Hash of the version output of the tools behind a test command."""
+    tool = command.split()[0] if command.split() else ""
+    cached = _fingerprints.get(tool)
+    if cached is not None:
+        return cached
+
+    outputs = []
+    for probe in TOOLCHAIN_PROBES.get(tool, (f"{tool} --version",)):
+        try:
+            result = subprocess.run(probe, shell=True, capture_output=True, text=True, timeout=30)
+            outputs.append(f"{probe}\n{result.returncode}\n{result.stdout}{result.stderr}")
+        except (OSError, subprocess.TimeoutExpired):
+            outputs.append(f"{probe}\nunavailable")
+    fingerprint = hashlib.sha256("\n".join(outputs).encode()).hexdigest()
+    _fingerprints[tool] = fingerprint
+    return fingerprint
+
+def cache_key(project_path: Path, command: str, tree: Optional[str] = None) -> Optional[str]:
+    """
+    Cache key for running command on the current tree; None if not in git.
+    Pass tree if the caller already has tree_hash() for it.
+    """
+    tree = tree or tree_hash(project_path)
+    if tree is None:
+        return None
+    material = "\0".join((tree, command, toolchain_fingerprint(command)))
+    return hashlib.sha256(material.encode()).hexdigest()
+
+def lookup(project_path: Path, key: str) -> Optional[Dict[str, Any]]:
+    """Cached result for key: {"passed", "output", "command", ...} or None."""
+    try:
+        with open(Path(project_path) / CACHE_DIR / f"{key}.json") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or "passed" not in entry:
+        return None
+    return entry
+
+def record(project_path: Path, key: str, command: str, passed: bool, output: str,
+           duration: float):
+    """Store a finished run (not timeouts or errors) and prune old entries."""
+    cache_dir = Path(project_path) / CACHE_DIR
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(cache_dir / f"{key}.json", {
+            "passed": passed,
+            "command": command,
+            "output": output[-OUTPUT_LIMIT:],
+            "duration": round(duration, 3),
+            "recorded_at": time.time()
+        })
+        entries = sorted(cache_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        for stale in entries[:-MAX_ENTRIES]:
+            stale.unlink()
+    except OSError:
+        pass
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def detect_test_command(project_path: Path) -> Optional[str]:
+    """The project's test command, from the manifests it has."""
+    project_path = Path(project_path)
+    if (project_path / "Cargo.toml").exists():
+        return "cargo test"
+    if (project_path / "package.json").exists():
+        return "npm test"
+    if (project_path / "go.mod").exists():
+        return "go test ./..."
+    if (project_path / "requirements.txt").exists() or (project_path / "pyproject.toml").exists():
+        return "pytest"
+    if (project_path / "Makefile").exists():
+        return "make test"
+    return None
+
+def run(project_path: Path, command: str) -> int:
+    """
+    Run command, streaming its output, unless a result for this tree is
+    cached; a finished run is recorded. Returns the exit status.
+    """
+    project_path = Path(project_path)
+    key = cache_key(project_path, command)
+    entry = lookup(project_path, key) if key else None
+    if entry is not None:
+        print("\n".join(entry.get("output", "").splitlines()[-SHOWN_LINES:]))
+        print(f"♻️  Cached result for this tree: {command} {'passed' if entry['passed'] else 'FAILED'}")
+        return 0 if entry["passed"] else 1
+
+    start = time.time()
+    tail: deque = deque()
+    size = 0
+    proc = subprocess.Popen(command, shell=True, cwd=str(project_path), stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT, text=True, errors="replace")
+    for line in proc.stdout:
+        sys.stdout.write(line)
+        tail.append(line)
+        size += len(line)
+        while size > OUTPUT_LIMIT and len(tail) > 1:
+            size -= len(tail.popleft())
+    returncode = proc.wait()
+    if key:
+        record(project_path, key, command, returncode == 0, "".join(tail), time.time() - start)
+    return returncode
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run tests through the test result cache")
+    parser.add_argument("--project", type=Path, default=Path.cwd(), help="Project path")
+    parser.add_argument("--check", action="store_true",
+                        help="Only report: exit 0 if a passing result is cached for this tree")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="Test command (default: detected)")
+    args = parser.parse_args(argv)
+
+    command = " ".join(args.command) or detect_test_command(args.project)
+    if not command:
+        print("No test command detected")
+        return 1 if args.check else 0
+    if args.check:
+        key = cache_key(args.project, command)
+        entry = lookup(args.project, key) if key else None
+        return 0 if entry is not None and entry["passed"] else 1
+    return run(args.project, command)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,353 @@
+"""
+Per-Test History
+================
+Structured results of every harness test run, kept across sessions in
+.agent/metrics/test-history.db (SQLite): one row per run (command, tree,
+session, feature, verdict) and one per test (status, duration).
+
+Results are ingested line by line (or from a report file) from the
+runners' machine-readable output:
+- pytest: JUnit XML (--junitxml), mapped back to node ids
+- go:     `go test -json` events (the text output is rebuilt from them)
+- cargo:  libtest's `test <name> ... ok` lines; stable libtest reports no
+          per-test durations, so those are left empty
+
+Other runners (npm, make) record the run without per-test rows.
+
+The history enables:
+- failed-first: tests whose latest result is a failure re-run before
+  the full suite, so a still-broken test fails verification in seconds
+- flaky detection: a test that both passed and failed on the same tree
+  is flaky; failures are retried once and a run whose failures all pass
+  on retry counts as passed
+- slow_tests(): the loop runner's --slow-tests report
+
+Worktrees share the main checkout's database (found via the git common
+dir), so parallel sessions build one history.
+
+Usage:
+    command, report = instrument("pytest", "pytest tests/a.py", scratch_dir, 0)
+    results = new_results()
+    for line in output:
+        shown = apply_line("pytest", results, line)
+    tests = results["tests"] + read_report(project_path, "pytest", report)
+    record_run(project_path, "pytest", "pytest", tree, passed, duration,
+               tests, session=3, feature="auth-001")
+    retry = targeted_command("pytest", "pytest", last_failed(project_path, "pytest"), project_path)
+"""
+
+import json
+import os
+import re
+import shlex
+import sqlite3
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, List, Optional, Tuple
+
+from context_engine.worktrees import main_checkout
+
+DB_FILE = ".agent/metrics/test-history.db"
+MAX_RUNS = 500              # older runs are pruned
+MAX_TARGETED = 50           # failed-first / retry only for a handful of tests
+SLOW_SAMPLE = 10            # recent passing durations per test for --slow-tests
+COLLECTION = "<collection>"  # name recorded for a pytest module that failed to import
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id         INTEGER PRIMARY KEY,
+    runner     TEXT,
+    command    TEXT NOT NULL,
+    tree       TEXT,
+    session    INTEGER,
+    feature    TEXT,
+    started_at REAL NOT NULL,
+    duration   REAL,
+    passed     INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS results (
+    run_id   INTEGER NOT NULL,
+    runner   TEXT NOT NULL,
+    suite    TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    status   TEXT NOT NULL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS results_by_test ON results(runner, suite, name, run_id);
+CREATE INDEX IF NOT EXISTS results_by_run ON results(run_id);
+"""
+
+# A test result: {"suite", "name", "status" (passed/failed/skipped), "duration"}
+TestResult = Dict[str, Any]
+
+def runner_of(test_cmd: Optional[str]) -> Optional[str]:
+    """pytest, go or cargo for the commands this module can ingest."""
+    parts = (test_cmd or "").split()
+    if parts[:1] == ["pytest"]:
+        return "pytest"
+    if parts[:2] == ["go", "test"]:
+        return "go"
+    if parts[:2] == ["cargo", "test"]:
+        return "cargo"
+    return None
+
+def _db_path(project_path: Path) -> Path:
+    """History file of the main checkout, also when called from a worktree."""
+    return main_checkout(project_path) / DB_FILE
+
+def _connect(project_path: Path) -> sqlite3.Connection:
+    path = _db_path(project_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.executescript(SCHEMA)
+    return conn
+
+# ============================================================================
+# Ingestion
+# ============================================================================
+
+def instrument(runner: Optional[str], command: str, scratch_dir: Path, index: int) -> Tuple[str, Optional[Path]]:
+    """
+    Add machine-readable reporting to a (shard) command.
+    Returns (command, report file or None).
+    """
+    if runner == "pytest" and command.startswith("pytest"):
+        report = Path(scratch_dir) / f"junit-{index}.xml"
+        return f"{command} --junitxml={shlex.quote(str(report))}", report
+    if runner == "go" and command.startswith("go test "):
+        return "go test -json " + command[len("go test "):], None
+    return command, None
+
+def new_results() -> Dict[str, Any]:
+    """Parser state for one (shard) command's output."""
+    return {"suite": "", "tests": []}
+
+def apply_line(runner: Optional[str], results: Dict[str, Any], line: str) -> str:
+    """
+    Feed one line of output to the parser; returns the text to display in
+    its place (go's JSON events become their plain output).
+    """
+    if runner == "go":
+        return _apply_go_json(results, line)
+    if runner == "cargo":
+        _apply_libtest(results, line)
+    return line
+
+def read_report(project_path: Path, runner: Optional[str], report: Optional[Path]) -> List[TestResult]:
+    """Results from a report file written by the command (pytest's JUnit XML)."""
+    if runner == "pytest" and report is not None:
+        return _parse_junit(Path(project_path), report)
+    return []
+
+def _pytest_node(project_path: Path, classname: str, name: str) -> Tuple[str, str]:
+    """JUnit classname (tests.test_api.TestLogin) -> (tests/test_api.py, TestLogin::name)."""
+    parts = classname.split(".")
+    for split in range(len(parts), 0, -1):
+        path = "/".join(parts[:split]) + ".py"
+        if (project_path / path).exists() or split == 1:
+            return path, "::".join(parts[split:] + [name])
+    return classname, name
+
+def _parse_junit(project_path: Path, report: Path) -> List[TestResult]:
+    try:
+        root = ET.parse(str(report)).getroot()
+    except (OSError, ET.ParseError):
+        return []
+    results = []
+    for case in root.iter("testcase"):
+        children = {child.tag for child in case}
+        if children & {"failure", "error"}:
+            status = "failed"
+        elif "skipped" in children:
+            status = "skipped"
+        else:
+            status = "passed"
+        suite, name = case.get("file"), case.get("name", "")
+        if not case.get("classname"):
+            # Collection error: name is the module (tests.test_api)
+            suite, name = name.replace(".", "/") + ".py", COLLECTION
+        elif suite:
+            name = "::".join(case.get("classname", "").split(".")[len(suite[:-3].split("/")):] + [name])
+        else:
+            suite, name = _pytest_node(project_path, case.get("classname", ""), name)
+        try:
+            duration = float(case.get("time", ""))
+        except ValueError:
+            duration = None
+        results.append({"suite": suite, "name": name, "status": status, "duration": duration})
+    return results
+
+_GO_STATUS = {"pass": "passed", "fail": "failed", "skip": "skipped"}
+
+def _apply_go_json(results: Dict[str, Any], line: str) -> str:
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return line     # build errors and other non-JSON output
+    if not isinstance(event, dict):
+        return line
+    status = _GO_STATUS.get(event.get("Action"))
+    if status and event.get("Test"):
+        results["tests"].append({"suite": event.get("Package", ""), "name": event["Test"],
+                                 "status": status, "duration": event.get("Elapsed")})
+    return event.get("Output", "")
+
+_LIBTEST_RESULT = re.compile(r"^test (.+?) \.\.\. (ok|FAILED|ignored)\b")
+_CARGO_RUNNING = re.compile(r"^\s+Running (?:.* )?\(?([^\s()]+)\)?\s*$")
+_CARGO_DOCTESTS = re.compile(r"^\s+Doc-tests (\S+)")
+
+def _apply_libtest(results: Dict[str, Any], line: str):
+    match = _LIBTEST_RESULT.match(line)
+    if match:
+        status = {"ok": "passed", "FAILED": "failed"}.get(match.group(2), "skipped")
+        results["tests"].append({"suite": results["suite"], "name": match.group(1),
+                                 "status": status, "duration": None})
+        return
+    running = _CARGO_RUNNING.match(line)
+    if running:
+        # target/debug/deps/api-3f2a... -> api
+        results["suite"] = re.sub(r"-[0-9a-f]{16}$", "", os.path.basename(running.group(1)))
+        return
+    doctests = _CARGO_DOCTESTS.match(line)
+    if doctests:
+        results["suite"] = f"{doctests.group(1)} (doc)"
+
+def record_run(project_path: Path, runner: Optional[str], command: str, tree: Optional[str],
+               passed: bool, duration: float, tests: List[TestResult],
+               session: Optional[int] = None, feature: Optional[str] = None):
+    """Store one run and its per-test results; prunes runs beyond MAX_RUNS."""
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        return
+    try:
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO runs (runner, command, tree, session, feature, started_at, duration, passed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (runner, command, tree, session, feature, time.time() - duration, round(duration, 3),
+                 int(passed))
+            )
+            conn.executemany(
+                "INSERT INTO results (run_id, runner, suite, name, status, duration) VALUES (?, ?, ?, ?, ?, ?)",
+                [(cursor.lastrowid, runner or "", test["suite"], test["name"], test["status"],
+                  test["duration"]) for test in tests]
+            )
+            cutoff = cursor.lastrowid - MAX_RUNS
+            if cutoff > 0:
+                conn.execute("DELETE FROM results WHERE run_id <= ?", (cutoff,))
+                conn.execute("DELETE FROM runs WHERE id <= ?", (cutoff,))
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+
+# ============================================================================
+# Queries
+# ============================================================================
+
+def last_failed(project_path: Path, runner: str) -> List[Tuple[str, str]]:
+    """(suite, name) of tests whose most recent result is a failure."""
+    if not _db_path(project_path).exists():
+        return []
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        return []
+    try:
+        rows = conn.execute(
+            "SELECT suite, name FROM results AS r"
+            " WHERE runner = ? AND status = 'failed' AND run_id = ("
+            "     SELECT MAX(run_id) FROM results"
+            "     WHERE runner = r.runner AND suite = r.suite AND name = r.name)"
+            " ORDER BY suite, name",
+            (runner,)
+        ).fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        conn.close()
+    return [(suite, name) for suite, name in rows]
+
+def targeted_command(runner: str, test_cmd: str, tests: List[Tuple[str, str]],
+                     project_path: Path = Path(".")) -> Optional[str]:
+    """
+    Command running just the given tests, failing fast. None if there
+    are none (or too many) or the runner cannot address single tests.
+    """
+    if runner == "pytest":
+        # Tests of deleted files would make pytest fail on its own
+        nodes = sorted({suite if name == COLLECTION else f"{suite}::{name}" for suite, name in tests
+                        if suite.endswith(".py") and (Path(project_path) / suite).exists()})
+        if not nodes or len(nodes) > MAX_TARGETED:
+            return None
+        return " ".join(shlex.quote(part) for part in ["pytest", "-x", *nodes])
+    if runner == "go":
+        # Subtest results roll up into their top-level test
+        names = sorted({re.escape(name.split("/")[0]) for _, name in tests})
+        if not names or len(names) > MAX_TARGETED:
+            return None
+        pattern = "^(" + "|".join(names) + ")$"
+        return f"go test -failfast -run {shlex.quote(pattern)} " + test_cmd[len("go test "):]
+    if runner == "cargo":
+        names = sorted({name for suite, name in tests if not suite.endswith("(doc)")})
+        if not names or len(names) > MAX_TARGETED:
+            return None
+        separator = " " if " -- " in f" {test_cmd} " else " -- "
+        return test_cmd + separator + " ".join(shlex.quote(name) for name in ["--exact", *names])
+    return None
+
+def flaky_tests(project_path: Path, limit: int = 20) -> List[Dict[str, Any]]:
+    """Tests that both passed and failed on the same tree, most flips first."""
+    if not _db_path(project_path).exists():
+        return []
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        return []
+    try:
+        rows = conn.execute(
+            "SELECT runner, suite, name, COUNT(*) FROM ("
+            "    SELECT r.runner, r.suite, r.name FROM results AS r JOIN runs ON runs.id = r.run_id"
+            "    WHERE runs.tree IS NOT NULL"
+            "    GROUP BY r.runner, r.suite, r.name, runs.tree"
+            "    HAVING SUM(r.status = 'passed') > 0 AND SUM(r.status = 'failed') > 0"
+            ") GROUP BY runner, suite, name ORDER BY COUNT(*) DESC, suite, name LIMIT ?",
+            (limit,)
+        ).fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        conn.close()
+    return [{"runner": runner, "suite": suite, "name": name, "trees": trees}
+            for runner, suite, name, trees in rows]
+
+def slow_tests(project_path: Path, limit: int = 20) -> List[Dict[str, Any]]:
+    """Tests by median duration of their recent passing runs, slowest first."""
+    if not _db_path(project_path).exists():
+        return []
+    try:
+        conn = _connect(project_path)
+    except (OSError, sqlite3.Error):
+        return []
+    samples: Dict[Tuple[str, str, str], List[float]] = {}
+    try:
+        rows = conn.execute(
+            "SELECT runner, suite, name, duration FROM results"
+            " WHERE status = 'passed' AND duration IS NOT NULL ORDER BY run_id DESC"
+        )
+        for runner, suite, name, duration in rows:
+            durations = samples.setdefault((runner, suite, name), [])
+            if len(durations) < SLOW_SAMPLE:
+                durations.append(duration)
+    except sqlite3.Error:
+        pass
+    finally:
+        conn.close()
+    ranked = sorted(samples.items(), key=lambda item: median(item[1]), reverse=True)[:limit]
+    return [{"runner": runner, "suite": suite, "name": name, "median": median(durations),
+             "max": max(durations), "runs": len(durations)}
+            for (runner, suite, name), durations in ranked]
@@ -0,0 +1,349 @@
+"""
+Affected Test Selection
+=======================
+Maps the files a session changed to the tests that can observe them, so
+post-session verification runs a small subset first instead of the
+whole suite.
+
+- pytest: test files whose transitive imports (parsed with ast) include
+  a changed module, plus changed test files; `pytest -x <files>`
+- cargo:  crates containing a changed file; `cargo test -p <crate> ...`
+- go:     changed packages and every package depending on them
+          (`go list -deps`); `go test -failfast <pkgs>`
+- jest:   `jest --bail --findRelatedTests <changed files>`
+
+Anything the selector cannot reason about (build manifests, lockfiles,
+conftest.py, unknown file types, other test runners) returns None and
+the caller runs the full suite. The full suite still runs before a
+feature is marked complete; the subset only fails fast.
+
+Usage:
+    since = current_commit(project_path)
+    ... session ...
+    selection = affected_tests(project_path, "pytest", since)
+    # None -> run full suite; selection["command"] None -> nothing affected
+"""
+
+import ast
+import json
+import os
+import re
+import shlex
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+from context_engine.atomic import write_json_atomic
+
+IMPORT_CACHE = ".agent/cache/python-imports.json"
+MAX_SELECTED = 300          # beyond this, the subset is not worth it
+
+# Changes that cannot affect any test
+DOC_SUFFIXES = {".md", ".rst", ".adoc"}
+HARNESS_PATHS = (".agent/", ".claude/", "feature_list.json", "claude-progress.txt",
+                 "agent-progress.txt")
+SKIP_DIRS = {".git", "node_modules", ".venv", "venv", "__pycache__", "target", "dist",
+             "build", ".agent", ".claude", ".tox", ".mypy_cache", ".pytest_cache"}
+
+def _git(project_path: Path, *args: str) -> Optional[str]:
+    try:
+        result = subprocess.run(["git", *args], cwd=str(project_path), capture_output=True,
+                                text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return result.stdout if result.returncode == 0 else None
+
+def current_commit(project_path: Path) -> Optional[str]:
+    """HEAD commit, or None outside git / before the first commit."""
+    head = _git(project_path, "rev-parse", "--verify", "-q", "HEAD")
+    return head.strip() if head else None
+
+def changed_files(project_path: Path, since: str) -> Optional[List[str]]:
+    """
+    Files changed since a commit: committed, staged, unstaged and
+    untracked. Harness bookkeeping and docs are dropped.
+    """
+    diff = _git(project_path, "diff", "--name-only", "--no-renames", since)
+    untracked = _git(project_path, "ls-files", "--others", "--exclude-standard")
+    if diff is None or untracked is None:
+        return None
+    files = set(diff.split("\n")) | set(untracked.split("\n"))
+    return sorted(
+        path for path in files
+        if path and not path.startswith(HARNESS_PATHS)
+        and os.path.splitext(path)[1].lower() not in DOC_SUFFIXES
+    )
+
+def affected_tests(project_path: Path, test_cmd: Optional[str],
+                   since: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Narrowed test command for the changes since a commit.
+
+    Returns None when the full suite must run, else {"command": str or
+    None (no test affected), "reason": str}.
+    """
+    if not test_cmd or not since:
+        return None
+    project_path = Path(project_path)
+    changed = changed_files(project_path, since)
+    if changed is None:
+        return None
+    if not changed:
+        return {"command": None, "reason": "no code changed"}
+
+    tool = test_cmd.split()[0]
+    if tool == "pytest":
+        return _select_pytest(project_path, test_cmd, changed)
+    if tool == "cargo":
+        return _select_cargo(project_path, changed)
+    if tool == "go":
+        return _select_go(project_path, changed)
+    if tool == "npm":
+        return _select_jest(project_path, changed)
+    return None
+
+def _selection(command_parts: List[str], count: int, noun: str) -> Dict[str, Any]:
+    return {
+        "command": " ".join(shlex.quote(part) for part in command_parts),
+        "reason": f"{count} {noun}{'' if count == 1 else 's'}"
+    }
+
+# ============================================================================
+# pytest: Import Graph
+# ============================================================================
+
+def is_test_file(path: str) -> bool:
+    name = os.path.basename(path)
+    return name.endswith(".py") and (name.startswith("test_") or name.endswith("_test.py"))
+
+def python_files(project_path: Path) -> List[str]:
+    """Relative paths of .py files, skipping VCS, virtualenv and build dirs."""
+    files = []
+    stack = [project_path]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS and not entry.name.startswith("."):
+                        stack.append(entry.path)
+                elif entry.name.endswith(".py"):
+                    files.append(os.path.relpath(entry.path, project_path))
+    return files
+
+def _parse_imports(source: str, path: str) -> List[str]:
+    """Absolute module names imported by a file (relative imports resolved)."""
+    try:
+        tree = ast.parse(source, filename=path)
+    except (SyntaxError, ValueError):
+        return []
+    # a/b/c.py and a/b/__init__.py both resolve relative imports from a.b
+    package = path[:-3].split(os.sep)[:-1]
+
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - (node.level - 1)] if node.level > 1 else package
+                prefix = ".".join(base + ([node.module] if node.module else []))
+            else:
+                prefix = node.module or ""
+            if prefix:
+                modules.append(prefix)
+            # `from pkg import name` may import the submodule pkg.name
+            modules.extend(f"{prefix}.{alias.name}" if prefix else alias.name
+                           for alias in node.names if alias.name != "*")
+    return modules
+
+def _import_table(project_path: Path, files: List[str]) -> Dict[str, List[str]]:
+    """file -> imported modules, reusing parses of unchanged files."""
+    cache_file = project_path / IMPORT_CACHE
+    try:
+        with open(cache_file) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+
+    table: Dict[str, List[str]] = {}
+    fresh: Dict[str, Any] = {}
+    dirty = False
+    for path in files:
+        try:
+            st = os.stat(project_path / path)
+        except OSError:
+            continue
+        stamp = [st.st_mtime_ns, st.st_size]
+        entry = cache.get(path)
+        if entry and entry[0] == stamp:
+            imports = entry[1]
+        else:
+            try:
+                with open(project_path / path, encoding="utf-8", errors="replace") as f:
+                    imports = _parse_imports(f.read(), path)
+            except OSError:
+                continue
+            dirty = True
+        table[path] = imports
+        fresh[path] = [stamp, imports]
+
+    if dirty or len(fresh) != len(cache):
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            write_json_atomic(cache_file, fresh, indent=None)
+        except OSError:
+            pass
+    return table
+
+def _module_files(files: List[str]) -> Dict[str, str]:
+    """Module name -> file, for the repo root and a src/ layout."""
+    modules = {}
+    for path in files:
+        parts = path[:-3].split(os.sep)
+        if parts[-1] == "__init__":
+            parts = parts[:-1]
+        for root_len in ((0, 1) if parts and parts[0] == "src" else (0,)):
+            name = ".".join(parts[root_len:])
+            if name:
+                modules.setdefault(name, path)
+    return modules
+
+def _select_pytest(project_path: Path, test_cmd: str, changed: List[str]) -> Optional[Dict[str, Any]]:
+    for path in changed:
+        name = os.path.basename(path)
+        if not path.endswith(".py") or name == "conftest.py":
+            return None     # config, data or fixtures: anything may depend on it
+        if not os.path.exists(project_path / path):
+            return None     # deleted module: its importers are not in the graph
+
+    files = python_files(project_path)
+    modules = _module_files(files)
+    dependents: Dict[str, Set[str]] = {}
+    for path, imports in _import_table(project_path, files).items():
+        for module in imports:
+            # Importing a.b.c also runs a/__init__.py and a/b/__init__.py
+            pieces = module.split(".")
+            for end in range(1, len(pieces) + 1):
+                target = modules.get(".".join(pieces[:end]))
+                if target and target != path:
+                    dependents.setdefault(target, set()).add(path)
+
+    seen = set(changed)
+    queue = list(seen)
+    while queue:
+        for dependent in dependents.get(queue.pop(), ()):
+            if dependent not in seen:
+                seen.add(dependent)
+                queue.append(dependent)
+
+    tests = sorted(path for path in seen if is_test_file(path))
+    if not tests:
+        return {"command": None, "reason": "no test imports the changed modules"}
+    if len(tests) > MAX_SELECTED:
+        return None
+    return _selection(shlex.split(test_cmd) + ["-x"] + tests, len(tests), "test file")
+
+# ============================================================================
+# cargo: Touched Crates
+# ============================================================================
+
+_PACKAGE_NAME = re.compile(r'^\s*name\s*=\s*"([^"]+)"', re.M)
+
+def _select_cargo(project_path: Path, changed: List[str]) -> Optional[Dict[str, Any]]:
+    crates = {}
+    for path in changed:
+        if os.path.basename(path) in ("Cargo.toml", "Cargo.lock", "build.rs"):
+            return None
+        directory = os.path.dirname(path)
+        while True:
+            manifest = project_path / directory / "Cargo.toml"
+            if manifest.exists():
+                try:
+                    text = manifest.read_text()
+                except OSError:
+                    return None
+                package = text.split("[package]", 1)
+                match = _PACKAGE_NAME.search(package[1]) if len(package) > 1 else None
+                if not match:
+                    return None     # virtual workspace root: file outside any crate
+                crates[match.group(1)] = True
+                break
+            if not directory:
+                return None
+            directory = os.path.dirname(directory)
+
+    args = ["cargo", "test"]
+    for crate in crates:
+        args += ["-p", crate]
+    return _selection(args, len(crates), "crate")
+
+# ============================================================================
+# go: Packages and Reverse Dependencies
+# ============================================================================
+
+def _select_go(project_path: Path, changed: List[str]) -> Optional[Dict[str, Any]]:
+    dirs = set()
+    for path in changed:
+        if not path.endswith(".go"):
+            return None     # go.mod, go.sum, embedded assets...
+        dirs.add(os.path.dirname(path))
+
+    try:
+        result = subprocess.run(
+            ["go", "list", "-f", "{{.ImportPath}}\t{{.Dir}}\t{{join .Deps \" \"}}", "./..."],
+            cwd=str(project_path), capture_output=True, text=True, timeout=120
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+
+    packages = []
+    touched = set()
+    root = str(project_path.resolve())
+    for line in result.stdout.splitlines():
+        import_path, directory, deps = (line.split("\t") + ["", ""])[:3]
+        rel = os.path.relpath(directory, root)
+        packages.append((import_path, set(deps.split())))
+        if (rel if rel != "." else "") in dirs:
+            touched.add(import_path)
+    if not touched:
+        return {"command": None, "reason": "no package contains the changed files"}
+
+    selected = sorted(pkg for pkg, deps in packages if pkg in touched or deps & touched)
+    if len(selected) > MAX_SELECTED:
+        return None
+    return _selection(["go", "test", "-failfast"] + selected, len(selected), "package")
+
+# ============================================================================
+# jest: Related Tests
+# ============================================================================
+
+JS_SUFFIXES = {".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs", ".vue", ".svelte"}
+
+def _select_jest(project_path: Path, changed: List[str]) -> Optional[Dict[str, Any]]:
+    try:
+        with open(project_path / "package.json") as f:
+            package = json.load(f)
+    except (OSError, ValueError):
+        return None
+    test_script = (package.get("scripts") or {}).get("test", "")
+    if "jest" not in test_script:
+        return None
+
+    sources = []
+    for path in changed:
+        if os.path.splitext(path)[1] not in JS_SUFFIXES:
+            return None     # package.json, lockfile, config, snapshots...
+        if os.path.exists(project_path / path):
+            sources.append(path)
+    if not sources:
+        return {"command": None, "reason": "only deleted files"}
+    if len(sources) > MAX_SELECTED:
+        return None
+    return _selection(["npx", "jest", "--bail", "--findRelatedTests"] + sources,
+                      len(sources), "changed file")
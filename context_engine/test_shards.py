@@ -0,0 +1,360 @@
+"""
+Sharded Test Runs
+=================
+Splits a test command into shards that run side by side, one process
+group each, with the timeout applied per shard instead of to the whole
+suite.
+
+- pytest: by test file (explicit file/dir arguments, or every test file
+  under `testpaths` / the project)
+- go:     by package (`go list` expansion of the package patterns)
+- cargo:  by test binary (`cargo test --no-run` builds and lists them;
+          doc tests get a shard of their own)
+
+Files are spread over at most one shard per CPU, heaviest first, using
+file size as the weight unless the caller supplies better weights (e.g.
+recorded durations). Commands the planner does not understand run as a
+single shard, so every test command goes through the same runner.
+
+The shards' verdicts are merged: the run passes only if every shard
+passed, and failing shards' output comes first. With fail_fast, the
+first failing shard stops the others. Shard output is streamed to gzip
+artifacts under .agent/artifacts/tool-outputs; only failure blocks and a
+tail per shard are kept in memory.
+
+Usage:
+    shards = plan_shards(project_path, "pytest") or ["pytest"]
+    result = run_shards(project_path, shards, timeout=300)
+    result["passed"], result["output"], result["timed_out"]
+"""
+
+import json
+import os
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from context_engine.output_capture import MAX_LINE, OutputCapture, new_artifact
+from context_engine.test_select import is_test_file, python_files
+from context_engine.worktrees import main_checkout
+
+BUILD_TIMEOUT = 1800        # cargo test --no-run before the shards start
+PYTEST_NO_TESTS = 5         # exit status when a shard collects nothing
+EXIT_GRACE = 1              # seconds a shard's children may outlive it
+PASSED_TAIL = 2048          # output kept from a passing shard in the merged output
+
+PYTEST_CONFIGS = ("pytest.ini", "pyproject.toml", "setup.cfg", "tox.ini")
+GO_VALUE_FLAGS = {"-run", "-skip", "-timeout", "-count", "-p", "-parallel", "-tags", "-bench",
+                  "-benchtime", "-coverprofile", "-covermode", "-coverpkg", "-cpu", "-o",
+                  "-exec", "-ldflags", "-gcflags", "-mod", "-shuffle"}
+CARGO_VALUE_FLAGS = {"-p", "--package", "--features", "-F", "--target", "--manifest-path",
+                     "--profile", "-j", "--jobs", "--exclude", "--bin", "--test", "--example",
+                     "--bench", "--target-dir", "--color", "--config", "-Z"}
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+def _balance(items: List[str], weight: Callable[[str], float], workers: int) -> List[List[str]]:
+    """Longest-processing-time-first split of items into up to workers groups."""
+    groups: List[Tuple[float, int, List[str]]] = [(0.0, i, []) for i in range(min(workers, len(items)))]
+    for item in sorted(items, key=weight, reverse=True):
+        total, i, members = min(groups)
+        members.append(item)
+        groups[i] = (total + weight(item), i, members)
+        groups.sort(key=lambda group: group[1])
+    return [sorted(members) for _, _, members in groups if members]
+
+def _file_weight(project_path: Path, weights: Optional[Dict[str, float]]) -> Callable[[str], float]:
+    def weight(item: str) -> float:
+        if weights and item in weights:
+            return weights[item]
+        try:
+            return float(os.path.getsize(project_path / item))
+        except OSError:
+            return 1.0
+    return weight
+
+def plan_shards(project_path: Path, test_cmd: str, workers: Optional[int] = None,
+                weights: Optional[Dict[str, float]] = None) -> Optional[List[str]]:
+    """
+    Shard commands for test_cmd, or None if it cannot (or need not) be
+    split - the caller then runs test_cmd as it is.
+    """
+    workers = workers or default_workers()
+    try:
+        args = shlex.split(test_cmd)
+    except ValueError:
+        return None
+    if workers < 2 or not args:
+        return None
+    project_path = Path(project_path)
+    if args[0] == "pytest":
+        return _plan_pytest(project_path, args, workers, weights)
+    if args[:2] == ["go", "test"]:
+        return _plan_go(project_path, args, workers, weights)
+    if args[:2] == ["cargo", "test"]:
+        return _plan_cargo(project_path, args, workers, weights)
+    return None
+
+def _join(args: List[str]) -> str:
+    return " ".join(shlex.quote(arg) for arg in args)
+
+# ============================================================================
+# Planners
+# ============================================================================
+
+def _pytest_testpaths(project_path: Path) -> Optional[List[str]]:
+    """
+    testpaths from the pytest config ([] if unset). None if the config
+    changes which files are tests, which this planner cannot mirror.
+    """
+    for name in PYTEST_CONFIGS:
+        try:
+            text = (project_path / name).read_text()
+        except OSError:
+            continue
+        if "python_files" in text:
+            return None
+        match = re.search(r"^\s*testpaths\s*=\s*(.+)$", text, re.M)
+        if match:
+            return re.findall(r"[\w./-]+", match.group(1).replace("testpaths", ""))
+    return []
+
+def _plan_pytest(project_path: Path, args: List[str], workers: int,
+                 weights: Optional[Dict[str, float]]) -> Optional[List[str]]:
+    options, targets = [], []
+    for arg in args[1:]:
+        path = arg.split("::")[0]
+        if not arg.startswith("-") and (project_path / path).exists():
+            targets.append(path)
+        else:
+            options.append(arg)
+    if any("::" in arg for arg in args):
+        return None
+
+    if not targets:
+        targets = _pytest_testpaths(project_path)
+        if targets is None:
+            return None
+    all_tests = [path for path in python_files(project_path) if is_test_file(path)]
+    files = []
+    for target in targets or [""]:
+        if target.endswith(".py"):
+            files.append(os.path.normpath(target))
+        else:
+            prefix = os.path.normpath(target) + os.sep if target not in ("", ".") else ""
+            files.extend(path for path in all_tests if path.startswith(prefix))
+    files = sorted(set(files))
+    if len(files) < 2:
+        return None
+
+    return [_join([args[0]] + options + group)
+            for group in _balance(files, _file_weight(project_path, weights), workers)]
+
+def _plan_go(project_path: Path, args: List[str], workers: int,
+             weights: Optional[Dict[str, float]]) -> Optional[List[str]]:
+    flags, patterns = [], []
+    rest = args[2:]
+    i = 0
+    while i < len(rest):
+        arg = rest[i]
+        if arg.startswith("-"):
+            flags.append(arg)
+            if arg in GO_VALUE_FLAGS and i + 1 < len(rest):
+                flags.append(rest[i + 1])
+                i += 1
+        else:
+            patterns.append(arg)
+        i += 1
+
+    try:
+        result = subprocess.run(["go", "list", *(patterns or ["."])], cwd=str(project_path),
+                                capture_output=True, text=True, timeout=120)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    packages = result.stdout.split() if result.returncode == 0 else []
+    if len(packages) < 2:
+        return None
+
+    weight = (lambda pkg: weights.get(pkg, 1.0)) if weights else (lambda pkg: 1.0)
+    return [_join(args[:2] + flags + group) for group in _balance(packages, weight, workers)]
+
+def _plan_cargo(project_path: Path, args: List[str], workers: int,
+                weights: Optional[Dict[str, float]]) -> Optional[List[str]]:
+    cargo_args, test_args = args[2:], []
+    if "--" in cargo_args:
+        split = cargo_args.index("--")
+        cargo_args, test_args = cargo_args[:split], cargo_args[split + 1:]
+    i = 0
+    while i < len(cargo_args):
+        arg = cargo_args[i]
+        if arg in ("--doc", "--no-run"):
+            return None
+        if not arg.startswith("-"):
+            return None     # test name filter: leave it to cargo
+        if arg in CARGO_VALUE_FLAGS:
+            i += 1
+        i += 1
+
+    try:
+        result = subprocess.run(
+            ["cargo", "test", *cargo_args, "--no-run", "--message-format=json-render-diagnostics"],
+            cwd=str(project_path), capture_output=True, text=True, timeout=BUILD_TIMEOUT
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None     # build failure: let the plain command report it
+
+    binaries: Dict[str, str] = {}
+    has_lib = False
+    for line in result.stdout.splitlines():
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if message.get("reason") != "compiler-artifact":
+            continue
+        target = message.get("target") or {}
+        if (message.get("profile") or {}).get("test") and message.get("executable"):
+            binaries[message["executable"]] = os.path.dirname(message.get("manifest_path", ""))
+        if "lib" in target.get("kind", []) and target.get("doctest"):
+            has_lib = True
+
+    shards = []
+    weight = _file_weight(project_path, weights)
+    for group in _balance(list(binaries), weight, workers):
+        # Run like cargo does: from the package root, every binary even if one fails
+        steps = [
+            f"echo {shlex.quote('     Running ' + exe)}; (cd {shlex.quote(binaries[exe])} && CARGO_MANIFEST_DIR={shlex.quote(binaries[exe])} "
+            f"{_join([exe] + test_args)}) || status=1"
+            for exe in group
+        ]
+        shards.append("status=0; " + "; ".join(steps) + "; exit $status")
+    if has_lib:
+        shards.append(_join(["cargo", "test", *cargo_args, "--doc"] + (["--"] + test_args if test_args else [])))
+    return shards if len(shards) > 1 else None
+
+# ============================================================================
+# Runner
+# ============================================================================
+
+def _kill_group(proc: subprocess.Popen):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+
+def _watch(proc: subprocess.Popen, timeout: float, timed_out: threading.Event):
+    """
+    Kill the shard's process group at its deadline, or shortly after the
+    shell exits so a leftover child holding the pipe cannot stall it.
+    """
+    try:
+        proc.wait(timeout=timeout)
+        time.sleep(EXIT_GRACE)
+    except subprocess.TimeoutExpired:
+        timed_out.set()
+    _kill_group(proc)
+
+def run_shards(project_path: Path, shards: List[str], timeout: float,
+               workers: Optional[int] = None, fail_fast: bool = False,
+               line_filter: Optional[Callable[[int, str], str]] = None,
+               artifact_prefix: Optional[str] = "tests",
+               labels: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Run shard commands concurrently, each with its own timeout.
+
+    Output is streamed, never held whole: each shard's goes to a gzip
+    artifact (unless artifact_prefix is None) and only a bounded summary
+    (failure blocks and tail, see output_capture) is kept. line_filter
+    (index, line), if given, sees every raw line and returns the text to
+    keep in its place (e.g. to parse a machine-readable format). labels
+    name the shards in the output instead of their commands.
+
+    Returns {"passed", "output", "timed_out", "shards": [{"command",
+    "returncode", "passed", "timed_out", "skipped", "output", "artifact"}]}.
+    """
+    stop = threading.Event()
+    lock = threading.Lock()
+    running: Dict[int, subprocess.Popen] = {}
+    stopped: Set[int] = set()
+    artifact_root = main_checkout(project_path)
+
+    def run(index: int, command: str) -> Dict[str, Any]:
+        shard = {"command": command, "returncode": None, "passed": False,
+                 "timed_out": False, "skipped": False, "output": "", "artifact": None}
+        with lock:
+            if stop.is_set():
+                shard["skipped"] = True
+                return shard
+            proc = subprocess.Popen(command, shell=True, cwd=str(project_path),
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                    text=True, errors="replace", start_new_session=True)
+            running[index] = proc
+        timed_out = threading.Event()
+        watcher = threading.Thread(target=_watch, args=(proc, timeout, timed_out), daemon=True)
+        watcher.start()
+        artifact = new_artifact(artifact_root, artifact_prefix) if artifact_prefix else None
+        capture = OutputCapture(artifact)
+        try:
+            for line in iter(lambda: proc.stdout.readline(MAX_LINE), ""):
+                capture.write(line_filter(index, line) if line_filter else line)
+        finally:
+            capture.close()
+            proc.stdout.close()
+            proc.wait()
+            watcher.join()
+            with lock:
+                running.pop(index, None)
+        shard["output"] = capture.summary()
+        shard["artifact"] = str(capture.artifact) if capture.artifact else None
+        shard["timed_out"] = timed_out.is_set()
+        shard["returncode"] = proc.returncode
+        is_pytest = command.startswith("pytest")
+        shard["passed"] = not shard["timed_out"] and (
+            proc.returncode == 0 or (is_pytest and proc.returncode == PYTEST_NO_TESTS)
+        )
+        if not shard["passed"] and fail_fast:
+            with lock:
+                if not stop.is_set():
+                    stop.set()
+                    for other_index, other in running.items():
+                        stopped.add(other_index)
+                        _kill_group(other)
+        return shard
+
+    with ThreadPoolExecutor(max_workers=min(workers or default_workers(), len(shards)) or 1) as pool:
+        results = list(pool.map(run, range(len(shards)), shards))
+
+    # A shard killed because another one failed is not a failure of its own;
+    # the shard that failed (even if SIGKILLed from outside) still is
+    for index in stopped:
+        shard = results[index]
+        if not shard["passed"] and not shard["timed_out"] and shard["returncode"] == -signal.SIGKILL:
+            shard["skipped"] = True
+
+    passed = all(shard["passed"] for shard in results if not shard["skipped"])
+    timed_out = any(shard["timed_out"] for shard in results)
+    if len(results) == 1:
+        output = results[0]["output"]
+    else:
+        sections = []
+        ordered = sorted(enumerate(results), key=lambda item: (item[1]["passed"] or item[1]["skipped"], item[0]))
+        for i, shard in ordered:
+            if shard["skipped"]:
+                state = "skipped"
+            elif shard["timed_out"]:
+                state = f"TIMED OUT after {timeout:.0f}s"
+            else:
+                state = "passed" if shard["passed"] else "FAILED"
+            output = shard["output"][-PASSED_TAIL:] if shard["passed"] else shard["output"]
+            sections.append(f"=== shard {i + 1}/{len(results)} ({state}): {(labels or shards)[i]}\n{output}")
+        output = "\n".join(sections)
+    return {"passed": passed, "output": output, "timed_out": timed_out, "shards": results}
@@ -0,0 +1,242 @@
+"""
+Feature List Validation
+=======================
+Schema, duplicate-id, dependency and cycle checks for feature_list.json.
+
+Everything runs in one pass over the features plus one linear pass over
+the dependency graph, using id -> index maps instead of rescanning the
+list, so a 100k-feature list validates in well under a second.
+
+Cycles are found with an iterative Tarjan SCC pass (no recursion limit on
+long dependency chains); one cycle is reported for every strongly
+connected component that contains one.
+
+validate_feature_file() runs the same checks over a streamed file (see
+feature_stream.py) for lists too large to load.
+"""
+
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from context_engine.feature_stream import iter_features
+
+REQUIRED_FIELDS = ['id', 'name', 'description']
+OPTIONAL_FIELDS = ['priority', 'category', 'passes', 'blocked', 'blocked_reason',
+                   'blocked_by', 'suggested_fix', 'dependencies', 'tests',
+                   'complexity', 'needs_review', 'qa_origin', 'severity']
+
+def new_result() -> Dict[str, Any]:
+    return {"valid": True, "errors": [], "warnings": []}
+
+def check_feature(feat: Dict[str, Any], i: int, seen_ids: set, result: Dict[str, Any],
+                  all_ids: Optional[set] = None, location: str = ""):
+    """
+    Per-feature checks: required fields, duplicate id, priority, complexity
+    and - when all_ids is given - unknown dependencies.
+    location (e.g. " (line 3, column 5)") is appended to errors.
+    """
+    feat_id = feat.get('id', f'feature_{i}')
+
+    for field in REQUIRED_FIELDS:
+        if field not in feat:
+            result["errors"].append(f"Feature '{feat_id}' missing required field: {field}{location}")
+            result["valid"] = False
+
+    if feat_id in seen_ids:
+        result["errors"].append(f"Duplicate feature ID: {feat_id}{location}")
+        result["valid"] = False
+    seen_ids.add(feat_id)
+
+    priority = feat.get('priority')
+    if priority is not None and not isinstance(priority, (int, float)):
+        result["warnings"].append(f"Feature '{feat_id}' has non-numeric priority: {priority}")
+
+    complexity = feat.get('complexity', '').lower()
+    if complexity and complexity not in ('high', 'medium', 'low'):
+        result["warnings"].append(f"Feature '{feat_id}' has invalid complexity: {complexity}")
+
+    if all_ids is not None:
+        for dep in feat.get('dependencies', []):
+            if dep not in seen_ids and dep not in all_ids:
+                result["warnings"].append(f"Feature '{feat_id}' depends on unknown feature: {dep}")
+
+def check_cycles(ids: Sequence[str], deps: Sequence[Sequence[str]], result: Dict[str, Any]):
+    """Report every dependency cycle as an error."""
+    for cycle in find_dependency_cycles(ids, deps):
+        result["errors"].append(f"Circular dependencies detected: {' -> '.join(cycle)}")
+        result["valid"] = False
+
+def validate_features(features: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Validate a parsed feature list.
+    Returns: {"valid": bool, "errors": [], "warnings": []}
+    """
+    result = new_result()
+    if not features:
+        result["valid"] = False
+        result["errors"].append("No features defined")
+        return result
+
+    ids = [feat.get('id', '') for feat in features]
+    all_ids = {feat.get('id') for feat in features}
+    seen_ids = set()
+    for i, feat in enumerate(features):
+        check_feature(feat, i, seen_ids, result, all_ids)
+
+    check_cycles(ids, [feat.get('dependencies', []) for feat in features], result)
+    return result
+
+def validate_feature_file(feature_file: Path) -> Dict[str, Any]:
+    """
+    Validate feature_list.json without loading it: features are streamed
+    one at a time and only their ids and dependencies are kept. Errors
+    carry the line and column of the offending feature.
+
+    Raises json.JSONDecodeError (with line/column) on malformed JSON.
+    Returns: {"valid": bool, "errors": [], "warnings": []}
+    """
+    result = new_result()
+    ids: List[str] = []
+    deps: List[Tuple[str, ...]] = []
+    seen_ids = set()
+    # Dependencies on ids not seen yet are resolved once every id is known;
+    # None placeholders keep the warnings in file order.
+    forward: List[Tuple[int, str, str]] = []
+
+    for i, (feat, line, col) in enumerate(iter_features(feature_file)):
+        location = f" (line {line}, column {col})"
+        if not isinstance(feat, dict):
+            result["errors"].append(f"Feature {i} is not an object{location}")
+            result["valid"] = False
+            feat = {}
+        check_feature(feat, i, seen_ids, result, location=location)
+
+        feat_id = feat.get('id', f'feature_{i}')
+        feat_deps = tuple(feat.get('dependencies', []))
+        for dep in feat_deps:
+            if dep not in seen_ids:
+                forward.append((len(result["warnings"]), feat_id, dep))
+                result["warnings"].append(None)
+        ids.append(feat.get('id', ''))
+        deps.append(feat_deps)
+
+    if not ids:
+        result["valid"] = False
+        result["errors"].append("No features defined")
+        return result
+
+    all_ids = set(ids)
+    for index, feat_id, dep in forward:
+        if dep not in all_ids:
+            result["warnings"][index] = f"Feature '{feat_id}' depends on unknown feature: {dep}"
+    result["warnings"] = [w for w in result["warnings"] if w is not None]
+
+    check_cycles(ids, deps, result)
+    return result
+
+# ============================================================================
+# Cycle Detection
+# ============================================================================
+
+def find_dependency_cycles(ids: Sequence[str], deps: Sequence[Sequence[str]]) -> List[List[str]]:
+    """
+    Find dependency cycles with an iterative Tarjan SCC pass.
+
+    Returns one cycle per cyclic strongly connected component, each as a
+    list of feature IDs starting and ending with the same ID (following
+    dependency edges), ordered by where the cycle's first feature appears
+    in the file. Returns an empty list if the graph is acyclic.
+    """
+    # Node per unique id; a duplicated id takes the last definition's deps
+    node_of: Dict[str, int] = {}
+    for i, feat_id in enumerate(ids):
+        node_of[feat_id] = i
+    nodes = list(node_of)
+    number = {feat_id: n for n, feat_id in enumerate(nodes)}
+    adj = [
+        [number[dep] for dep in deps[node_of[feat_id]] if dep in number]
+        for feat_id in nodes
+    ]
+
+    # Peel off features that cannot be on a cycle (Kahn); an acyclic list
+    # - the common case - never reaches the SCC pass.
+    count = len(nodes)
+    indegree = [0] * count
+    for edges in adj:
+        for w in edges:
+            indegree[w] += 1
+    peel = [v for v in range(count) if indegree[v] == 0]
+    for v in peel:
+        for w in adj[v]:
+            indegree[w] -= 1
+            if indegree[w] == 0:
+                peel.append(w)
+    if len(peel) == count:
+        return []
+
+    order = [-1] * count
+    low = [0] * count
+    on_stack = [False] * count
+    stack: List[int] = []
+    sccs: List[List[int]] = []
+    counter = 0
+
+    for root in range(count):
+        if order[root] != -1 or indegree[root] == 0:
+            continue
+        order[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(adj[root]))]
+
+        while work:
+            v, edges = work[-1]
+            for w in edges:
+                if order[w] == -1:
+                    order[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, iter(adj[w])))
+                    break
+                if on_stack[w] and order[w] < low[v]:
+                    low[v] = order[w]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[v] < low[parent]:
+                        low[parent] = low[v]
+                if low[v] == order[v]:
+                    scc = []
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = False
+                        scc.append(w)
+                        if w == v:
+                            break
+                    if len(scc) > 1 or v in adj[v]:
+                        sccs.append(scc)
+
+    cycles = [_cycle_through(min(scc), set(scc), adj) for scc in sccs]
+    cycles.sort(key=lambda cycle: cycle[0])
+    return [[nodes[n] for n in cycle] for cycle in cycles]
+
+def _cycle_through(start: int, members: set, adj: List[List[int]]) -> List[int]:
+    """Shortest cycle from start back to itself inside one SCC (BFS)."""
+    parent = {start: None}
+    queue = deque([start])
+    while queue:
+        v = queue.popleft()
+        for w in adj[v]:
+            if w == start:
+                path = [v]
+                while parent[path[-1]] is not None:
+                    path.append(parent[path[-1]])
+                return path[::-1] + [start]
+            if w in members and w not in parent:
+                parent[w] = v
+                queue.append(w)
+    return [start, start]
@@ -0,0 +1,200 @@
+"""
+Feature Worktrees
+=================
+Isolated git worktrees for running several feature sessions at once.
+
+Each feature gets its own checkout under .agent/worktrees/<id> on branch
+context-engine/<id>, created from the main branch's HEAD. When the
+session finishes, the branch is merged back into the main checkout -
+one merge at a time, from the harness's main thread.
+
+feature_list.json is never merged textually (parallel sessions all touch
+it, usually on neighbouring lines). It is merged by feature id instead:
+the branch's changes relative to the merge base (fields it set, features
+it added) are applied on top of the main branch's copy. A conflict in
+any other file aborts the merge so the feature can be re-queued.
+
+Usage:
+    tree = create_worktree(project_path, feature_id)
+    ... run the session with cwd=tree.path ...
+    merged = merge_worktree(project_path, tree, "session: completed F003")
+    remove_worktree(project_path, tree)
+"""
+
+import copy
+import json
+import re
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from context_engine.atomic import write_json_atomic
+from context_engine.feature_store import FEATURE_FILE, get_store
+
+WORKTREE_DIR = ".agent/worktrees"
+BRANCH_PREFIX = "context-engine/"
+
+class Worktree(NamedTuple):
+    feature_id: str
+    path: Path
+    branch: str
+
+def _git(cwd: Path, *args: str, timeout: int = 120) -> subprocess.CompletedProcess:
+    return subprocess.run(["git", *args], cwd=str(cwd), capture_output=True,
+                          text=True, timeout=timeout)
+
+def _slug(feature_id: str) -> str:
+    """Feature id made safe for a path component and a branch name."""
+    return re.sub(r"[^A-Za-z0-9._-]", "-", feature_id).strip(".-") or "feature"
+
+# ============================================================================
+# Worktree Lifecycle
+# ============================================================================
+
+def main_checkout(path: Path) -> Path:
+    """
+    The main checkout a worktree belongs to (path itself if it is the main
+    checkout or not in git). Harness state that must outlive a worktree
+    is written there.
+    """
+    path = Path(path)
+    try:
+        result = _git(path, "rev-parse", "--path-format=absolute", "--git-common-dir", timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return path
+    common = Path(result.stdout.strip()) if result.returncode == 0 else None
+    return common.parent if common and common.name == ".git" else path
+
+def create_worktree(project_path: Path, feature_id: str) -> Worktree:
+    """
+    Check out HEAD into a fresh worktree on a per-feature branch.
+    Raises RuntimeError if git refuses.
+    """
+    project_path = Path(project_path)
+    root = project_path / WORKTREE_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    # Keep nested checkouts out of the main tree's `git add -A`
+    ignore_file = root / ".gitignore"
+    if not ignore_file.exists():
+        ignore_file.write_text("*\n")
+
+    slug = _slug(feature_id)
+    tree = Worktree(feature_id, root / slug, BRANCH_PREFIX + slug)
+    if tree.path.exists():
+        remove_worktree(project_path, tree)
+    _git(project_path, "worktree", "prune")
+
+    result = _git(project_path, "worktree", "add", "-B", tree.branch, str(tree.path), "HEAD")
+    if result.returncode != 0:
+        raise RuntimeError(f"git worktree add failed: {result.stderr.strip()}")
+    return tree
+
+def remove_worktree(project_path: Path, tree: Worktree):
+    """Delete the worktree and its branch (best effort)."""
+    _git(project_path, "worktree", "remove", "--force", str(tree.path))
+    _git(project_path, "worktree", "prune")
+    _git(project_path, "branch", "-D", tree.branch)
+
+def commit_all(path: Path, message: str) -> bool:
+    """Commit every change in a checkout. Returns False if nothing changed."""
+    _git(path, "add", "-A")
+    if _git(path, "diff", "--cached", "--quiet").returncode == 0:
+        return False
+    return _git(path, "commit", "-m", message).returncode == 0
+
+# ============================================================================
+# Merging
+# ============================================================================
+
+def _features_by_id(document: Dict[str, Any]) -> Dict[Any, Dict[str, Any]]:
+    by_id = {}
+    for feat in document.get("features", []):
+        by_id.setdefault(feat.get("id"), feat)
+    return by_id
+
+def _apply_changes(target: Dict[str, Any], base: Dict[str, Any], theirs: Dict[str, Any],
+                   skip: tuple = ()):
+    """Apply fields theirs changed relative to base onto target."""
+    for key in set(base) | set(theirs):
+        if key in skip or base.get(key) == theirs.get(key):
+            continue
+        if key in theirs:
+            target[key] = copy.deepcopy(theirs[key])
+        else:
+            target.pop(key, None)
+
+def merge_feature_lists(base: Dict[str, Any], ours: Dict[str, Any],
+                        theirs: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Three-way merge of feature_list.json documents by feature id.
+
+    Starts from ours; fields theirs changed relative to base are applied
+    to the matching feature, and features theirs added are appended.
+    """
+    merged = copy.deepcopy(ours)
+    _apply_changes(merged, base, theirs, skip=("features",))
+
+    features: List[Dict[str, Any]] = merged.setdefault("features", [])
+    base_by_id = _features_by_id(base)
+    ours_by_id = _features_by_id(merged)
+    for feat in theirs.get("features", []):
+        feat_id = feat.get("id")
+        if feat_id in ours_by_id:
+            if feat_id in base_by_id:
+                _apply_changes(ours_by_id[feat_id], base_by_id[feat_id], feat)
+        elif feat_id not in base_by_id:
+            features.append(copy.deepcopy(feat))
+            ours_by_id[feat_id] = features[-1]
+    return merged
+
+def _document_at(project_path: Path, rev: str) -> Dict[str, Any]:
+    result = _git(project_path, "show", f"{rev}:{FEATURE_FILE}")
+    if result.returncode != 0:
+        return {}
+    try:
+        data = json.loads(result.stdout)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def _commit_feature_list(project_path: Path):
+    """Commit harness edits to feature_list.json so a merge can proceed."""
+    get_store(project_path).flush()
+    if _git(project_path, "status", "--porcelain", "--", FEATURE_FILE).stdout.strip():
+        _git(project_path, "add", "--", FEATURE_FILE)
+        _git(project_path, "commit", "-m", "harness: update feature_list.json", "--", FEATURE_FILE)
+
+def merge_worktree(project_path: Path, tree: Worktree, message: str) -> Optional[List[str]]:
+    """
+    Merge a feature branch into the main checkout with a merge commit.
+
+    Returns None on success, or the list of conflicting paths (possibly
+    empty if git refused to start the merge) after aborting it.
+    """
+    project_path = Path(project_path)
+    _commit_feature_list(project_path)
+
+    base = _git(project_path, "merge-base", "HEAD", tree.branch).stdout.strip()
+    result = _git(project_path, "merge", "--no-ff", "--no-commit", tree.branch)
+    if _git(project_path, "rev-parse", "-q", "--verify", "MERGE_HEAD").returncode != 0:
+        if result.returncode == 0:
+            return None  # Already up to date
+        return []
+
+    merged = merge_feature_lists(
+        _document_at(project_path, base) if base else {},
+        _document_at(project_path, "HEAD"),
+        _document_at(project_path, tree.branch)
+    )
+    write_json_atomic(project_path / FEATURE_FILE, merged)
+    _git(project_path, "add", "--", FEATURE_FILE)
+
+    conflicts = _git(project_path, "diff", "--name-only", "--diff-filter=U").stdout.split()
+    if conflicts:
+        _git(project_path, "merge", "--abort")
+        return conflicts
+
+    if _git(project_path, "commit", "--no-edit", "-m", message).returncode != 0:
+        _git(project_path, "merge", "--abort")
+        return []
+    return None
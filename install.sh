@@ -34,6 +34,7 @@ cp loop-runner.py "$INSTALL_DIR/"
 cp mcp-setup.py "$INSTALL_DIR/"
 cp setup-context-engineered.sh "$INSTALL_DIR/"
 cp setup-native-hooks.sh "$INSTALL_DIR/"
+cp -r context_engine "$INSTALL_DIR/"
 
 # Copy supporting files
 cp -r agents "$INSTALL_DIR/" 2>/dev/null || true
@@ -20,6 +20,12 @@ from pathlib import Path
 from datetime import datetime
 from typing import Optional, Dict, Any, List
 
+from context_engine import build_cache, session_prep, session_usage
+from context_engine.feature_store import BACKEND, BACKENDS, get_store, set_backend
+from context_engine.git_history import completed_features
+from context_engine.feature_stream import scan_status
+from context_engine.session_runner import run_claude_session, stream_json_command
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -29,6 +35,7 @@ HARNESS_PATH = Path(os.environ.get('CONTEXT_ENGINE_PATH', Path(__file__).parent.
 DEFAULT_MODEL = "sonnet"  # or "opus" for complex projects
 MAX_SESSIONS = 100  # Safety limit
 SESSION_TIMEOUT = 3600  # 1 hour max per session
+STALL_TIMEOUT = 600  # seconds without any session activity before it is killed
 RETRY_DELAY = 5  # Seconds between retries on failure
 DEBUG = False  # Set via --debug flag
 
@@ -419,64 +426,36 @@ def create_project_directory(info: Dict[str, Any]) -> Path:
 # ============================================================================
 
 def get_feature_status(project_path: Path) -> Dict[str, Any]:
-    """Read feature_list.json and return status."""
-    feature_file = project_path / "feature_list.json"
-    
-    if not feature_file.exists():
-        return {"total": 0, "completed": 0, "remaining": 0, "blocked": 0, "features": []}
-    
+    """Return feature status from the shared, cached feature store."""
     try:
-        with open(feature_file) as f:
-            data = json.load(f)
-        
-        features = data.get("features", [])
-        completed = sum(1 for f in features if f.get("passes", False))
-        blocked = sum(1 for f in features if f.get("blocked", False))
-        
-        return {
-            "total": len(features),
-            "completed": completed,
-            "remaining": len(features) - completed,
-            "blocked": blocked,
-            "features": features
-        }
-    except json.JSONDecodeError:
+        store = get_store(project_path)
+    except ValueError:  # invalid JSON, or duplicate ids under the sqlite backend
         return {"total": 0, "completed": 0, "remaining": 0, "blocked": 0, "features": []}
-
-def is_feature_in_git_history(project_path: Path, feature_id: str) -> bool:
-    """Check if feature was completed in git history (backup check)."""
-    try:
-        result = subprocess.run(
-            ["git", "log", "--oneline", "--grep", f"session: completed {feature_id}"],
-            capture_output=True, text=True, cwd=project_path, timeout=10
-        )
-        return bool(result.stdout.strip())
-    except:
-        return False
+    
+    status = store.status()
+    status["features"] = store.features
+    return status
 
 def sync_features_with_git(project_path: Path) -> int:
     """Sync feature_list.json with git history. Returns number of fixes."""
-    feature_file = project_path / "feature_list.json"
-    
-    if not feature_file.exists():
-        return 0
-    
     try:
-        with open(feature_file) as f:
-            data = json.load(f)
+        store = get_store(project_path)
+        if not store.exists():
+            return 0
+        
+        # One incremental git log pass instead of one per pending feature
+        completed = completed_features(project_path)
         
         fixes = 0
-        for feat in data.get("features", []):
-            if not feat.get("passes", False):
-                feature_id = feat.get("id", "")
-                if is_feature_in_git_history(project_path, feature_id):
-                    print_status(f"Fixing {feature_id}: found in git history, marking as passed", "working")
-                    feat["passes"] = True
-                    fixes += 1
+        for feat in store.pending_features():
+            feature_id = feat.get("id", "")
+            if feature_id in completed:
+                print_status(f"Fixing {feature_id}: found in git history, marking as passed", "working")
+                store.update_feature(feature_id, {"passes": True})
+                fixes += 1
         
         if fixes > 0:
-            with open(feature_file, "w") as f:
-                json.dump(data, f, indent=2)
+            store.save()
             print_status(f"Fixed {fixes} feature(s) from git history", "success")
         
         return fixes
@@ -485,21 +464,11 @@ def sync_features_with_git(project_path: Path) -> int:
         return 0
 
 def get_next_feature(project_path: Path) -> Optional[Dict[str, Any]]:
-    """Get the next feature to implement."""
-    status = get_feature_status(project_path)
-    
-    for feat in sorted(status["features"], key=lambda x: x.get("priority", 99)):
-        if not feat.get("passes", False) and not feat.get("blocked", False):
-            # Check dependencies
-            deps = feat.get("dependencies", [])
-            deps_met = all(
-                any(f.get("id") == dep and f.get("passes", False) for f in status["features"])
-                for dep in deps
-            )
-            if deps_met or not deps:
-                return feat
-    
-    return None
+    """Get the next feature to implement (lowest priority whose deps passed)."""
+    try:
+        return get_store(project_path).next_feature(order="priority")
+    except:
+        return None
 
 # ============================================================================
 # Claude Code Integration
@@ -906,57 +875,38 @@ def run_claude_code(
     project_path: Path,
     prompt: str,
     model: str = DEFAULT_MODEL,
-    timeout: int = SESSION_TIMEOUT
+    timeout: int = SESSION_TIMEOUT,
+    on_event=None,
+    stall_timeout: int = STALL_TIMEOUT
 ) -> Dict[str, Any]:
-    """Run Claude Code with the given prompt."""
-    
-    cmd = [
-        "claude",
-        "--print",
-        "--model", model,
-        "--permission-mode", "bypassPermissions",
-        "--output-format", "text",
-        prompt
-    ]
+    """Run Claude Code with the given prompt.
+    
+    Output is streamed as JSON events and parsed as it arrives;
+    on_event(event, stats) is called for each one. The result also
+    carries the parsed stats (tool calls, usage, cost). Sessions with no
+    activity for stall_timeout seconds are stopped (0 = never).
+    """
+    
+    cmd = stream_json_command(model, prompt)
     
     print_status(f"Running Claude Code ({model})...", "working")
     
     start_time = time.time()
     
     try:
-        result = subprocess.run(
-            cmd,
-            cwd=project_path,
-            capture_output=True,
-            text=True,
-            timeout=timeout
-        )
-        
-        elapsed = time.time() - start_time
-        
-        return {
-            "success": result.returncode == 0,
-            "output": result.stdout,
-            "error": result.stderr,
-            "elapsed": elapsed,
-            "returncode": result.returncode
-        }
-    
-    except subprocess.TimeoutExpired:
-        return {
-            "success": False,
-            "output": "",
-            "error": f"Session timed out after {timeout}s",
-            "elapsed": timeout,
-            "returncode": -1
-        }
+        return run_claude_session(cmd, project_path, timeout=timeout, on_event=on_event,
+                                  stall_timeout=stall_timeout or None)
     except Exception as e:
         return {
             "success": False,
             "output": "",
             "error": str(e),
             "elapsed": time.time() - start_time,
-            "returncode": -1
+            "returncode": -1,
+            "cancelled": False,
+            "timed_out": False,
+            "stalled": False,
+            "stats": None
         }
 
 def run_claude_code_interactive(
@@ -1058,7 +1008,9 @@ def run_claude_code_interactive(
             "output": "Interactive session completed",
             "error": "",
             "elapsed": elapsed,
-            "returncode": result.returncode
+            "returncode": result.returncode,
+            # No structured output here; usage comes from the session transcript
+            "stats": session_usage.transcript_stats(project_path, start_time)
         }
     
     except KeyboardInterrupt:
@@ -1069,7 +1021,8 @@ def run_claude_code_interactive(
             "output": "Session ended by user",
             "error": "",
             "elapsed": time.time() - start_time,
-            "returncode": 0
+            "returncode": 0,
+            "stats": session_usage.transcript_stats(project_path, start_time)
         }
     except FileNotFoundError:
         error_msg = f"Claude command not found. Is 'claude' installed and in PATH?"
@@ -1112,6 +1065,14 @@ def log_session(project_path: Path, session_num: int, result: Dict[str, Any], fe
         "error": result.get("error", "")
     }
     
+    stats = result.get("stats")
+    if stats and stats.get("events"):
+        log_entry["usage"] = dict(stats["usage"], cost_usd=stats.get("cost_usd"),
+                                  num_turns=stats.get("num_turns"), api_ms=stats.get("api_ms"))
+        print_status(f"Usage: {session_usage.describe(stats)}", "info")
+        tier = session_usage.usage_tier(feature, get_feature_complexity) if feature else None
+        session_usage.record(project_path, stats, log_entry["feature"] or "unknown", session_num, tier)
+    
     with open(log_file, "w") as f:
         json.dump(log_entry, f, indent=2)
     
@@ -1174,6 +1135,18 @@ def orchestrate_implementation(project_path: Path, model: str = DEFAULT_MODEL, s
     session_num = start_session
     consecutive_failures = 0
     max_consecutive_failures = 3
+    if build_cache.activate(project_path):
+        print_status(f"Build cache: {build_cache.cache_root()}", "info")
+    
+    def prepare(feature: Dict[str, Any], num: int) -> Dict[str, Any]:
+        return {
+            "context": session_prep.compile_context(project_path, feature=feature),
+            "prompt": build_implement_prompt(feature, num),
+            "prewarm": build_cache.prewarm(project_path, num)
+        }
+    
+    # Prepares the next session while the previous one is checked
+    prep = session_prep.SessionPrep(prepare)
     
     while session_num <= max_sessions:
         # Sync feature_list.json with git history (fixes missed updates)
@@ -1204,9 +1177,22 @@ def orchestrate_implementation(project_path: Path, model: str = DEFAULT_MODEL, s
         
         print_status(f"Implementing: {feature.get('id')} - {feature.get('description', '')[:50]}...", "working")
         
-        # Build prompt and run
-        prompt = build_implement_prompt(feature, session_num)
-        result = run_claude_code_interactive(project_path, prompt, model)
+        # Warm dependency builds, compile context and build prompt, unless
+        # that was done during the previous session's checks
+        prepared = prep.take(project_path, feature, session_num)
+        if prepared is None:
+            prepared = prepare(feature, session_num)
+        elif prepared["stale"]:
+            prepared["context"] = session_prep.compile_context(project_path, feature=feature)
+        for stats in prepared["prewarm"]:
+            print_status(f"Build cache - {build_cache.describe(stats)}", "info")
+        session_prep.install_context(project_path, prepared["context"])
+        get_store(project_path).flush()
+        result = run_claude_code_interactive(project_path, prepared["prompt"], model)
+        
+        upcoming = get_next_feature(project_path)
+        if upcoming:
+            prep.start(project_path, upcoming, session_num + 1)
         log_session(project_path, session_num, result, feature)
         
         # Check result
@@ -1229,11 +1215,11 @@ def orchestrate_implementation(project_path: Path, model: str = DEFAULT_MODEL, s
             consecutive_failures = 0
         
         session_num += 1
-        
-        # Brief pause between sessions
-        time.sleep(2)
+    
+    prep.wait()
     
     # Final status
+    get_store(project_path).flush()
     final_status = get_feature_status(project_path)
     print_header("Orchestration Complete")
     print_progress(final_status["completed"], final_status["total"], "Final Status")
@@ -1299,12 +1285,15 @@ Examples:
     parser.add_argument("--with-qa", action="store_true", help="Generate E2E QA features using Playwright")
     parser.add_argument("--interactive", "-i", action="store_true", help="Run sessions interactively (default)")
     parser.add_argument("--debug", "-d", action="store_true", help="Show debug output")
+    parser.add_argument("--feature-backend", choices=BACKENDS, default=BACKEND,
+                        help="Feature state storage: json (feature_list.json) or sqlite (.agent/features.db)")
     
     args = parser.parse_args()
     
     # Set global debug flag
     global DEBUG
     DEBUG = args.debug
+    set_backend(args.feature_backend)
     
     print_header("Context-Engineered Agent Orchestrator")
     
@@ -1316,7 +1305,14 @@ Examples:
     # Status mode
     if args.status:
         project_path = args.project or Path.cwd()
-        status = get_feature_status(project_path)
+        if args.feature_backend == "json":
+            # Streamed: keeps per-feature flags only, not the feature dicts
+            try:
+                status = scan_status(project_path)
+            except (OSError, json.JSONDecodeError):
+                status = {"total": 0, "completed": 0, "remaining": 0, "blocked": 0}
+        else:
+            status = get_feature_status(project_path)
         print_progress(status["completed"], status["total"])
         print(f"  Blocked: {status['blocked']}")
         sys.exit(0)
@@ -170,10 +170,21 @@ cat > .agent/hooks/compile-context.sh << 'EOF'
 #!/bin/bash
 # Context Compiler - Assembles minimal working context for each step
 # Implements: Computed context, schema-driven summarization, retrieval
+# WORKING_CONTEXT=<file> compiles elsewhere (the harness stages the next
+# session's context while the current one is still in use)
 
-WORKING_CONTEXT=".agent/working-context/current.md"
+WORKING_CONTEXT="${WORKING_CONTEXT:-.agent/working-context/current.md}"
 SESSION_LOG=".agent/sessions/current.jsonl"
 
+# Native compiler (context_engine/context_compiler.py) when the harness is
+# installed: same sections in one process, packed into the token budget.
+# CONTEXT_ENGINE_SHELL_COMPILER=1 forces the shell version below.
+CONTEXT_ENGINE_PATH="${CONTEXT_ENGINE_PATH:-{{CONTEXT_ENGINE_PATH}}}"
+if [ -z "$CONTEXT_ENGINE_SHELL_COMPILER" ] && [ -f "$CONTEXT_ENGINE_PATH/context_engine/context_compiler.py" ]; then
+    PYTHONPATH="$CONTEXT_ENGINE_PATH${PYTHONPATH:+:$PYTHONPATH}" \
+        exec python3 -m context_engine.context_compiler --output "$WORKING_CONTEXT"
+fi
+
 echo "🔧 Compiling working context..."
 
 # Start fresh (context is computed, not accumulated)
@@ -256,7 +267,7 @@ if [ "$TOKENS" -gt "$MAX_TOKENS" ]; then
     echo "⚠️  Context over budget ($TOKENS > $MAX_TOKENS tokens), trimming..."
     
     # Create trimmed version
-    TRIMMED_CONTEXT=".agent/working-context/trimmed.md"
+    TRIMMED_CONTEXT="${WORKING_CONTEXT%.md}.trimmed.md"
     
     # Keep header and current task (most important)
     head -50 "$WORKING_CONTEXT" > "$TRIMMED_CONTEXT"
@@ -299,6 +310,7 @@ echo "Compiled: $(date -Iseconds)" >> "$WORKING_CONTEXT"
 
 echo "✅ Working context compiled: $WORKING_CONTEXT (~$TOKENS tokens)"
 EOF
+sed -i "s|{{CONTEXT_ENGINE_PATH}}|${CONTEXT_ENGINE_PATH:-$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)}|" .agent/hooks/compile-context.sh
 chmod +x .agent/hooks/compile-context.sh
 
 # ============================================================================
@@ -397,8 +409,9 @@ EXTRA="$3"
 METRICS_FILE=".agent/metrics/session-metrics.jsonl"
 
 # Calculate session wall time if start time exists
-WALL_TIME=""
-if [ -f ".agent/metrics/.session-start" ]; then
+# (SESSION_WALL_TIME overrides it for sessions timed by the caller)
+WALL_TIME="${SESSION_WALL_TIME:-}"
+if [ -z "$WALL_TIME" ] && [ -f ".agent/metrics/.session-start" ]; then
     START=$(cat .agent/metrics/.session-start)
     NOW=$(date +%s)
     WALL_TIME=$((NOW - START))
@@ -471,6 +484,7 @@ total_sessions = len([e for e in events if e.get("event") == "session_complete"]
 total_features = len([e for e in events if e.get("event") == "feature_complete"])
 retries = len([e for e in events if e.get("event") == "retry"])
 reverts = len([e for e in events if e.get("event") == "revert"])
+stalled = len([e for e in events if e.get("event") == "stalled"])
 
 wall_times = [e.get("wall_time_seconds", 0) for e in events if e.get("wall_time_seconds")]
 avg_wall_time = sum(wall_times) / len(wall_times) if wall_times else 0
@@ -490,6 +504,7 @@ print(f"Total sessions:     {total_sessions}")
 print(f"Features completed: {total_features}")
 print(f"Retries:            {retries}")
 print(f"Reverts:            {reverts}")
+print(f"Stalled sessions:   {stalled}")
 print(f"Avg wall time:      {avg_wall_time:.1f}s")
 print(f"Flaky features:     {len(flaky_features)}")
 if flaky_features:
@@ -515,6 +530,20 @@ CONTENT="$3"
 
 MEMORY_DIR=".agent/memory"
 
+# BM25 index over memory (context_engine/memory_index.py) when the harness
+# is installed; exits 2 if unavailable, and retrieval falls back to ls/grep
+CONTEXT_ENGINE_PATH="${CONTEXT_ENGINE_PATH:-{{CONTEXT_ENGINE_PATH}}}"
+memory_index() {
+    [ -f "$CONTEXT_ENGINE_PATH/context_engine/memory_index.py" ] || return 2
+    PYTHONPATH="$CONTEXT_ENGINE_PATH${PYTHONPATH:+:$PYTHONPATH}" python3 -m context_engine.memory_index "$@"
+}
+# Near-duplicate failures and strategies merge into one canonical memory
+# (context_engine/memory_consolidation.py, which also indexes the result)
+memory_consolidation() {
+    [ -f "$CONTEXT_ENGINE_PATH/context_engine/memory_consolidation.py" ] || return 2
+    PYTHONPATH="$CONTEXT_ENGINE_PATH${PYTHONPATH:+:$PYTHONPATH}" python3 -m context_engine.memory_consolidation "$@"
+}
+
 case "$ACTION" in
     store)
         # Store with metadata for retrieval
@@ -529,39 +558,58 @@ category: $CATEGORY
 $CONTENT
 MEMORY
         echo "🧠 Stored to memory: $FILENAME"
+        case "$CATEGORY" in
+            failures|strategies)
+                memory_consolidation add "$FILENAME" 2> /dev/null \
+                    || memory_index add "$FILENAME" > /dev/null 2>&1
+                ;;
+            *)
+                memory_index add "$FILENAME" > /dev/null 2>&1
+                ;;
+        esac
         ;;
         
     retrieve)
         # Retrieve relevant items (not all!)
         echo "🔍 Retrieving from $CATEGORY..."
-        if [ -d "$MEMORY_DIR/$CATEGORY" ]; then
-            # Simple recency-based retrieval
-            # In production, use embeddings or structured queries
+        if [ ! -d "$MEMORY_DIR/$CATEGORY" ]; then
+            echo "No items in $CATEGORY"
+        elif ! memory_index retrieve "$CATEGORY" 2> /dev/null; then
+            # Without the index: simple recency-based retrieval
             ls -t "$MEMORY_DIR/$CATEGORY"/*.md 2>/dev/null | head -5 | while read f; do
                 echo "--- $f ---"
                 cat "$f"
                 echo ""
             done
-        else
-            echo "No items in $CATEGORY"
         fi
         ;;
         
     search)
-        # Search across memory
-        QUERY="$CONTENT"
+        # Search across memory: search "term"
+        QUERY="${CONTENT:-$CATEGORY}"
         echo "🔍 Searching memory for: $QUERY"
-        grep -rl "$QUERY" "$MEMORY_DIR" 2>/dev/null | while read f; do
-            echo "Found in: $f"
-        done
+        if ! memory_index search "$QUERY" 2> /dev/null; then
+            grep -rl "$QUERY" "$MEMORY_DIR" 2>/dev/null | while read f; do
+                echo "Found in: $f"
+            done
+        fi
+        ;;
+        
+    consolidate)
+        # Merge near-duplicates already in memory: consolidate [failures|strategies]
+        echo "🔗 Consolidating near-duplicate memories..."
+        if ! memory_consolidation batch ${CATEGORY:+--category "$CATEGORY"} 2> /dev/null; then
+            echo "Consolidation unavailable (needs the context engine)"
+        fi
         ;;
         
     *)
-        echo "Usage: memory-manager.sh [store|retrieve|search] [category] [content]"
+        echo "Usage: memory-manager.sh [store|retrieve|search|consolidate] [category] [content]"
         echo "Categories: strategies, constraints, failures, entities"
         ;;
 esac
 EOF
+sed -i "s|{{CONTEXT_ENGINE_PATH}}|${CONTEXT_ENGINE_PATH:-$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)}|" .agent/hooks/memory-manager.sh
 chmod +x .agent/hooks/memory-manager.sh
 
 # ============================================================================
@@ -600,13 +648,19 @@ case "$ACTION" in
         ;;
         
     fetch)
-        # Fetch artifact content
+        # Fetch artifact content (test output is stored gzipped)
         FILEPATH="$ARTIFACT_DIR/$NAME"
-        if [ -f "$FILEPATH" ]; then
-            cat "$FILEPATH"
-        else
+        [ -f "$NAME" ] && FILEPATH="$NAME"
+        if [ ! -f "$FILEPATH" ]; then
             # Try with category prefix
-            find "$ARTIFACT_DIR" -name "$NAME" -type f | head -1 | xargs cat 2>/dev/null || echo "Artifact not found: $NAME"
+            FILEPATH=$(find "$ARTIFACT_DIR" -name "$NAME" -type f | head -1)
+        fi
+        if [ -z "$FILEPATH" ]; then
+            echo "Artifact not found: $NAME"
+        elif [[ "$FILEPATH" == *.gz ]]; then
+            gzip -dc "$FILEPATH"
+        else
+            cat "$FILEPATH"
         fi
         ;;
         
@@ -696,6 +750,23 @@ DESCRIPTION="$3"
 FEEDBACK_DIR=".agent/memory"
 TIMESTAMP=$(date +%Y%m%d-%H%M%S)
 
+# Keep the memory index (context_engine/memory_index.py) current when the
+# harness is installed
+CONTEXT_ENGINE_PATH="${CONTEXT_ENGINE_PATH:-{{CONTEXT_ENGINE_PATH}}}"
+index_memory() {
+    [ -f "$CONTEXT_ENGINE_PATH/context_engine/memory_index.py" ] || return 0
+    PYTHONPATH="$CONTEXT_ENGINE_PATH${PYTHONPATH:+:$PYTHONPATH}" \
+        python3 -m context_engine.memory_index add "$1" > /dev/null 2>&1
+}
+
+# Failures and strategies that repeat earlier ones are merged into one
+# canonical memory with an occurrence count (context_engine/memory_consolidation.py)
+consolidate_memory() {
+    [ -f "$CONTEXT_ENGINE_PATH/context_engine/memory_consolidation.py" ] || return 0
+    PYTHONPATH="$CONTEXT_ENGINE_PATH${PYTHONPATH:+:$PYTHONPATH}" \
+        python3 -m context_engine.memory_consolidation add "$1" 2> /dev/null || index_memory "$1"
+}
+
 case "$OUTCOME" in
     success)
         # Capture what worked as a strategy
@@ -719,6 +790,7 @@ $DESCRIPTION
 ### Reusable Pattern:
 - [To be extracted]
 STRATEGY
+        consolidate_memory "$FEEDBACK_DIR/strategies/${FEATURE_ID}-${TIMESTAMP}.md"
         echo "✅ Strategy captured for future reference"
         ;;
         
@@ -744,6 +816,7 @@ $DESCRIPTION
 ### Avoid In Future:
 - [Extract lesson]
 FAILURE
+        consolidate_memory "$FEEDBACK_DIR/failures/${FEATURE_ID}-${TIMESTAMP}.md"
         echo "❌ Failure captured to prevent repetition"
         ;;
         
@@ -761,6 +834,7 @@ created: $(date -Iseconds)
 
 $DESCRIPTION
 CONSTRAINT
+        index_memory "$FEEDBACK_DIR/constraints/${FEATURE_ID}-${TIMESTAMP}.md"
         echo "📌 Constraint recorded"
         ;;
         
@@ -769,6 +843,7 @@ CONSTRAINT
         ;;
 esac
 EOF
+sed -i "s|{{CONTEXT_ENGINE_PATH}}|${CONTEXT_ENGINE_PATH:-$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)}|" .agent/hooks/capture-feedback.sh
 chmod +x .agent/hooks/capture-feedback.sh
 
 # ============================================================================
@@ -968,6 +1043,40 @@ EOF
 # ============================================================================
 echo "✅ Creating quality gates..."
 
+cat > .agent/hooks/run-tests.sh << 'EOF'
+#!/bin/bash
+# Run the project's tests through the shared test result cache
+# Usage: .agent/hooks/run-tests.sh [test command]          (default: detected)
+#        .agent/hooks/run-tests.sh --check [test command]  (exit 0 if a passing
+#                                                           result is cached)
+#
+# Results live in .agent/cache/tests, keyed by the working tree (git
+# write-tree), the command and the toolchain versions
+# (context_engine/test_cache.py). The harness reuses results recorded here
+# instead of re-running the suite.
+
+cd "$(dirname "$0")/../.." || exit 1
+
+CONTEXT_ENGINE_PATH="${CONTEXT_ENGINE_PATH:-{{CONTEXT_ENGINE_PATH}}}"
+if [ -f "$CONTEXT_ENGINE_PATH/context_engine/test_cache.py" ]; then
+    PYTHONPATH="$CONTEXT_ENGINE_PATH${PYTHONPATH:+:$PYTHONPATH}" \
+        exec python3 -m context_engine.test_cache "$@"
+fi
+
+# Without the harness: run the tests uncached
+[ "$1" = "--check" ] && exit 1
+[ $# -gt 0 ] && exec bash -c "$*"
+if [ -f Cargo.toml ]; then exec cargo test
+elif [ -f package.json ]; then exec npm test
+elif [ -f go.mod ]; then exec go test ./...
+elif [ -f requirements.txt ] || [ -f pyproject.toml ]; then exec pytest
+elif [ -f Makefile ]; then exec make test
+fi
+echo "No test command detected"
+EOF
+sed -i "s|{{CONTEXT_ENGINE_PATH}}|${CONTEXT_ENGINE_PATH:-$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)}|" .agent/hooks/run-tests.sh
+chmod +x .agent/hooks/run-tests.sh
+
 cat > .agent/hooks/quality-gate.sh << 'EOF'
 #!/bin/bash
 # Quality gates with context-aware checks
@@ -978,7 +1087,8 @@ PASS=true
 
 # Standard checks
 echo -n "  Tests: "
-cargo test 2>/dev/null || npm test 2>/dev/null || pytest 2>/dev/null || go test ./... 2>/dev/null && echo "✅" || { echo "❌"; PASS=false; }
+# Reuses the cached verdict when the tree has not changed since the last run
+./.agent/hooks/run-tests.sh >/dev/null 2>&1 && echo "✅" || { echo "❌"; PASS=false; }
 
 echo -n "  Lint: "
 cargo clippy 2>/dev/null || npm run lint 2>/dev/null || flake8 . 2>/dev/null || go vet ./... 2>/dev/null && echo "✅" || echo "⚠️"
@@ -1437,6 +1547,9 @@ case "$1" in
     search)
         ./.agent/hooks/memory-manager.sh search "$2"
         ;;
+    consolidate)
+        ./.agent/hooks/memory-manager.sh consolidate "$2"
+        ;;
     success)
         ./.agent/hooks/capture-feedback.sh success "$2" "$3"
         ;;
@@ -1476,6 +1589,7 @@ case "$1" in
         echo "  remember [category] [content]    - Store to memory"
         echo "  recall [category]                - Retrieve from memory"
         echo "  search [query]                   - Search memory"
+        echo "  consolidate [category]           - Merge near-duplicate memories"
         echo ""
         echo "Feedback:"
         echo "  success [id] [description]       - Capture what worked"
@@ -1500,6 +1614,10 @@ cat >> .gitignore << 'EOF'
 .agent/working-context/
 .agent/sessions/
 .agent/artifacts/tool-outputs/
+.agent/features.db*
+.agent/feature_list.journal
+.agent/cache/
+.agent/metrics/test-history.db*
 EOF
 
 # ============================================================================
@@ -217,6 +217,15 @@ import sys
 import os
 from pathlib import Path
 
+# Shared budgeter (context_engine/context_budget.py) when the harness is
+# installed: packs individual memories instead of dropping whole sections
+CONTEXT_ENGINE_PATH = os.environ.get("CONTEXT_ENGINE_PATH") or "{{CONTEXT_ENGINE_PATH}}"
+sys.path.insert(0, CONTEXT_ENGINE_PATH)
+try:
+    from context_engine import context_budget
+except ImportError:
+    context_budget = None
+
 # ============================================================================
 # Configuration
 # ============================================================================
@@ -240,6 +249,8 @@ SECTION_PRIORITIES = {
 MAX_FAILURES = 3
 MAX_STRATEGIES = 2
 MAX_CONSTRAINTS = 3
+# ... and to consider when packing with the shared budgeter
+PACKED_CANDIDATES = 10
 
 # Truncation limits per item
 FAILURE_CHAR_LIMIT = 400
@@ -247,9 +258,28 @@ STRATEGY_CHAR_LIMIT = 300
 CONSTRAINT_CHAR_LIMIT = 200
 
 def estimate_tokens(text):
-    """Rough token estimate (1.3 tokens per word)."""
+    """Token count from the shared budgeter, else a rough 1.3 tokens per word."""
+    if context_budget is not None:
+        return context_budget.count_tokens(text)
     return int(len(text.split()) * 1.3)
 
+def candidates(limit):
+    """How many files of a memory category to read."""
+    return PACKED_CANDIDATES if context_budget is not None else limit
+
+def read_memories(files, char_limit):
+    """(full, trimmed) text of each memory file; full is only longer when packing."""
+    entries = []
+    for path in files:
+        try:
+            content = path.read_text()
+        except Exception:
+            continue
+        trimmed = content[:char_limit].strip()
+        full = content[:MAX_CONTEXT_CHARS].strip() if context_budget is not None else trimmed
+        entries.append((full, trimmed))
+    return entries
+
 def build_section(name, content):
     """Build a section with metadata for priority-based truncation."""
     return {
@@ -298,14 +328,45 @@ def truncate_by_priority(sections, max_chars):
     sorted_sections.sort(key=lambda s: s["priority"], reverse=True)
     return "\n\n".join(s["content"] for s in sorted_sections if s["content"].strip())
 
+def pack_sections(sections, memories, max_chars):
+    """
+    Fit sections within max_chars with the shared budgeter.
+    
+    Each memory is its own item, valued by its section's priority
+    (failures and strategies less the older they are), and goes in whole,
+    cut to its per-item limit, or not at all. The header, current task
+    and constraints heading are always kept.
+    """
+    items = []
+    for section in sorted(sections, key=lambda s: s["priority"], reverse=True):
+        name = section["name"]
+        if name not in memories:
+            items.append(context_budget.item(name, section["content"], section["priority"],
+                                             required=section["priority"] >= 80))
+            continue
+        heading, entries = memories[name]
+        decay = 1.0 if name == "constraints" else context_budget.DECAY
+        items.append(context_budget.item(name, heading, header=True))
+        for rank, (full, trimmed) in enumerate(entries):
+            items.append(context_budget.item(name, full, section["priority"] * decay ** rank, trimmed))
+    
+    # Two characters per item for the newlines joining them
+    packed = context_budget.pack(items, max_chars, len, overhead=2)
+    parts = {}
+    for entry in packed["items"]:
+        parts.setdefault(entry["section"], []).append(entry["text"])
+    return "\n\n".join("\n".join(texts) for texts in parts.values())
+
 def compile_context():
     """
     Compile fresh context from memory layers.
     
     Cache-stable: No timestamps or random values at the top.
-    Size-capped: Uses priority-based truncation to stay under MAX_CONTEXT_CHARS.
+    Size-capped: Packs memories with the shared budgeter (or falls back to
+    priority-based truncation) to stay under MAX_CONTEXT_CHARS.
     """
     sections = []
+    memories = {}
     
     # Header (highest priority - always keep)
     sections.append(build_section("header", "# Project Context"))
@@ -342,17 +403,12 @@ Description: {feat.get('description', '')[:300]}"""
     # Active constraints (high priority)
     constraints_dir = Path(".agent/memory/constraints")
     if constraints_dir.exists():
-        constraint_files = list(constraints_dir.glob("*.md"))[:MAX_CONSTRAINTS]
-        if constraint_files:
-            constraint_parts = ["## Constraints"]
-            for c in constraint_files:
-                try:
-                    content = c.read_text()[:CONSTRAINT_CHAR_LIMIT]
-                    constraint_parts.append(content.strip())
-                except Exception:
-                    pass
-            if len(constraint_parts) > 1:
-                sections.append(build_section("constraints", "\n".join(constraint_parts)))
+        constraint_files = list(constraints_dir.glob("*.md"))[:candidates(MAX_CONSTRAINTS)]
+        entries = read_memories(constraint_files, CONSTRAINT_CHAR_LIMIT)
+        if entries:
+            memories["constraints"] = ("## Constraints", entries)
+            constraint_parts = ["## Constraints"] + [trimmed for _, trimmed in entries]
+            sections.append(build_section("constraints", "\n".join(constraint_parts)))
     
     # Recent failures (important - don't repeat mistakes)
     failures_dir = Path(".agent/memory/failures")
@@ -361,18 +417,13 @@ Description: {feat.get('description', '')[:300]}"""
             failures_dir.glob("*.md"), 
             key=lambda x: x.stat().st_mtime, 
             reverse=True
-        )[:MAX_FAILURES]
+        )[:candidates(MAX_FAILURES)]
         
-        if failure_files:
-            failure_parts = ["## Known Failures (Don't Repeat)"]
-            for f in failure_files:
-                try:
-                    content = f.read_text()[:FAILURE_CHAR_LIMIT]
-                    failure_parts.append(content.strip())
-                except Exception:
-                    pass
-            if len(failure_parts) > 1:
-                sections.append(build_section("failures", "\n".join(failure_parts)))
+        entries = read_memories(failure_files, FAILURE_CHAR_LIMIT)
+        if entries:
+            memories["failures"] = ("## Known Failures (Don't Repeat)", entries)
+            failure_parts = ["## Known Failures (Don't Repeat)"] + [trimmed for _, trimmed in entries]
+            sections.append(build_section("failures", "\n".join(failure_parts)))
     
     # Working strategies (helpful but expendable)
     strategies_dir = Path(".agent/memory/strategies")
@@ -381,18 +432,13 @@ Description: {feat.get('description', '')[:300]}"""
             strategies_dir.glob("*.md"), 
             key=lambda x: x.stat().st_mtime, 
             reverse=True
-        )[:MAX_STRATEGIES]
+        )[:candidates(MAX_STRATEGIES)]
         
-        if strategy_files:
-            strategy_parts = ["## Working Strategies"]
-            for s in strategy_files:
-                try:
-                    content = s.read_text()[:STRATEGY_CHAR_LIMIT]
-                    strategy_parts.append(content.strip())
-                except Exception:
-                    pass
-            if len(strategy_parts) > 1:
-                sections.append(build_section("strategies", "\n".join(strategy_parts)))
+        entries = read_memories(strategy_files, STRATEGY_CHAR_LIMIT)
+        if entries:
+            memories["strategies"] = ("## Working Strategies", entries)
+            strategy_parts = ["## Working Strategies"] + [trimmed for _, trimmed in entries]
+            sections.append(build_section("strategies", "\n".join(strategy_parts)))
     
     # Quick reference with prominent failure recording
     commands_content = """## Commands
@@ -405,6 +451,8 @@ Other commands:
 - `.agent/commands.sh recall failures` - See what NOT to do"""
     sections.append(build_section("commands", commands_content))
     
+    if context_budget is not None:
+        return pack_sections(sections, memories, MAX_CONTEXT_CHARS)
     # Apply priority-based truncation
     return truncate_by_priority(sections, MAX_CONTEXT_CHARS)
 
@@ -446,6 +494,7 @@ def main():
 if __name__ == "__main__":
     main()
 PYTHON
+sed -i "s|{{CONTEXT_ENGINE_PATH}}|${CONTEXT_ENGINE_PATH:-$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)}|" .claude/hooks/session-start.py
 chmod +x .claude/hooks/session-start.py
 
 # ============================================================================
@@ -610,6 +659,7 @@ import json
 import sys
 import os
 import subprocess
+import tempfile
 from pathlib import Path
 from datetime import datetime
 
@@ -674,9 +724,21 @@ def check_tests_passed():
     """
     Check if tests recently passed (for write mode).
     
-    Looks for common test success indicators.
+    Prefers the test result cache (.agent/hooks/run-tests.sh --check):
+    True if a passing result is recorded for the current tree. Otherwise
+    looks for common test success indicators.
     Returns True if tests appear to have passed.
     """
+    run_tests = Path(".agent/hooks/run-tests.sh")
+    if run_tests.exists():
+        try:
+            result = subprocess.run(["bash", str(run_tests), "--check"],
+                                    capture_output=True, timeout=60)
+            if result.returncode == 0:
+                return True
+        except Exception:
+            pass
+    
     # Check for recent test output files
     test_indicators = [
         Path(".agent/sessions/last-test-result"),
@@ -714,8 +776,18 @@ def auto_complete_feature(feature_id):
                 feat["completed_at"] = datetime.now().isoformat()
                 break
         
-        with open(feature_file, "w") as f:
-            json.dump(data, f, indent=2)
+        # Temp file + rename: a killed hook never leaves a truncated file
+        fd, tmp = tempfile.mkstemp(dir=".", prefix=".feature_list.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, os.stat(feature_file).st_mode & 0o777)
+            os.replace(tmp, feature_file)
+        except Exception:
+            os.unlink(tmp)
+            raise
         
         return True
     except Exception: